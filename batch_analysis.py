@@ -0,0 +1,333 @@
+"""
+Offline gesture analysis of recorded landmark sessions
+Runs the gaming controller's gesture detection over whole sessions
+recorded with eye_tracking.py --record, without a camera and without
+injecting input. Every frame's face metrics come from batched
+compute_face_metrics calls, each signal goes through its filter as one
+series and GestureEngine.evaluate_series finds every gesture's
+transitions at once, so an hour of footage takes seconds. Sessions are
+analyzed in parallel, one per worker process.
+
+For each session it prints how often each gesture triggered and how long
+it was active, with --timeline when it triggered, and, given a label
+file, how the triggers line up with the labelled gestures.
+
+A label file is CSV with one labelled gesture occurrence per line,
+    gesture,start[,end]
+in seconds from the start of the session; a line with only a gesture
+name marks it as labelled without occurrences. Only gestures named in
+the file are scored: a trigger from tolerance seconds before an
+occurrence's start to tolerance seconds after its end is a hit, any other
+trigger of that gesture a false trigger, and an occurrence without a
+trigger a miss. session.lmk is scored against session.labels.csv when
+that exists.
+
+Usage:
+    python batch_analysis.py session.lmk [more.lmk ...] [--mode fps] [--user-profile PATH]
+        [--labels PATH ...] [--tolerance 0.3] [--gamepad] [--timeline] [--json PATH] [--workers N]
+"""
+
+import argparse
+import bisect
+import contextlib
+import csv
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from face_analysis import NUM_LANDMARKS, FaceAnalyzer, compute_face_metrics, to_pixels
+from gaming_config import TUNING
+from gaming_controller import GamingGestureController, action_token
+from gesture_engine import FEATURE_IDS, FEATURES
+from landmark_recording import KeyboardRecordingInput, LandmarkSession, RecordingInput
+from signal_filters import filter_series
+from user_profiles import load_profile
+
+# Frames whose landmarks are converted and measured at a time, to bound the temporary arrays
+METRICS_CHUNK = 4096
+# Metrics the gesture detectors use
+GESTURE_METRICS = ('ears', 'iris_gaze', 'head_tilt', 'nose_y_relative', 'mouth_height', 'mouth_width',
+                   'mouth_corners_up', 'brow_height')
+
+
+def labels_path(session_path):
+    """Default label file of a session: session.labels.csv next to session.lmk"""
+    return f"{os.path.splitext(session_path)[0]}.labels.csv"
+
+
+def load_labels(path, gestures):
+    """{gesture: [(start, end)]} from a label file (raises OSError or ValueError)"""
+    labels = {}
+    with open(path, newline='') as f:
+        for number, row in enumerate(csv.reader(f), 1):
+            fields = [field.strip() for field in row]
+            if not fields or not fields[0] or fields[0].startswith('#') or fields[0] == 'gesture':
+                continue
+            name = fields[0]
+            if name not in gestures:
+                raise ValueError(f"{path}:{number}: unknown gesture {name!r}")
+            occurrences = labels.setdefault(name, [])
+            times = [field for field in fields[1:] if field]
+            if not times:
+                continue
+            try:
+                start = float(times[0])
+                end = float(times[1]) if len(times) > 1 else start
+            except ValueError:
+                raise ValueError(f"{path}:{number}: times must be seconds")
+            if len(times) > 2 or end < start:
+                raise ValueError(f"{path}:{number}: expected gesture,start[,end] with end >= start")
+            occurrences.append((start, end))
+    return labels
+
+
+def score_triggers(triggers, occurrences, tolerance):
+    """(hits, misses, false triggers) of trigger times against labelled (start, end) occurrences
+    
+    Each occurrence takes the earliest unclaimed trigger within tolerance of it.
+    """
+    triggers = sorted(triggers)
+    claimed = [False] * len(triggers)
+    hits = 0
+    for start, end in sorted(occurrences):
+        for index in range(bisect.bisect_left(triggers, start - tolerance), len(triggers)):
+            if triggers[index] > end + tolerance:
+                break
+            if not claimed[index]:
+                claimed[index] = True
+                hits += 1
+                break
+    return hits, len(occurrences) - hits, len(triggers) - hits
+
+
+def session_features(session, controller):
+    """Timestamps and (frames, len(FEATURES)) gesture features of the frames a replay analyzes
+    
+    Frames without a face or with the face too far away are left out, as replay_session
+    and FaceAnalyzer leave them out; the signals go through the controller's filter
+    settings, head pose estimator and gaze mapper.
+    """
+    width, height = session.frame_width, session.frame_height
+    analyzer = FaceAnalyzer(None)
+    face = session.has_face()
+    frames = []
+    chunks = []
+    poses = []
+    # At least one (maybe empty) chunk, so an empty session still gives arrays of the right shape
+    for start in range(0, len(session) or 1, METRICS_CHUNK):
+        indices = start + np.flatnonzero(face[start:start + METRICS_CHUNK])
+        # Float32 pixels, as replay_session converts them
+        points = np.empty((len(indices), NUM_LANDMARKS, 3), dtype=np.float32)
+        to_pixels(session.landmarks[indices], width, height, out=points)
+        metrics = compute_face_metrics(points, width, height)
+        near = ~analyzer.is_too_far(metrics['face_area'], metrics['face_width'])
+        frames.append(indices[near])
+        chunks.append({name: metrics[name][near] for name in GESTURE_METRICS})
+        # solvePnP has no batched form: one solve per analyzed frame, in order, as the live path does
+        if controller.head_pose is not None:
+            for frame_points, timestamp in zip(points[near], session.timestamps[indices[near]].tolist()):
+                poses.append(controller.head_pose.estimate(frame_points, width, height, timestamp))
+    frames = np.concatenate(frames)
+    metrics = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in GESTURE_METRICS}
+    timestamps = np.array(session.timestamps[frames], dtype=np.float64)
+    
+    # The detectors' filters and measurements, each over the whole series
+    filters = controller.filters
+    features = np.full((len(frames), len(FEATURES)), np.nan)
+    
+    def measure(feature, values):
+        start = FEATURE_IDS[feature]
+        features[:, start:start + values.shape[1]] = values
+    
+    ears = filter_series(filters['ear'], metrics['ears'], timestamps)
+    measure('ear', ((ears[:, 0] + ears[:, 1]) / 2.0)[:, np.newaxis])
+    measure('ear_left', ears)
+    iris_gaze = metrics['iris_gaze']
+    if controller.head_pose is not None:
+        iris_gaze = np.array([controller.compensate_iris_offset(h, v, pose)
+                              for (h, v), pose in zip(iris_gaze.tolist(), poses)]).reshape(-1, 2)
+    gaze = controller.gaze_mapper.map_array(iris_gaze)
+    measure('gaze_x', filter_series(filters['gaze'], gaze, timestamps))
+    measure('head_tilt', filter_series(filters['head_tilt'], metrics['head_tilt'][:, np.newaxis], timestamps))
+    measure('head_nod', filter_series(filters['head_nod'], metrics['nose_y_relative'][:, np.newaxis], timestamps))
+    mouth = np.stack([metrics['mouth_height'], metrics['mouth_width']], axis=-1)
+    measure('mouth_height', filter_series(filters['mouth'], mouth, timestamps))
+    measure('mouth_corners_up', metrics['mouth_corners_up'].astype(np.float64)[:, np.newaxis])
+    measure('brow_height', filter_series(filters['brow'], metrics['brow_height'][:, np.newaxis], timestamps))
+    return timestamps, features
+
+
+def make_controller(mode=None, profile=None, gamepad=False):
+    """A gaming controller that records instead of injecting, with a user profile and game mode
+    
+    Without gamepad it has the keyboard and mouse output only, so modes keep their
+    keyboard mappings; with it their gamepad_mappings apply, as with --output gamepad.
+    """
+    output = RecordingInput() if gamepad else KeyboardRecordingInput()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        controller = GamingGestureController(output=output)
+        if profile is not None:
+            controller.apply_profile(profile)
+        if mode is not None:
+            controller.set_game_mode(mode)
+    return controller
+
+
+def close_controller(controller):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        controller.shutdown()
+
+
+def analyze_session(path, mode=None, profile_path=None, label_path=None, tolerance=TUNING['tolerance'],
+                    gamepad=False):
+    """Gesture timelines of one session file, scored against its labels when there are any (a worker task)"""
+    start_time = time.perf_counter()
+    session = LandmarkSession(path)
+    controller = make_controller(mode, load_profile(profile_path) if profile_path else None, gamepad)
+    try:
+        engine = controller.engine
+        labels = load_labels(label_path, engine.ids) if label_path else None
+        timestamps, features = session_features(session, controller)
+        transitions = engine.evaluate_series(timestamps, features)
+        actions = {name: action_token(action) for name, action in zip(engine.names, controller.action_table)}
+        mode = controller.current_mode
+    finally:
+        close_controller(controller)
+    
+    # (start, end) seconds from the session start per gesture; taps end where they start,
+    # and a gesture still active when the session ends has no end
+    origin = float(session.timestamps[0]) if len(session) else 0.0
+    times = (timestamps - origin).tolist()
+    events = {name: [] for name in engine.names}
+    for frame, gesture, transition in transitions:
+        spans = events[engine.names[gesture]]
+        if transition == 'exit':
+            spans[-1][1] = times[frame]
+        else:
+            spans.append([times[frame], times[frame] if engine.is_tap(gesture) else None])
+    
+    scores = None
+    if labels is not None:
+        scores = {name: score_triggers([span[0] for span in events[name]], occurrences, tolerance)
+                  for name, occurrences in labels.items()}
+    return {
+        'path': path,
+        'mode': mode,
+        'frames': len(session),
+        'analyzed': len(timestamps),
+        'duration': session.duration,
+        'seconds': time.perf_counter() - start_time,
+        'actions': actions,
+        'events': events,
+        'labels': label_path,
+        'scores': scores
+    }
+
+
+def print_report(result, timeline=False):
+    """Trigger counts, time active and label scores per gesture of one analyzed session"""
+    print(f"{result['path']}: {result['frames']} frames ({result['analyzed']} analyzed, "
+          f"{result['duration']:.1f}s recorded) in {result['seconds']:.2f}s, {result['mode']} mode"
+          + (f", labels {result['labels']}" if result['labels'] else ""))
+    scores = result['scores'] or {}
+    end = result['duration']
+    print(f"  {'gesture':<16} {'action':<12} {'triggers':>8} {'active s':>9}"
+          + (f" {'hits':>5} {'misses':>6} {'false':>6}" if scores else ""))
+    for name, spans in result['events'].items():
+        if not spans and name not in scores:
+            continue
+        active = sum((end if stop is None else stop) - start for start, stop in spans)
+        line = f"  {name:<16} {str(result['actions'][name] or '-'):<12} {len(spans):8d} {active:9.1f}"
+        if name in scores:
+            line += " {:5d} {:6d} {:6d}".format(*scores[name])
+        print(line)
+    if timeline:
+        for name, spans in result['events'].items():
+            if spans:
+                print(f"  {name}: " + ", ".join(f"{start:.2f}" if stop == start else
+                                                f"{start:.2f}-{'end' if stop is None else f'{stop:.2f}'}"
+                                                for start, stop in spans))
+
+
+class _Done:
+    """An inline call with the result() of a pool future"""
+    
+    def __init__(self, function, arguments):
+        try:
+            self._result, self._error = function(*arguments), None
+        except (OSError, ValueError) as e:
+            self._result, self._error = None, e
+    
+    def result(self):
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gesture timelines and trigger statistics of recorded landmark sessions")
+    parser.add_argument('sessions', nargs='+', help="landmark session files recorded with eye_tracking.py --record")
+    parser.add_argument('--mode', default=None, help="game mode to analyze in (default: the profile's, or fps)")
+    parser.add_argument('--user-profile', metavar='PATH', default=None,
+                        help="user profile whose thresholds, filters and gaze calibration to use")
+    parser.add_argument('--labels', metavar='PATH', action='append', default=None,
+                        help="label file, once per session in order (default: session.labels.csv if present)")
+    parser.add_argument('--tolerance', type=float, default=TUNING['tolerance'],
+                        help="seconds a trigger may be early or late for a labelled gesture")
+    parser.add_argument('--gamepad', action='store_true',
+                        help="report the actions of the modes' gamepad mappings (as with --output gamepad)")
+    parser.add_argument('--timeline', action='store_true', help="list when each gesture triggered")
+    parser.add_argument('--json', metavar='PATH', default=None, help="also write the results as JSON")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes (default: one per core, at most one per session)")
+    args = parser.parse_args()
+    
+    if args.labels is not None and len(args.labels) != len(args.sessions):
+        parser.error("give --labels once per session")
+    label_paths = args.labels or [labels_path(path) if os.path.exists(labels_path(path)) else None
+                                  for path in args.sessions]
+    
+    start = time.perf_counter()
+    workers = min(args.workers or os.cpu_count() or 1, len(args.sessions))
+    tasks = [(path, args.mode, args.user_profile, label_path, args.tolerance, args.gamepad)
+             for path, label_path in zip(args.sessions, label_paths)]
+    if workers == 1:
+        outcomes = [_Done(analyze_session, task) for task in tasks]
+    else:
+        # Spawned like the station workers: a fresh interpreter per worker, nothing inherited
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            outcomes = [pool.submit(analyze_session, *task) for task in tasks]
+    
+    results = []
+    for path, outcome in zip(args.sessions, outcomes):
+        try:
+            result = outcome.result()
+        except (OSError, ValueError) as e:
+            print(f"{path}: {e}")
+            continue
+        print_report(result, args.timeline)
+        results.append(result)
+    
+    if len(results) > 1:
+        frames = sum(result['frames'] for result in results)
+        recorded = sum(result['duration'] for result in results)
+        print(f"{len(results)} sessions, {frames} frames ({recorded:.1f}s recorded) in "
+              f"{time.perf_counter() - start:.2f}s with {workers} workers")
+        scored = [result['scores'] for result in results if result['scores']]
+        if scored:
+            print(f"  {'gesture':<16} {'hits':>5} {'misses':>6} {'false':>6}")
+            for name in sorted({name for scores in scored for name in scores}):
+                totals = [sum(column) for column in zip(*(scores[name] for scores in scored if name in scores))]
+                print(f"  {name:<16} {totals[0]:5d} {totals[1]:6d} {totals[2]:6d}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+            f.write("\n")
+
+
+if __name__ == "__main__":
+    main()
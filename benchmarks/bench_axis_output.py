@@ -0,0 +1,100 @@
+"""
+Benchmark: output events for analog head steering, key pair vs. gamepad axis
+Feeds a scripted head yaw trace (straight stretches, held turns and slow
+sweeps, with pose noise) at camera rate through the racing mode's yaw
+binding, once as the (a, d) key pair the keyboard output modulates and
+once as the gamepad's left stick, with recording stand-ins for the output.
+It reports the OS input events each needs per second and how closely the
+steering the game sees follows the axis (keys are on or off, so their
+error is measured on the average over --window seconds).
+Run from the repository root:
+    python benchmarks/bench_axis_output.py [--seconds 10] [--noise 0.5] [--window 0.2]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gaming_config import OUTPUT, PERFORMANCE
+from gaming_controller import YAW, GamingGestureController
+from landmark_recording import KeyboardRecordingInput, RecordingInput
+
+FPS = PERFORMANCE['max_fps']
+
+
+def yaw_trace(seconds, noise, seed=0):
+    """Head yaw (degrees) per camera frame: straight, held turns and slow sweeps"""
+    rng = random.Random(seed)
+    frames = int(seconds * FPS)
+    trace = []
+    target = 0.0
+    sweep = 0.0
+    next_change = 0.0
+    for frame in range(frames):
+        t = frame / FPS
+        if t >= next_change:
+            choice = rng.random()
+            target = 0.0 if choice < 0.3 else rng.uniform(-30.0, 30.0)
+            sweep = rng.uniform(-8.0, 8.0) if choice > 0.7 else 0.0  # Degrees per second
+            next_change = t + rng.uniform(1.0, 2.5)
+        target = max(-35.0, min(35.0, target + sweep / FPS))
+        trace.append(target + rng.gauss(0.0, noise))
+    return trace
+
+
+def run(trace, output, window):
+    """Drive one controller in real time; returns (events, steering RMS error over window-second averages)"""
+    controller = GamingGestureController(output=output)
+    controller.set_game_mode('racing')
+    frames_per_window = max(1, int(round(window * FPS)))
+    axis_values = []
+    steering = []  # What the game sees each frame: stick position, or -1/0/1 from the held key
+    start = time.perf_counter()
+    for frame, yaw in enumerate(trace):
+        delay = frame / FPS - (time.perf_counter() - start)
+        if delay > 0:
+            time.sleep(delay)
+        timestamp = frame / FPS
+        controller.begin_frame(time.perf_counter())
+        controller.detect_head_pose((yaw, 0.0, 0.0), timestamp)
+        controller.end_frame(timestamp)
+        axis_values.append(controller.axes[YAW])
+        held = controller.axis_keys[YAW]
+        steering.append(0.0 if held is None else (1.0 if held == 'd' else -1.0))
+    controller.shutdown()
+    
+    events = [event for event in output.events if event[0] in ('press', 'release', 'axes')]
+    if controller.gamepad:
+        # The stick holds the last value sent, rounded to the axis resolution
+        resolution = OUTPUT['axis_resolution']
+        steering = [round(value / resolution) * resolution for value in axis_values]
+    count = len(trace) // frames_per_window * frames_per_window
+    averaged = np.reshape(np.array(steering[:count]), (-1, frames_per_window)).mean(axis=1)
+    wanted = np.reshape(np.array(axis_values[:count]), (-1, frames_per_window)).mean(axis=1)
+    return events, float(np.sqrt(np.mean(np.square(averaged - wanted))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Input events for head steering: key pair vs. gamepad axis")
+    parser.add_argument('--seconds', type=float, default=10.0, help="length of the trace (run in real time)")
+    parser.add_argument('--noise', type=float, default=0.5, help="head pose noise (degrees, std dev)")
+    parser.add_argument('--window', type=float, default=0.2, help="averaging window for the steering error (s)")
+    args = parser.parse_args()
+    
+    trace = yaw_trace(args.seconds, args.noise)
+    print(f"{len(trace)} frames at {FPS} fps, yaw noise {args.noise:g} deg")
+    print(f"  {'output':<16} {'events':>7} {'events/s':>9} {'steering err':>13}")
+    for label, output in (('keys (a, d)', KeyboardRecordingInput()), ('gamepad pad_lx', RecordingInput())):
+        events, error = run(trace, output, args.window)
+        print(f"  {label:<16} {len(events):7d} {len(events) / args.seconds:9.1f} {error:13.3f}")
+    print(f"Steering error is RMS over {args.window:g} s averages of the deflection (-1..1).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: offline gesture analysis against a frame-by-frame replay
+Generates a session with scripted blinks, long blinks, head tilts and
+mouth openings, landmark noise and face dropouts (or takes a recorded
+one), runs it through replay_session and through batch_analysis, checks
+that both find the same gesture transitions and reports the speed of
+each in recorded seconds per second.
+Run from the repository root:
+    python benchmarks/bench_batch_analysis.py [session.lmk] [--minutes 10] [--mode fps]
+"""
+
+import argparse
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_gesture_latency import FPS, FRAME_HEIGHT, FRAME_WIDTH, synthetic_face
+from batch_analysis import close_controller, make_controller, session_features
+from face_analysis import FaceAnalyzer
+from landmark_recording import LandmarkRecorder, LandmarkSession, replay_session
+
+
+def write_noisy_session(path, seconds, seed=0):
+    """Scripted gestures with landmark noise, and half a second without a face every 17 s"""
+    rng = np.random.default_rng(seed)
+    recorder = LandmarkRecorder(path, FRAME_WIDTH, FRAME_HEIGHT)
+    for index in range(int(seconds * FPS)):
+        t = index / FPS
+        if t % 17.0 < 0.5:
+            recorder.write(t, None)
+            continue
+        face = synthetic_face(eye_opening=0.006 if t % 2.5 < 0.13 or t % 7.0 < 0.9 else 0.026,
+                              head_tilt=20.0 if t % 4.0 > 3.0 else 0.0,
+                              mouth_opening=0.05 if t % 5.0 > 4.5 else 0.005)
+        recorder.write(t, face + rng.normal(0.0, 0.0015, face.shape).astype(np.float32))
+    recorder.close()
+
+
+def replay_transitions(session, mode):
+    """(timestamp, gesture id, transition) of a frame-by-frame replay, and its duration"""
+    controller = make_controller(mode)
+    transitions = []
+    evaluate = controller.engine.evaluate
+    
+    def recording_evaluate(timestamp):
+        changes = evaluate(timestamp)
+        transitions.extend((timestamp, gesture, transition) for gesture, transition in changes)
+        return changes
+    
+    controller.engine.evaluate = recording_evaluate
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        elapsed = replay_session(session, FaceAnalyzer(controller))
+    close_controller(controller)
+    return transitions, elapsed
+
+
+def batch_transitions(session, mode):
+    """(timestamp, gesture id, transition) from batch analysis, and its duration"""
+    controller = make_controller(mode)
+    start = time.perf_counter()
+    timestamps, features = session_features(session, controller)
+    transitions = controller.engine.evaluate_series(timestamps, features)
+    elapsed = time.perf_counter() - start
+    close_controller(controller)
+    return [(float(timestamps[frame]), gesture, transition) for frame, gesture, transition in transitions], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline gesture analysis against a frame-by-frame replay")
+    parser.add_argument('session', nargs='?', default=None,
+                        help="landmark session file (default: a generated session)")
+    parser.add_argument('--minutes', type=float, default=10.0, help="length of the generated session")
+    parser.add_argument('--mode', default='fps', help="game mode to analyze in")
+    args = parser.parse_args()
+    
+    path = args.session
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'noisy.lmk')
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            write_noisy_session(path, args.minutes * 60)
+    session = LandmarkSession(path)
+    
+    replayed, replay_time = replay_transitions(session, args.mode)
+    batched, batch_time = batch_transitions(session, args.mode)
+    print(f"{len(session)} frames ({session.duration:.0f}s recorded), {len(replayed)} gesture transitions")
+    print(f"  replay_session  {replay_time:7.2f}s  {session.duration / replay_time:8.0f} recorded s/s")
+    print(f"  batch_analysis  {batch_time:7.2f}s  {session.duration / batch_time:8.0f} recorded s/s")
+    if sorted(replayed) == sorted(batched):
+        print("  same transitions")
+    else:
+        print(f"  transitions differ: {len(set(replayed) - set(batched))} only in the replay, "
+              f"{len(set(batched) - set(replayed))} only in the batch analysis")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Benchmark: per-frame cost of gesture detection
+Feeds a scripted trace of already-measured face signals (blinks, winks,
+glances at the screen edges, head tilts and nods, mouth openings, smiles
+and eyebrow raises, with noise) through the gaming controller's detectors
+as FaceAnalyzer does each frame, with a recording stand-in for the
+output, and reports the detection cost per frame and the input events
+each gesture produced. --extra-gestures N declares N more (unmapped)
+gestures, copies of the built-in ones, to show how the cost grows with
+the number of gestures.
+Run from the repository root:
+    python benchmarks/bench_gesture_eval.py [--seconds 60] [--mode fps] [--extra-gestures 0]
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gaming_config import GESTURE_DEFINITIONS
+
+FPS = 30
+
+# (signal, value while the event lasts, event length in seconds); neutral values below
+EVENTS = (
+    ('blink', None, 0.15),
+    ('left_wink', None, 0.4),
+    ('gaze_x', 0.85, 0.8),
+    ('gaze_y', 0.15, 0.8),
+    ('head_tilt', -22.0, 1.0),
+    ('nose_y_relative', 0.65, 0.6),
+    ('mouth_height', 0.05, 0.6),
+    ('smile', None, 0.8),
+    ('brow_height', 0.13, 0.6)
+)
+NEUTRAL = {'left_ear': 0.3, 'right_ear': 0.3, 'gaze_x': 0.5, 'gaze_y': 0.5, 'head_tilt': 0.0,
+           'nose_y_relative': 0.5, 'mouth_height': 0.005, 'mouth_width': 0.03, 'mouth_corners_up': False,
+           'brow_height': 0.09}
+
+
+def signal_trace(seconds, seed=0):
+    """One dict of signals per frame: neutral with noise, and a scripted event every second"""
+    rng = random.Random(seed)
+    frames = []
+    event, event_end = None, 0.0
+    for index in range(int(seconds * FPS)):
+        t = index / FPS
+        if t >= event_end and index % FPS == 0:
+            event = rng.choice(EVENTS)
+            event_end = t + event[2]
+        signals = dict(NEUTRAL)
+        if t < event_end:
+            name, value, _ = event
+            if name == 'blink':
+                signals['left_ear'] = signals['right_ear'] = 0.1
+            elif name == 'left_wink':
+                signals['left_ear'] = 0.1
+            elif name == 'smile':
+                signals['mouth_width'], signals['mouth_corners_up'] = 0.07, True
+            else:
+                signals[name] = value
+        signals['gaze_x'] += rng.gauss(0.0, 0.01)
+        signals['gaze_y'] += rng.gauss(0.0, 0.01)
+        signals['head_tilt'] += rng.gauss(0.0, 0.5)
+        frames.append(signals)
+    return frames
+
+
+def run(controller, trace):
+    """Seconds spent in the detectors per frame"""
+    start = time.perf_counter()
+    for index, signals in enumerate(trace):
+        # Trace time drives the gestures; the capture time stamped on input events is a perf_counter reading
+        timestamp = index / FPS
+        controller.begin_frame(time.perf_counter())
+        controller.detect_blink_pattern(signals['left_ear'], signals['right_ear'], timestamp)
+        controller.detect_gaze_movement((signals['gaze_x'], signals['gaze_y']), timestamp)
+        controller.detect_head_movement(signals['head_tilt'], signals['nose_y_relative'], timestamp)
+        controller.detect_facial_expressions(signals['mouth_height'], signals['mouth_width'],
+                                             signals['mouth_corners_up'], timestamp,
+                                             brow_height=signals['brow_height'])
+        controller.end_frame(timestamp)
+    return (time.perf_counter() - start) / len(trace)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-frame cost of gesture detection")
+    parser.add_argument('--seconds', type=float, default=60.0, help="length of the scripted trace")
+    parser.add_argument('--mode', default='fps', help="game mode to run in")
+    parser.add_argument('--repeat', type=int, default=5, help="runs to take the best of")
+    parser.add_argument('--extra-gestures', type=int, default=0, help="additional declared gestures")
+    args = parser.parse_args()
+    
+    # Declared before the controller module compiles its gesture list, as a config entry would be
+    conditions = [name for name, definition in GESTURE_DEFINITIONS.items() if 'when' in definition]
+    for index in range(args.extra_gestures):
+        name = conditions[index % len(conditions)]
+        GESTURE_DEFINITIONS[f'{name}_{index}'] = GESTURE_DEFINITIONS[name]
+    from gaming_controller import GESTURES, GamingGestureController
+    from landmark_recording import RecordingInput
+    
+    trace = signal_trace(args.seconds)
+    best = float('inf')
+    for _ in range(args.repeat):
+        output = RecordingInput()
+        # Trigger messages go to /dev/null; printing them still counts
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            controller = GamingGestureController(output=output)
+            controller.set_game_mode(args.mode)
+            best = min(best, run(controller, trace))
+            controller.shutdown()
+    
+    presses = Counter(event[1] for event in output.events if event[0] in ('press', 'click'))
+    print(f"{len(trace)} frames in {args.mode} mode, {len(GESTURES) - 1} gestures: "
+          f"{best * 1e6:.1f} us/frame in the gesture detectors")
+    for target, count in sorted(presses.items(), key=lambda item: str(item[0])):
+        print(f"  {str(target):<16} {count:4d} presses")
+
+
+if __name__ == "__main__":
+    main()
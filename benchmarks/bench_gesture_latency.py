@@ -0,0 +1,124 @@
+"""
+Benchmark: frame capture to key injection latency per gesture
+Replays a landmark session (a recorded one, or a generated session with
+scripted blinks, head tilts and mouth openings) through FaceAnalyzer and
+the gaming controller, with pynput swapped for a recording stub, and
+reports the capture-to-inject latency distribution per gesture.
+Run from the repository root:
+    python benchmarks/bench_gesture_latency.py [session.lmk] [--speed 1] [--inject-delay 0.5]
+"""
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_analysis import (CHIN, EYE_CONTOURS, FACE_LEFT, FACE_RIGHT, FOREHEAD, MOUTH_BOTTOM, MOUTH_LEFT,
+                           MOUTH_RIGHT, MOUTH_TOP, NOSE_TIP, NUM_LANDMARKS, FaceAnalyzer)
+from gaming_controller import GamingGestureController
+from landmark_recording import LandmarkRecorder, LandmarkSession, RecordingInput, replay_session
+
+FRAME_WIDTH, FRAME_HEIGHT, FPS = 640, 480, 30
+
+
+class SlowRecordingInput(RecordingInput):
+    """Recording stub that spends a fixed time per injected event, like a real OS input call"""
+    
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+    
+    def press(self, key):
+        time.sleep(self.delay)
+        super().press(key)
+    
+    def release(self, key):
+        time.sleep(self.delay)
+        super().release(key)
+    
+    def click(self, button, count=1):
+        time.sleep(self.delay)
+        super().click(button, count)
+
+
+def synthetic_face(eye_opening=0.026, head_tilt=0.0, mouth_opening=0.005):
+    """Normalized (478, 3) landmarks with the given eye/mouth openings and head roll (degrees)"""
+    landmarks = np.zeros((NUM_LANDMARKS, 3), dtype=np.float32)
+    landmarks[:, :2] = 0.5
+    
+    # Face outline, rolled by head_tilt around the nose
+    half_width = 0.15
+    dy = math.tan(math.radians(head_tilt)) * half_width * FRAME_WIDTH / FRAME_HEIGHT
+    landmarks[FACE_LEFT, :2] = (0.5 - half_width, 0.5 - dy)
+    landmarks[FACE_RIGHT, :2] = (0.5 + half_width, 0.5 + dy)
+    landmarks[FOREHEAD, :2] = (0.5, 0.2)
+    landmarks[CHIN, :2] = (0.5, 0.8)
+    landmarks[NOSE_TIP, :2] = (0.5, 0.5)
+    
+    # Eye contours: corners, then two upper and two lower lid points
+    for contour, center_x in zip(EYE_CONTOURS, (0.58, 0.42)):
+        p1, p2, p3, p4, p5, p6 = contour
+        landmarks[p1, :2] = (center_x - 0.03, 0.4)
+        landmarks[p4, :2] = (center_x + 0.03, 0.4)
+        landmarks[[p2, p3], 0] = (center_x - 0.01, center_x + 0.01)
+        landmarks[[p6, p5], 0] = (center_x - 0.01, center_x + 0.01)
+        landmarks[[p2, p3], 1] = 0.4 - eye_opening / 2
+        landmarks[[p6, p5], 1] = 0.4 + eye_opening / 2
+    
+    # Neutral mouth (corners level with the lips, so no smile)
+    landmarks[MOUTH_TOP, :2] = (0.5, 0.65)
+    landmarks[MOUTH_BOTTOM, :2] = (0.5, 0.65 + mouth_opening)
+    landmarks[MOUTH_LEFT, :2] = (0.45, 0.66)
+    landmarks[MOUTH_RIGHT, :2] = (0.55, 0.66)
+    return landmarks
+
+
+def write_synthetic_session(path, seconds=20):
+    """Scripted session: a blink every 2.5 s, a 1 s head tilt every 4 s, mouth open every 5 s"""
+    recorder = LandmarkRecorder(path, FRAME_WIDTH, FRAME_HEIGHT)
+    for index in range(seconds * FPS):
+        t = index / FPS
+        blinking = t % 2.5 < 0.13
+        tilting = t % 4.0 > 3.0
+        mouth_open = t % 5.0 > 4.5
+        recorder.write(t, synthetic_face(eye_opening=0.006 if blinking else 0.026,
+                                         head_tilt=20.0 if tilting else 0.0,
+                                         mouth_opening=0.05 if mouth_open else 0.005))
+    recorder.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Capture-to-inject latency per gesture, from a replayed session")
+    parser.add_argument('session', nargs='?', default=None,
+                        help="landmark session file (default: a generated 20 s session)")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="replay speed multiplier (1 = real time, 0 = as fast as possible)")
+    parser.add_argument('--inject-delay', type=float, default=0.0,
+                        help="simulated time per injected key event (ms)")
+    parser.add_argument('--mode', default='fps', help="game mode to replay in")
+    args = parser.parse_args()
+    
+    path = args.session
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(), 'synthetic.lmk')
+        write_synthetic_session(path)
+    
+    session = LandmarkSession(path)
+    stub = SlowRecordingInput(args.inject_delay / 1000.0)
+    controller = GamingGestureController(keyboard_controller=stub, mouse_controller=stub)
+    controller.set_game_mode(args.mode)
+    
+    print(f"Replaying {len(session)} frames ({session.duration:.1f}s) at speed {args.speed or 'max'}...")
+    elapsed = replay_session(session, FaceAnalyzer(controller), args.speed)
+    controller.shutdown()
+    print(f"Replay took {elapsed:.2f}s, {len(stub.events)} input events recorded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Benchmark: solvePnP head pose against the 2D approximation
+Projects a generic 3D face through a known yaw/pitch/roll trajectory,
+adds landmark noise, and compares per-frame cost and angle error of:
+the approximation compute_face_metrics has always used (roll from the
+face edge slope, pitch from the nose position between forehead and chin,
+no yaw), and HeadPoseEstimator with each solver, warm-started or not.
+It also checks that landmarks mirrored with mirror_landmarks, as in the
+live path, give back the mirrored pose (-yaw, pitch, -roll).
+Run from the repository root:
+    python benchmarks/bench_head_pose.py [--frames 2000] [--noise 0.5]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_analysis import (EYE_CONTOURS, FACE_LEFT, FACE_RIGHT, FOREHEAD, IRIS_CENTERS, MOUTH_BOTTOM, MOUTH_TOP,
+                           NUM_LANDMARKS, compute_face_metrics, mirror_landmarks)
+from gaming_config import PERFORMANCE
+from head_pose import MODEL_POINTS, POSE_LANDMARKS, HeadPoseEstimator, camera_model
+
+FRAME_WIDTH, FRAME_HEIGHT, FPS = 640, 480, 30
+FACE_DISTANCE = 2500.0  # Model units from the camera; the face is about 170 px wide
+
+
+def face_model():
+    """3D positions (model units, camera axes) of every landmark the metrics and the pose solver read"""
+    model = {index: point for index, point in zip(POSE_LANDMARKS.tolist(), MODEL_POINTS.tolist())}
+    model.update({
+        FACE_LEFT: [-330.0, -80.0, 250.0], FACE_RIGHT: [330.0, -80.0, 250.0],
+        FOREHEAD: [0.0, -450.0, 170.0], MOUTH_TOP: [0.0, 120.0, 100.0], MOUTH_BOTTOM: [0.0, 185.0, 105.0],
+        IRIS_CENTERS[1]: [-150.0, -170.0, 130.0], IRIS_CENTERS[0]: [150.0, -170.0, 130.0]
+    })
+    # Eye contours: outer/inner corners, then the upper and lower lid points
+    for contour, sign in ((EYE_CONTOURS[1], -1.0), (EYE_CONTOURS[0], 1.0)):
+        p1, p2, p3, p4, p5, p6 = contour.tolist()
+        near, far = (p4, p1) if sign < 0 else (p1, p4)
+        model[near] = [sign * 75.0, -170.0, 135.0]
+        model[far] = [sign * 225.0, -170.0, 135.0]
+        for upper, lower, step in ((p2, p6, 1), (p3, p5, 2)):
+            # Lid points a third and two thirds of the way from p1 to p4
+            lid_x = model[p1][0] + step / 3.0 * (model[p4][0] - model[p1][0])
+            model[upper] = [lid_x, -195.0, 130.0]
+            model[lower] = [lid_x, -145.0, 130.0]
+    indices = np.array(sorted(model))
+    return indices, np.array([model[index] for index in indices.tolist()])
+
+
+def rotation(yaw, pitch, roll):
+    """Rotation matrix for a head pose in head_pose.rotation_to_angles' convention"""
+    y, p, r = math.radians(-yaw), math.radians(pitch), math.radians(roll)
+    rx = np.array([[1, 0, 0], [0, math.cos(p), -math.sin(p)], [0, math.sin(p), math.cos(p)]])
+    ry = np.array([[math.cos(y), 0, math.sin(y)], [0, 1, 0], [-math.sin(y), 0, math.cos(y)]])
+    rz = np.array([[math.cos(r), -math.sin(r), 0], [math.sin(r), math.cos(r), 0], [0, 0, 1]])
+    return rz @ ry @ rx
+
+
+def make_frames(count, noise, seed=0):
+    """(landmarks (count, 478, 3) in pixels, true poses (count, 3)) for a smooth head motion"""
+    rng = np.random.default_rng(seed)
+    indices, model = face_model()
+    camera = camera_model(FRAME_WIDTH, FRAME_HEIGHT)
+    t = np.arange(count) / FPS
+    poses = np.stack([25.0 * np.sin(t * 0.9), 15.0 * np.sin(t * 0.6 + 1.0), 10.0 * np.sin(t * 0.4 + 2.0)], axis=1)
+    frames = np.zeros((count, NUM_LANDMARKS, 3), dtype=np.float32)
+    frames[:, :, :2] = (FRAME_WIDTH / 2, FRAME_HEIGHT / 2)
+    for frame, (yaw, pitch, roll) in enumerate(poses):
+        points = model @ rotation(yaw, pitch, roll).T + (0.0, 0.0, FACE_DISTANCE)
+        projected = (points @ camera.T)[:, :2] / points[:, 2:3]
+        frames[frame, indices, :2] = projected + rng.normal(0.0, noise, projected.shape)
+    return frames, poses
+
+
+def rms(errors):
+    return float(np.sqrt(np.mean(np.square(errors))))
+
+
+def time_per_frame(function, frames, repeats=3):
+    """Best of repeats, in microseconds per frame, plus the last run's results"""
+    best = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        results = [function(frame, index) for index, frame in enumerate(frames)]
+        best = min(best, (time.perf_counter() - start) / len(frames))
+    return best * 1e6, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="solvePnP head pose vs. the 2D roll/pitch approximation")
+    parser.add_argument('--frames', type=int, default=2000, help="frames in the synthetic trajectory")
+    parser.add_argument('--noise', type=float, default=0.5, help="landmark noise (pixels, std dev)")
+    args = parser.parse_args()
+    
+    frames, poses = make_frames(args.frames, args.noise)
+    budget_us = 1e6 / PERFORMANCE['max_fps']
+    print(f"{args.frames} frames, yaw ±25°, pitch ±15°, roll ±10°, landmark noise {args.noise:g} px; "
+          f"frame budget {budget_us / 1000:.1f} ms")
+    print(f"  {'method':<24} {'us/frame':>9} {'budget':>7} {'yaw err':>8} {'pitch err':>10} {'roll err':>9}")
+    
+    # Approximation: one single-face compute_face_metrics call per frame (all metrics, as in the tracker)
+    def approximate(frame, index):
+        metrics = compute_face_metrics(frame, FRAME_WIDTH, FRAME_HEIGHT)
+        return float(metrics['head_tilt']), float(metrics['nose_y_relative'])
+    cost, results = time_per_frame(approximate, frames)
+    tilt, nose_y = np.array(results).T
+    # nose_y_relative is not an angle: score the best linear fit to the true pitch
+    fit = np.polyfit(nose_y, poses[:, 1], 1)
+    pitch_error = rms(np.polyval(fit, nose_y) - poses[:, 1])
+    print(f"  {'approximation (metrics)':<24} {cost:9.1f} {cost / budget_us:7.2%} {rms(poses[:, 0]):8.2f} "
+          f"{pitch_error:10.2f} {rms(tilt - poses[:, 2]):9.2f}")
+    
+    # The live path mirrors landmarks instead of flipping the frame: a mirrored head turns and rolls the other way
+    mirrored = mirror_landmarks(frames, FRAME_WIDTH)
+    mirrored_poses = poses * (-1.0, 1.0, -1.0)
+    for label, solver, warm, inputs, truths in (
+            ('sqpnp', 'sqpnp', False, frames, poses),
+            ('iterative, warm start', 'iterative', True, frames, poses),
+            ('iterative, cold', 'iterative', False, frames, poses),
+            ('sqpnp, mirrored input', 'sqpnp', False, mirrored, mirrored_poses)):
+        estimator = HeadPoseEstimator(solver)
+        
+        def solve(frame, index):
+            if not warm:
+                estimator.reset()
+            return estimator.estimate(frame, FRAME_WIDTH, FRAME_HEIGHT, index / FPS)
+        cost, results = time_per_frame(solve, inputs)
+        solved = [(result, pose) for result, pose in zip(results, truths) if result is not None]
+        estimated = np.array([result for result, _ in solved])
+        truth = np.array([pose for _, pose in solved])
+        errors = [rms(estimated[:, axis] - truth[:, axis]) for axis in range(3)]
+        failed = len(results) - len(solved)
+        print(f"  {label:<24} {cost:9.1f} {cost / budget_us:7.2%} {errors[0]:8.2f} {errors[1]:10.2f} "
+              f"{errors[2]:9.2f}" + (f"  ({failed} failed)" if failed else ""))
+    print("Errors are RMS degrees; the approximation has no yaw, so its yaw error is the yaw itself.")
+
+
+if __name__ == "__main__":
+    main()
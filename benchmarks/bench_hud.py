@@ -0,0 +1,109 @@
+"""
+Benchmark: HUD text drawing, cv2.putText vs. cached layers
+Draws the strings of one preview frame's HUD (the static labels of
+EyeTracker.render_frame plus its per-frame values) onto a camera-sized
+frame, once with cv2.putText for everything and once with HudCache for
+the static strings, and reports the cost per frame and the largest pixel
+difference between the two.
+Run from the repository root:
+    python benchmarks/bench_hud.py [--frames 2000] [--too-far]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gaming_config import GAME_MODES, VISUAL_FEEDBACK
+from hud import FONT, HudCache
+
+FRAME_WIDTH, FRAME_HEIGHT = 640, 480
+
+# (text, origin, scale, color, thickness) as drawn by EyeTracker.render_frame
+STATIC_TEXT = [
+    ("Good Distance ✓", (10, 170), 0.5, (0, 255, 0), 1),
+    ("Mode: FPS", (10, 90), 0.5, (0, 255, 255), 2),
+    ("Gestures: ON", (10, 115), 0.5, (0, 255, 0), 2),
+    (f"Controls: q=quit, 1-{len(GAME_MODES)}=modes, g=toggle gestures", (10, FRAME_HEIGHT - 10), 0.4,
+     (255, 255, 255), 1)
+]
+TOO_FAR_TEXT = ("Please move closer to the camera", None, 0.8, (0, 255, 255), 2)
+
+
+def dynamic_text(frame_index):
+    """Per-frame values, always drawn with putText"""
+    phase = frame_index * 0.05
+    return [
+        (f"EAR: {0.3 + 0.05 * np.sin(phase):.2f}", (10, 60), 0.5, (255, 255, 255), 1),
+        (f"Head Tilt: {8 * np.sin(phase):.1f}°", (300, 90), 0.4, (255, 255, 255), 1),
+        (f"Gaze: ({0.5 + 0.2 * np.sin(phase):.2f}, {0.5 + 0.2 * np.cos(phase):.2f})", (300, 115), 0.4,
+         (255, 255, 255), 1)
+    ]
+
+
+def static_text(too_far, text_size):
+    items = list(STATIC_TEXT)
+    if too_far:
+        text, _, scale, color, thickness = TOO_FAR_TEXT
+        width = text_size(text, scale, thickness)[0][0]
+        items.append((text, ((FRAME_WIDTH - width) // 2, FRAME_HEIGHT // 2), scale, color, thickness))
+    return items
+
+
+def draw_direct(frame, frame_index, too_far):
+    def text_size(text, scale, thickness):
+        return cv2.getTextSize(text, FONT, scale, thickness)
+    for text, org, scale, color, thickness in static_text(too_far, text_size) + dynamic_text(frame_index):
+        cv2.putText(frame, text, org, FONT, scale, color, thickness)
+
+
+def draw_cached(hud, frame, frame_index, too_far):
+    for text, org, scale, color, thickness in static_text(too_far, hud.text_size):
+        hud.draw_text(frame, text, org, scale, color, thickness)
+    for text, org, scale, color, thickness in dynamic_text(frame_index):
+        cv2.putText(frame, text, org, FONT, scale, color, thickness)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HUD text cost: putText vs. cached layers")
+    parser.add_argument('--frames', type=int, default=2000, help="frames to draw")
+    parser.add_argument('--too-far', action='store_true', help="include the centered 'move closer' prompt")
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(0)
+    background = rng.integers(0, 256, (FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+    frame = background.copy()
+    hud = HudCache(VISUAL_FEEDBACK['hud_cache_layers'])
+    
+    results = {}
+    for label, draw in (('putText', lambda index: draw_direct(frame, index, args.too_far)),
+                        ('cached layers', lambda index: draw_cached(hud, frame, index, args.too_far))):
+        best = float('inf')
+        for _ in range(3):
+            start = time.perf_counter()
+            for index in range(args.frames):
+                draw(index)
+            best = min(best, (time.perf_counter() - start) / args.frames)
+        results[label] = best * 1e6
+    
+    # Same frame drawn both ways on the same background
+    direct, cached = background.copy(), background.copy()
+    draw_direct(direct, 0, args.too_far)
+    draw_cached(hud, cached, 0, args.too_far)
+    difference = int(np.abs(direct.astype(np.int16) - cached.astype(np.int16)).max())
+    
+    static = len(static_text(args.too_far, hud.text_size))
+    print(f"{args.frames} frames of {static} static + {len(dynamic_text(0))} per-frame HUD strings "
+          f"on {FRAME_WIDTH}x{FRAME_HEIGHT}")
+    for label, cost in results.items():
+        print(f"  {label:<14} {cost:7.1f} us/frame")
+    print(f"Layers rendered: {hud.stats['misses']}; max pixel difference vs putText: {difference}")
+
+
+if __name__ == "__main__":
+    main()
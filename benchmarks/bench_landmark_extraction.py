@@ -0,0 +1,130 @@
+"""
+Microbenchmark: per-landmark Python metric extraction vs the vectorized NumPy path
+Both read only the landmarks they need by attribute access; with MediaPipe
+installed, both also run on a real NormalizedLandmarkList protobuf.
+Run from the repository root: python benchmarks/bench_landmark_extraction.py
+"""
+
+import math
+import os
+import sys
+import timeit
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_analysis import NUM_LANDMARKS, compute_face_metrics, landmarks_to_pixels, to_pixels
+
+FRAME_WIDTH, FRAME_HEIGHT = 640, 480
+LEFT_EYE_CONTOUR = [362, 385, 387, 263, 373, 380]
+RIGHT_EYE_CONTOUR = [33, 160, 158, 133, 153, 144]
+
+
+class Landmark:
+    __slots__ = ('x', 'y', 'z')
+    
+    def __init__(self, x, y, z):
+        self.x = x
+        self.y = y
+        self.z = z
+
+
+class LandmarkList:
+    """Plain-object landmark list (attribute access only)"""
+    
+    def __init__(self, array):
+        self.landmark = [Landmark(*row) for row in array.tolist()]
+
+
+def make_mediapipe_landmarks(array):
+    """Real protobuf landmark list when MediaPipe is installed"""
+    try:
+        from mediapipe.framework.formats import landmark_pb2
+    except ImportError:
+        return None
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z in array.tolist():
+        landmark_list.landmark.add(x=x, y=y, z=z)
+    return landmark_list
+
+
+# Per-frame work of the original implementation, one landmark at a time
+def legacy_eye_center(eye_landmarks, frame_width, frame_height):
+    x_coords = [landmark.x * frame_width for landmark in eye_landmarks]
+    y_coords = [landmark.y * frame_height for landmark in eye_landmarks]
+    return (int(sum(x_coords) / len(x_coords)), int(sum(y_coords) / len(y_coords)))
+
+
+def legacy_eye_aspect_ratio(eye_landmarks, frame_width, frame_height):
+    points = [(int(landmark.x * frame_width), int(landmark.y * frame_height)) for landmark in eye_landmarks]
+    A = math.sqrt((points[1][0] - points[5][0])**2 + (points[1][1] - points[5][1])**2)
+    B = math.sqrt((points[2][0] - points[4][0])**2 + (points[2][1] - points[4][1])**2)
+    C = math.sqrt((points[0][0] - points[3][0])**2 + (points[0][1] - points[3][1])**2)
+    return (A + B) / (2.0 * C) if C > 0 else 0.3
+
+
+def legacy_frame(face_landmarks, frame_width=FRAME_WIDTH, frame_height=FRAME_HEIGHT):
+    lm = face_landmarks.landmark
+    face_width = abs(lm[454].x - lm[234].x) * frame_width
+    face_height = abs(lm[10].y - lm[152].y) * frame_height
+    face_area = face_width * face_height
+    
+    left_eye = [lm[i] for i in LEFT_EYE_CONTOUR]
+    right_eye = [lm[i] for i in RIGHT_EYE_CONTOUR]
+    left_points = [(int(p.x * frame_width), int(p.y * frame_height)) for p in left_eye]
+    right_points = [(int(p.x * frame_width), int(p.y * frame_height)) for p in right_eye]
+    centers = (legacy_eye_center(left_eye, frame_width, frame_height),
+               legacy_eye_center(right_eye, frame_width, frame_height))
+    ears = (legacy_eye_aspect_ratio(left_eye, frame_width, frame_height),
+            legacy_eye_aspect_ratio(right_eye, frame_width, frame_height))
+    
+    head_tilt = np.arctan2((lm[454].y - lm[234].y) * frame_height, (lm[454].x - lm[234].x) * frame_width) * 180 / np.pi
+    nose_y_relative = (lm[1].y - lm[10].y) / (lm[152].y - lm[10].y)
+    
+    mouth_height = abs(lm[13].y - lm[14].y)
+    mouth_width = abs(lm[61].x - lm[291].x)
+    corners_up = (lm[61].y + lm[291].y) / 2 < lm[13].y
+    
+    iris = [(int(lm[i].x * frame_width), int(lm[i].y * frame_height)) for i in range(468, 478)]
+    return face_area, left_points, right_points, centers, ears, head_tilt, nose_y_relative, mouth_height, mouth_width, corners_up, iris
+
+
+def vectorized_frame(face_landmarks, points, frame_width=FRAME_WIDTH, frame_height=FRAME_HEIGHT):
+    landmarks_to_pixels(face_landmarks, frame_width, frame_height, out=points)
+    return compute_face_metrics(points, frame_width, frame_height)
+
+
+def bench(label, func, number):
+    seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"  {label:<40} {seconds * 1e6:8.1f} us/frame")
+    return seconds
+
+
+def main():
+    rng = np.random.default_rng(0)
+    array = rng.uniform(0.2, 0.8, size=(NUM_LANDMARKS, 3)).astype(np.float32)
+    points = np.empty((NUM_LANDMARKS, 3), dtype=np.float32)
+    number = 2000
+    
+    plain = LandmarkList(array)
+    mediapipe_list = make_mediapipe_landmarks(array)
+    
+    print(f"Landmark metric extraction ({NUM_LANDMARKS} landmarks, {FRAME_WIDTH}x{FRAME_HEIGHT})")
+    legacy = bench("legacy per-landmark path", lambda: legacy_frame(plain), number)
+    vectorized = bench("vectorized", lambda: vectorized_frame(plain, points), number)
+    print(f"  legacy / vectorized time ratio: {legacy / vectorized:.2f}")
+    if mediapipe_list is not None:
+        legacy = bench("legacy, MediaPipe protobuf", lambda: legacy_frame(mediapipe_list), number)
+        vectorized = bench("vectorized, MediaPipe protobuf", lambda: vectorized_frame(mediapipe_list, points), number)
+        print(f"  legacy / vectorized time ratio on protobufs: {legacy / vectorized:.2f}")
+    
+    # Batched metrics, as used for multiple faces or whole recorded sessions
+    batch = to_pixels(np.repeat(array[None], 1000, axis=0), FRAME_WIDTH, FRAME_HEIGHT)
+    seconds = min(timeit.repeat(lambda: compute_face_metrics(batch, FRAME_WIDTH, FRAME_HEIGHT),
+                                number=20, repeat=5)) / 20
+    print(f"  {'batched metrics, 1000 frames':<40} {seconds / 1000 * 1e6:8.1f} us/frame")
+
+
+if __name__ == "__main__":
+    main()
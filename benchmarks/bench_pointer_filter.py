@@ -0,0 +1,144 @@
+"""
+Benchmark: gaze-driven pointer jitter and lag
+Generates a gaze trace at camera rate (fixations on random screen points
+with measurement noise, joined by instant saccades) and drives the
+pointer from it at the dispatcher's fixed output rate. In simulated time
+it reports jitter (RMS distance from the fixated point once settled) and
+lag (time after a saccade until the pointer is within --settle-radius of
+the new point) for the raw target and for the One Euro filter. It then
+runs the real output thread with a recording mouse in real time and
+reports the pointer update interval and capture-to-pointer latency.
+Run from the repository root:
+    python benchmarks/bench_pointer_filter.py [--noise 12] [--camera-fps 30] [--seconds 30]
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gaming_config import GAZE
+from input_dispatcher import InputDispatcher
+from landmark_recording import RecordingInput
+from signal_filters import OneEuroFilter
+
+
+class TimedRecordingInput(RecordingInput):
+    """Recording stub that also notes when each pointer move happened"""
+    
+    def __init__(self):
+        super().__init__()
+        self.move_times = []
+    
+    @property
+    def position(self):
+        return self._position
+    
+    @position.setter
+    def position(self, position):
+        self.move_times.append(time.perf_counter())
+        self._position = position
+        self.events.append(('move', position))
+
+
+def gaze_trace(seconds, camera_fps, noise, seed=0):
+    """Per camera frame (timestamp, measured (x, y), fixated (x, y)) in pixels"""
+    rng = random.Random(seed)
+    width, height = GAZE['screen_size']
+    trace = []
+    fixation = (width / 2, height / 2)
+    next_saccade = 0.0
+    for frame in range(int(seconds * camera_fps)):
+        timestamp = frame / camera_fps
+        if timestamp >= next_saccade:
+            fixation = (rng.uniform(0.1, 0.9) * width, rng.uniform(0.1, 0.9) * height)
+            next_saccade = timestamp + rng.uniform(0.6, 1.5)
+        measured = (fixation[0] + rng.gauss(0, noise), fixation[1] + rng.gauss(0, noise))
+        trace.append((timestamp, measured, fixation))
+    return trace
+
+
+def simulate(trace, pointer_rate, pointer_filter, settle_radius):
+    """Drive a pointer at pointer_rate from the latest camera sample; returns (jitter px, lag list s)"""
+    errors = []
+    lags = []
+    frame = 0
+    fixation_start = None
+    settled = True
+    duration = trace[-1][0]
+    for tick in range(int(duration * pointer_rate)):
+        now = tick / pointer_rate
+        while frame + 1 < len(trace) and trace[frame + 1][0] <= now:
+            frame += 1
+        timestamp, measured, fixation = trace[frame]
+        if frame == 0 or trace[frame - 1][2] != fixation:
+            if fixation_start != timestamp:
+                fixation_start = timestamp
+                settled = False
+        position = pointer_filter.filter(measured, now) if pointer_filter is not None else measured
+        error = math.hypot(position[0] - fixation[0], position[1] - fixation[1])
+        if not settled and error <= settle_radius:
+            settled = True
+            lags.append(now - fixation_start)
+        # Jitter once the pointer has had 0.3 s to settle on the fixation
+        if settled and now - fixation_start >= 0.3:
+            errors.append(error)
+    jitter = math.sqrt(sum(e * e for e in errors) / len(errors)) if errors else float('nan')
+    return jitter, lags
+
+
+def run_dispatcher(trace, pointer_rate, seconds):
+    """Feed the trace to a real output thread in real time; returns (update intervals ms, latency stats)"""
+    mouse = TimedRecordingInput()
+    dispatcher = InputDispatcher(mouse, mouse, pointer_rate=pointer_rate,
+                                 pointer_filter=OneEuroFilter(**GAZE['pointer_filter']))
+    dispatcher.start()
+    start = time.perf_counter()
+    for timestamp, measured, _ in trace:
+        if timestamp > seconds:
+            break
+        delay = timestamp - (time.perf_counter() - start)
+        if delay > 0:
+            time.sleep(delay)
+        dispatcher.set_pointer_target(measured, time.perf_counter())
+    dispatcher.stop()
+    return np.diff(mouse.move_times) * 1000.0, dispatcher.latency.stats().get('gaze_movement')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Jitter and lag of the gaze-driven pointer")
+    parser.add_argument('--noise', type=float, default=12.0, help="gaze measurement noise (pixels, std dev)")
+    parser.add_argument('--camera-fps', type=float, default=30.0, help="gaze samples per second")
+    parser.add_argument('--seconds', type=float, default=30.0, help="length of the simulated trace")
+    parser.add_argument('--settle-radius', type=float, default=30.0,
+                        help="distance from the fixated point that counts as arrived (pixels)")
+    parser.add_argument('--realtime-seconds', type=float, default=3.0,
+                        help="real-time run through the output thread (0 to skip)")
+    args = parser.parse_args()
+    
+    trace = gaze_trace(args.seconds, args.camera_fps, args.noise)
+    rate = GAZE['pointer_rate']
+    print(f"{len(trace)} gaze samples at {args.camera_fps:g} fps, noise {args.noise:g} px, pointer at {rate} Hz")
+    print(f"  {'filter':<12} {'jitter px':>10} {'lag p50 ms':>11} {'lag p95 ms':>11}")
+    for name, pointer_filter in (('none', None), ('one_euro', OneEuroFilter(**GAZE['pointer_filter']))):
+        jitter, lags = simulate(trace, rate, pointer_filter, args.settle_radius)
+        lags_ms = np.array(lags) * 1000.0
+        print(f"  {name:<12} {jitter:10.1f} {np.percentile(lags_ms, 50):11.1f} {np.percentile(lags_ms, 95):11.1f}")
+    
+    if args.realtime_seconds > 0:
+        intervals, latency = run_dispatcher(trace, rate, args.realtime_seconds)
+        print(f"Output thread over {args.realtime_seconds:g}s: {len(intervals) + 1} pointer moves, interval "
+              f"mean {intervals.mean():.2f} ms, p95 {np.percentile(intervals, 95):.2f} ms "
+              f"(target {1000.0 / rate:.2f} ms)")
+        if latency is not None:
+            print(f"Capture-to-pointer latency: p50 {latency['p50_ms']:.2f} ms, p95 {latency['p95_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
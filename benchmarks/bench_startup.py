@@ -0,0 +1,99 @@
+"""
+Benchmark: tracker startup time
+Measures, each in a fresh interpreter:
+  - `python -X importtime -c "import eye_tracking"`: total import time and
+    the most expensive top-level imports (MediaPipe is no longer among them;
+    it is imported on the Face Mesh startup thread and timed separately)
+  - time from `import eye_tracking` to a tracker ready for its first frame
+    (Face Mesh built and warmed up, source open), with the startup phases
+    run serially and in the background
+Run from the repository root:
+    python benchmarks/bench_startup.py [--source synthetic:1] [--runs 5] [--top 8]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SNIPPET = """
+import time
+start = time.perf_counter()
+from eye_tracking import EyeTracker
+imported = time.perf_counter()
+tracker = EyeTracker(source={source!r}, headless=True, output='null', parallel_startup={parallel})
+constructed = time.perf_counter()
+tracker.wait_until_ready()
+ready = time.perf_counter()
+print('RESULT', imported - start, constructed - imported, ready - imported)
+tracker.close()
+"""
+
+
+def run_python(arguments):
+    return subprocess.run([sys.executable] + arguments, cwd=ROOT, capture_output=True, text=True)
+
+
+def import_times(module):
+    """[(cumulative us, self us, name, depth)] from python -X importtime, or None if the import failed"""
+    result = run_python(['-X', 'importtime', '-c', f'import {module}'])
+    if result.returncode != 0:
+        return None
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        times.append((int(cumulative_us), int(self_us), name.strip(), depth))
+    return times
+
+
+def startup_time(source, parallel, runs):
+    """Median (import s, construction s, construction to ready s) over fresh interpreters"""
+    samples = []
+    for _ in range(runs):
+        result = run_python(['-c', STARTUP_SNIPPET.format(source=source, parallel=parallel)])
+        lines = [line for line in result.stdout.splitlines() if line.startswith('RESULT')]
+        if result.returncode != 0 or not lines:
+            print(result.stdout[-2000:], result.stderr[-2000:])
+            raise SystemExit(f"tracker startup failed (parallel_startup={parallel})")
+        samples.append([float(value) for value in lines[-1].split()[1:]])
+    return [statistics.median(column) for column in zip(*samples)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import and startup time of the eye tracker")
+    parser.add_argument('--source', default='synthetic:1', help="frame source spec for the startup runs")
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters per startup variant")
+    parser.add_argument('--top', type=int, default=8, help="top-level imports to list")
+    args = parser.parse_args()
+    
+    times = import_times('eye_tracking')
+    if times is None:
+        raise SystemExit("import eye_tracking failed; are the requirements installed?")
+    total = next(cumulative for cumulative, _, name, _ in times if name == 'eye_tracking')
+    print(f"import eye_tracking: {total / 1000:.1f} ms (python -X importtime)")
+    top_level = sorted((entry for entry in times if entry[3] == 1), reverse=True)[:args.top]
+    for cumulative, self_us, name, _ in top_level:
+        print(f"  {name:<28} {cumulative / 1000:8.1f} ms cumulative {self_us / 1000:8.1f} ms self")
+    loaded = {name for _, _, name, _ in times}
+    deferred = import_times('mediapipe')
+    if deferred is not None:
+        cumulative = next(value for value, _, name, _ in deferred if name == 'mediapipe')
+        print(f"  mediapipe (deferred, {'also' if 'mediapipe' in loaded else 'not'} loaded by the import): "
+              f"{cumulative / 1000:.1f} ms on its own")
+    
+    print(f"Startup with source {args.source}, median of {args.runs} fresh interpreters:")
+    print(f"  {'startup':<12} {'import ms':>10} {'init ms':>9} {'ready ms':>9}")
+    for label, parallel in (('serial', False), ('background', True)):
+        imported, constructed, ready = startup_time(args.source, parallel, args.runs)
+        print(f"  {label:<12} {imported * 1000:10.1f} {constructed * 1000:9.1f} {ready * 1000:9.1f}")
+    print("init is EyeTracker() returning; ready is when the first frame can be processed (both from import).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Per-user calibration routine
+A timed session walks the user through three phases: looking at the
+screen center with the head straight and eyes open, closing both eyes,
+and looking at each screen edge. Every frame adds one sample to running
+statistics (Welford mean/variance and min/max), so calibration costs a few
+arithmetic operations per frame and never stalls the frame loop. At the
+end, per-user thresholds and hysteresis margins are derived from the
+distributions.
+"""
+
+import math
+from collections import deque
+
+
+class RunningStats:
+    """Streaming count, mean, standard deviation, min and max (Welford's algorithm)"""
+    __slots__ = ('count', 'mean', 'm2', 'minimum', 'maximum')
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+    
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+    
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+# (phase, prompt, key into the CALIBRATION durations)
+PHASES = (
+    ('neutral', "Look at the screen center, head straight, eyes open", 'neutral_seconds'),
+    ('closed', "Close both eyes", 'closed_seconds'),
+    ('gaze', "Look at each screen edge, keep your head still", 'gaze_seconds')
+)
+
+
+class CalibrationSession:
+    """Collects baseline samples phase by phase and derives thresholds when done"""
+    
+    def __init__(self, settings, start_time):
+        self.settings = settings
+        self.phase_index = 0
+        self.phase_start = start_time
+        self.done = False
+        
+        self.open_ear = RunningStats()
+        self.closed_ear = RunningStats()
+        self.nose_y = RunningStats()
+        self.tilt = RunningStats()
+        self.brow = RunningStats()
+        self.yaw = RunningStats()
+        self.pitch = RunningStats()
+        self.gaze_x = RunningStats()
+        self.gaze_y = RunningStats()
+        self.extent_x = RunningStats()
+        self.extent_y = RunningStats()
+        self._recent_gaze = deque(maxlen=settings['gaze_smoothing_frames'])
+        
+        print(f"Calibration: {self.prompt}")
+    
+    @property
+    def phase(self):
+        return PHASES[self.phase_index][0]
+    
+    @property
+    def prompt(self):
+        return PHASES[self.phase_index][1]
+    
+    def progress(self, timestamp):
+        """Fraction of the current phase that has elapsed"""
+        duration = self.settings[PHASES[self.phase_index][2]]
+        return min(1.0, (timestamp - self.phase_start) / duration)
+    
+    def add(self, face_info, timestamp):
+        """Add one frame's measurements (None when no usable face); advances phases as time runs out"""
+        if self.done:
+            return
+        
+        # Samples from the first moments of a phase are skipped while the user follows the prompt
+        if face_info is not None and timestamp - self.phase_start >= self.settings['settle_seconds']:
+            left_ear, right_ear = face_info['ears']
+            gaze_x, gaze_y = face_info['gaze']
+            if self.phase == 'neutral':
+                self.open_ear.add(left_ear)
+                self.open_ear.add(right_ear)
+                self.nose_y.add(face_info['nose_y_relative'])
+                self.tilt.add(face_info['head_tilt'])
+                self.brow.add(face_info['brow_height'])
+                if 'head_pose' in face_info:
+                    yaw, pitch, _ = face_info['head_pose']
+                    self.yaw.add(yaw)
+                    self.pitch.add(pitch)
+                self.gaze_x.add(gaze_x)
+                self.gaze_y.add(gaze_y)
+            elif self.phase == 'closed':
+                self.closed_ear.add(left_ear)
+                self.closed_ear.add(right_ear)
+            else:
+                # Extents of the smoothed gaze, so single noisy frames do not stretch them
+                self._recent_gaze.append((gaze_x, gaze_y))
+                if len(self._recent_gaze) == self._recent_gaze.maxlen:
+                    self.extent_x.add(sum(x for x, _ in self._recent_gaze) / len(self._recent_gaze))
+                    self.extent_y.add(sum(y for _, y in self._recent_gaze) / len(self._recent_gaze))
+        
+        if self.progress(timestamp) >= 1.0:
+            if self.phase_index + 1 < len(PHASES):
+                self.phase_index += 1
+                self.phase_start = timestamp
+                print(f"Calibration: {self.prompt}")
+            else:
+                self.done = True
+    
+    def results(self, current_thresholds):
+        """Derive (thresholds, hysteresis) from the collected samples
+        
+        Parts without enough samples (e.g. no face during a phase, or eyes that
+        were not closed) are left out and reported, so their current values stay.
+        """
+        min_samples = self.settings['min_samples']
+        thresholds = {}
+        hysteresis = {}
+        
+        # Blink threshold halfway between the open and closed eye distributions
+        gap = self.open_ear.mean - self.closed_ear.mean
+        if self.open_ear.count < min_samples or self.closed_ear.count < min_samples:
+            print("Calibration: not enough eye samples; blink thresholds unchanged")
+        elif gap < self.settings['min_ear_gap']:
+            print("Calibration: eyes did not close clearly; blink thresholds unchanged")
+        else:
+            thresholds['blink_ear'] = self.closed_ear.mean + gap / 2
+            thresholds['wink_open_margin'] = gap / 4
+            hysteresis['blink_ear'] = max(gap / 8, self.closed_ear.std)
+        
+        # Head: neutral pose as the center, trigger margins well outside its jitter
+        if self.nose_y.count < min_samples:
+            print("Calibration: not enough head pose samples; head thresholds unchanged")
+        else:
+            thresholds['head_nod_center'] = self.nose_y.mean
+            thresholds['head_tilt_center'] = self.tilt.mean
+            nod_offset = max(current_thresholds['head_nod_offset'], 4 * self.nose_y.std)
+            tilt_angle = max(current_thresholds['head_tilt_angle'], 4 * self.tilt.std)
+            thresholds['head_nod_offset'] = nod_offset
+            thresholds['head_tilt_angle'] = tilt_angle
+            hysteresis['head_nod'] = max(2 * self.nose_y.std, 0.2 * nod_offset)
+            hysteresis['head_tilt_angle'] = max(2 * self.tilt.std, 0.2 * tilt_angle)
+        # Neutral eyebrow height as the center of the eyebrow raise
+        if self.brow.count >= min_samples:
+            brow_offset = max(current_thresholds['eyebrow_raise_offset'], 4 * self.brow.std)
+            thresholds['eyebrow_raise_center'] = self.brow.mean
+            thresholds['eyebrow_raise_offset'] = brow_offset
+            hysteresis['eyebrow_raise'] = max(2 * self.brow.std, 0.2 * brow_offset)
+        # Neutral yaw and pitch center the analog head axes
+        if self.yaw.count >= min_samples:
+            thresholds['head_yaw_center'] = self.yaw.mean
+            thresholds['head_pitch_center'] = self.pitch.mean
+        
+        # Gaze: neutral gaze as the center, trigger 60% of the way to the extents the user reached
+        if self.gaze_x.count < min_samples or self.extent_x.count < min_samples:
+            print("Calibration: not enough gaze samples; gaze thresholds unchanged")
+        else:
+            thresholds['gaze_center_x'] = self.gaze_x.mean
+            thresholds['gaze_center_y'] = self.gaze_y.mean
+            margins = []
+            for axis, neutral, extent in (('x', self.gaze_x, self.extent_x), ('y', self.gaze_y, self.extent_y)):
+                reach = (extent.maximum - extent.minimum) / 2
+                if reach < self.settings['min_gaze_reach']:
+                    print(f"Calibration: gaze barely moved along {axis}; gaze_offset_{axis} unchanged")
+                    offset = current_thresholds[f'gaze_offset_{axis}']
+                else:
+                    offset = max(0.6 * reach, 4 * neutral.std)
+                    thresholds[f'gaze_offset_{axis}'] = offset
+                margins.append(max(2 * neutral.std, 0.1 * offset))
+            hysteresis['gaze_boundary'] = max(margins)
+        return thresholds, hysteresis
@@ -1,110 +1,223 @@
+import argparse
 import cv2
 import numpy as np
-import mediapipe as mp
 import time
-import math
+from collections import deque
+from calibration import CalibrationSession
 from gaming_controller import GamingGestureController
+from face_analysis import (EYE_CONTOURS, FOREHEAD, IRISES, NUM_LANDMARKS, FaceAnalyzer, landmarks_to_pixels,
+                           mirror_landmarks, to_normalized, to_pixels)
+from frame_sources import FrameBufferRing, open_source
+from gaming_config import (CALIBRATION, GAME_MODES, GAZE, INFERENCE, MULTIPLAYER, OUTPUT, PERFORMANCE,
+                           VISUAL_FEEDBACK, get_all_game_modes)
+from hud import HudCache
+from gaze_estimation import GazeCalibrationSession
+from inference_scheduler import FaceMeshScheduler
+from landmark_recording import LandmarkRecorder
+from output_backends import OUTPUT_BACKENDS, open_output
+from pipeline import TrackingPipeline
+from player_tracking import PlayerTracker
+from profiler import AllocationMonitor, StageProfiler
+from startup import BackgroundTask, StartupTimer
+from user_profiles import ProfileWatcher
+
+# Reusable per-frame landmark buffers of the single-threaded loop (the pipeline pools its own)
+POINT_BUFFERS = 8
+
+# Player label colors (BGR) for P1-P4
+PLAYER_COLORS = [(0, 255, 0), (255, 128, 0), (0, 128, 255), (255, 0, 255)]
+
+WINDOW_NAME = 'Eye Tracking Gaming Controller'
 
 class EyeTracker:
-    def __init__(self):
-        # Initialize MediaPipe Face Mesh
-        self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
-        self.mp_drawing = mp.solutions.drawing_utils
-        self.mp_drawing_styles = mp.solutions.drawing_styles
-        
-        # Eye landmark indices for MediaPipe (468 landmarks)
-        self.LEFT_EYE = [362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398]
-        self.RIGHT_EYE = [33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246]
-        
-        # Eye contour for drawing
-        self.LEFT_EYE_CONTOUR = [362, 385, 387, 263, 373, 380]
-        self.RIGHT_EYE_CONTOUR = [33, 160, 158, 133, 153, 144]
-        
-        # Initialize webcam
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
-            raise ValueError("Could not open webcam")
-        
-        # Set webcam properties for better performance
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.cap.set(cv2.CAP_PROP_FPS, 30)
-        
-        # Initialize gaming controller
-        self.gaming_controller = GamingGestureController()
+    def __init__(self, source=None, headless=False, record_path=None, adaptive=False,
+                 profile=False, profile_dump=None, trace_alloc=False, players=1, input_controller=None,
+                 user_profile=None, output=None, kiosk=False, parallel_startup=True):
+        # Every startup phase is timed; the slow, independent ones run in the background
+        self.startup = StartupTimer()
+        
+        # One face per player
+        self.players = max(1, min(players, MULTIPLAYER['max_players']))
+        
+        # MediaPipe is imported, and Face Mesh built and warmed up, on a startup thread;
+        # face_mesh is set once it is ready (see wait_until_ready)
+        self.face_mesh = None
+        self.face_mesh_task = BackgroundTask('facemesh-startup', self._load_face_mesh, parallel_startup)
+        
+        # Optional adaptive scheduling: ROI crops, periodic full detection and extrapolated frames
+        # (created with the Face Mesh)
+        self.adaptive = adaptive
+        self.scheduler = None
+        
+        # Initialize frame source: a source object, or an open_source spec (None is the webcam)
+        # opened on another startup thread
+        if source is None or isinstance(source, str):
+            self.cap = None
+            self.source_task = BackgroundTask('camera-startup', lambda: self._open_source(source), parallel_startup)
+        else:
+            self.cap = source
+            self.source_task = None
+        
+        # Headless mode skips all drawing and the preview window; kiosk mode shows the
+        # camera preview without the HUD (calibration prompts still appear while one runs)
+        self.headless = headless
+        self.kiosk = kiosk
+        
+        # Static HUD strings are rendered once and composited; per-frame values use putText
+        self.hud = HudCache(VISUAL_FEEDBACK['hud_cache_layers'])
+        
+        # Reused buffers: captured frames, the RGB copy for MediaPipe, the mirrored preview and landmarks.
+        # The camera frame is never flipped; landmarks are mirrored instead.
+        self.frame_buffers = FrameBufferRing(1)
+        self.rgb_buffers = FrameBufferRing(1)
+        self.display_buffers = FrameBufferRing(1)
+        self.point_buffers = FrameBufferRing(POINT_BUFFERS)
+        # Landmarks the tracker does not read are never converted and stay NaN
+        self.landmark_scratch = np.full((NUM_LANDMARKS, 3), np.nan, dtype=np.float32)
+        self.alloc_monitor = AllocationMonitor() if trace_alloc else None
+        
+        # Optional landmark session recording (created on the first frame)
+        self.record_path = record_path
+        self.recorder = None
+        
+        # Per-stage profiler (a no-op unless profiling or a dump file is requested)
+        self.profiler = StageProfiler(enabled=profile or profile_dump is not None, dump_path=profile_dump,
+                                      frame_budget_ms=1000.0 / PERFORMANCE['max_fps'])
+        
+        controllers_start = time.perf_counter()
+        
+        # Output backend by name (input_controller replaces it, e.g. to forward events elsewhere)
+        self.owns_output = input_controller is None
+        self.output = input_controller if input_controller is not None else open_output(output or OUTPUT['backend'])
+        
+        # Initialize gaming controller and the landmark analyzer that feeds it
+        self.gaming_controller = GamingGestureController(output=self.output)
+        self.face_analyzer = FaceAnalyzer(self.gaming_controller, self.profiler)
+        
+        # Extra players get their own controller (gesture state and keys) sharing player 1's output thread
+        self.controllers = [self.gaming_controller] + [
+            GamingGestureController(dispatcher=self.gaming_controller.dispatcher, player=player)
+            for player in range(2, self.players + 1)
+        ]
+        self.player_tracker = PlayerTracker(self.players, MULTIPLAYER['match_distance'],
+                                            MULTIPLAYER['max_missing_frames'])
+        
+        # Preview window keys (handle_key, render thread) queue commands that the thread running
+        # gesture detection applies between frames (apply_commands), as with profile reloads
+        self.key_commands = {ord(str(number)): (self.set_game_mode, mode)
+                             for number, mode in enumerate(get_all_game_modes()[:9], start=1)}
+        self.key_commands.update({ord('g'): (self.toggle_gestures,), ord('c'): (self.start_calibration,),
+                                  ord('v'): (self.start_gaze_calibration,)})
+        self.pending_commands = deque()
+        
+        # Running calibration session ('c' key) and whether gestures were on before it
+        self.calibration = None
+        self.gestures_before_calibration = True
+        
+        # Running 9-point gaze calibration ('v' key), drawn full screen on a reused canvas
+        self.gaze_calibration = None
+        self.gaze_canvas = None
+        self.gaze_window_open = False
+        
+        # Optional user profile, applied to every player and reloaded between frames when the file changes
+        self.profile_watcher = None
+        if user_profile is not None:
+            self.profile_watcher = ProfileWatcher(user_profile)
+            profile = self.profile_watcher.load()
+            if profile is not None:
+                self.apply_profile(profile)
+        self.startup.add('controllers', controllers_start, time.perf_counter())
         
         print("Eye Tracker with Gaming Controls initialized successfully!")
         print("Controls:")
         print("  'q' - Quit")
-        print("  '1' - FPS Mode")
-        print("  '2' - Racing Mode")
-        print("  '3' - Strategy Mode")
-        print("  '4' - Platformer Mode")
+        for number, mode in enumerate(get_all_game_modes()[:9], start=1):
+            print(f"  '{number}' - {GAME_MODES[mode]['name']} Mode")
         print("  'g' - Toggle Gestures On/Off")
-        print("  'c' - Calibrate")
+        print("  'c' - Calibrate (saved to the user profile with --user-profile)")
+        print("  'v' - 9-point gaze calibration")
+        print("Run with --pipelined to use the threaded capture/inference/render pipeline")
     
-    def get_eye_center(self, eye_landmarks, frame_width, frame_height):
-        """Calculate the center of the eye region from MediaPipe landmarks"""
-        x_coords = [landmark.x * frame_width for landmark in eye_landmarks]
-        y_coords = [landmark.y * frame_height for landmark in eye_landmarks]
-        center_x = int(sum(x_coords) / len(x_coords))
-        center_y = int(sum(y_coords) / len(y_coords))
-        return (center_x, center_y)
+    def _load_face_mesh(self):
+        """Import MediaPipe, build the Face Mesh graph and run it once so the first camera frame is not the slow one"""
+        with self.startup.phase('import mediapipe'):
+            import mediapipe as mp
+        with self.startup.phase('facemesh build'):
+            self.mp_face_mesh = mp.solutions.face_mesh
+            face_mesh = self.mp_face_mesh.FaceMesh(
+                max_num_faces=self.players,
+                refine_landmarks=True,
+                min_detection_confidence=0.5,
+                min_tracking_confidence=0.5
+            )
+            self.mp_drawing = mp.solutions.drawing_utils
+            self.mp_drawing_styles = mp.solutions.drawing_styles
+        # The model is loaded on the first process() call
+        with self.startup.phase('facemesh warm-up'):
+            face_mesh.process(np.zeros((480, 640, 3), dtype=np.uint8))
+        return face_mesh
     
-    def get_eye_aspect_ratio(self, eye_landmarks, frame_width, frame_height):
-        """Calculate Eye Aspect Ratio (EAR) to detect blinks using MediaPipe landmarks"""
-        # Convert landmarks to pixel coordinates
-        points = [(int(landmark.x * frame_width), int(landmark.y * frame_height)) for landmark in eye_landmarks]
-        
-        # For MediaPipe, we use specific points for EAR calculation
-        # Vertical distances
-        if len(points) >= 6:
-            A = math.sqrt((points[1][0] - points[5][0])**2 + (points[1][1] - points[5][1])**2)
-            B = math.sqrt((points[2][0] - points[4][0])**2 + (points[2][1] - points[4][1])**2)
-            # Horizontal distance
-            C = math.sqrt((points[0][0] - points[3][0])**2 + (points[0][1] - points[3][1])**2)
-            
-            if C > 0:
-                ear = (A + B) / (2.0 * C)
-                return ear
-        return 0.3  # Default value if calculation fails
+    def _open_source(self, spec):
+        with self.startup.phase('camera open'):
+            return open_source(spec)
     
-    def calculate_face_distance(self, face_landmarks, frame_width, frame_height):
-        """Calculate relative distance based on face landmark spread"""
-        # Use key face points to estimate face size
-        # Points: left face edge, right face edge, top of forehead, bottom of chin
-        left_face = face_landmarks.landmark[234]  # Left face edge
-        right_face = face_landmarks.landmark[454]  # Right face edge
-        top_head = face_landmarks.landmark[10]    # Top of forehead
-        bottom_chin = face_landmarks.landmark[152] # Bottom of chin
-        
-        # Calculate face width and height in pixels
-        face_width = abs(right_face.x - left_face.x) * frame_width
-        face_height = abs(top_head.y - bottom_chin.y) * frame_height
-        
-        # Calculate face area as a measure of distance
-        face_area = face_width * face_height
-        
-        return face_area, face_width, face_height
+    def wait_until_ready(self):
+        """Wait for the startup threads (re-raising their errors) and report the startup time"""
+        if self.face_mesh is not None:
+            return
+        if self.cap is None:
+            self.cap = self.source_task.result()
+        face_mesh = self.face_mesh_task.result()
+        if self.adaptive:
+            self.scheduler = FaceMeshScheduler(face_mesh, PERFORMANCE['max_fps'], **INFERENCE)
+        self.face_mesh = face_mesh
+        self.startup.print_summary("Ready after")
+    
+    def show_starting_preview(self):
+        """Show a 'Starting...' preview (the live camera once it is open) until startup finishes;
+        returns False if the user quit meanwhile"""
+        if self.headless:
+            return True
+        tasks = [task for task in (self.face_mesh_task, self.source_task) if task is not None]
+        blank = None
+        while not all(task.done() for task in tasks):
+            if self.cap is None and self.source_task.done():
+                self.cap = self.source_task.result()
+            ret, frame = False, None
+            if self.cap is not None and self.cap.live:
+                ret, frame = self.frame_buffers.read(self.cap)
+            if ret:
+                frame = self.mirror_frame(frame)
+            else:
+                if blank is None:
+                    blank = np.zeros((480, 640, 3), dtype=np.uint8)
+                frame = blank
+            self.hud.draw_text(frame, "Starting...", (10, 30), 0.8, (0, 255, 255), 2)
+            cv2.imshow(WINDOW_NAME, frame)
+            if cv2.waitKey(1 if ret else 30) & 0xFF == ord('q'):
+                return False
+        return True
+    
+    def start(self):
+        """Finish startup behind the starting preview; returns False (with the tracker closed) if the user quit"""
+        try:
+            if self.show_starting_preview():
+                self.wait_until_ready()
+                return True
+        except Exception:
+            self.close()
+            raise
+        self.close()
+        return False
     
     def check_distance_and_prompt(self, frame, face_area, face_width, face_height):
         """Check if user is too far and display prompt"""
-        # Thresholds for distance detection (adjust based on testing)
-        min_face_area = 15000  # Minimum face area in pixels
-        min_face_width = 100   # Minimum face width in pixels
-        
         frame_height, frame_width = frame.shape[:2]
         
-        if face_area < min_face_area or face_width < min_face_width:
+        if self.face_analyzer.is_too_far(face_area, face_width):
             # User is too far - display prompt
             prompt_text = "Please move closer to the camera"
-            text_size = cv2.getTextSize(prompt_text, cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2)[0]
+            text_size = self.hud.text_size(prompt_text, 0.8, 2)[0]
             
             # Center the text
             text_x = (frame_width - text_size[0]) // 2
@@ -116,8 +229,7 @@ class EyeTracker:
                          (0, 0, 0), -1)
             
             # Draw the prompt text
-            cv2.putText(frame, prompt_text, (text_x, text_y), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+            self.hud.draw_text(frame, prompt_text, (text_x, text_y), 0.8, (0, 255, 255), 2)
             
             # Draw arrow pointing towards camera
             arrow_start = (frame_width // 2, text_y + 50)
@@ -128,172 +240,484 @@ class EyeTracker:
         
         return False  # User is at good distance
     
-    def draw_eye_tracking_info(self, frame, face_landmarks):
-        """Draw eye tracking information on the frame using MediaPipe landmarks"""
-        frame_height, frame_width = frame.shape[:2]
-        
-        # Extract eye landmarks
-        left_eye_landmarks = [face_landmarks.landmark[i] for i in self.LEFT_EYE_CONTOUR]
-        right_eye_landmarks = [face_landmarks.landmark[i] for i in self.RIGHT_EYE_CONTOUR]
+    def draw_eye_tracking_info(self, frame, face_info):
+        """Draw eye tracking information for an analyzed face on the frame"""
+        points = face_info['points']
         
         # Draw eye contours
-        left_eye_points = [(int(landmark.x * frame_width), int(landmark.y * frame_height)) for landmark in left_eye_landmarks]
-        right_eye_points = [(int(landmark.x * frame_width), int(landmark.y * frame_height)) for landmark in right_eye_landmarks]
-        
-        cv2.polylines(frame, [np.array(left_eye_points)], True, (0, 255, 0), 1)
-        cv2.polylines(frame, [np.array(right_eye_points)], True, (0, 255, 0), 1)
-        
-        # Calculate eye centers
-        left_eye_center = self.get_eye_center(left_eye_landmarks, frame_width, frame_height)
-        right_eye_center = self.get_eye_center(right_eye_landmarks, frame_width, frame_height)
+        eye_contours = points[EYE_CONTOURS, :2].astype(np.int32)
+        cv2.polylines(frame, list(eye_contours), True, (0, 255, 0), 1)
         
         # Draw eye centers
-        cv2.circle(frame, left_eye_center, 3, (255, 0, 0), -1)
-        cv2.circle(frame, right_eye_center, 3, (255, 0, 0), -1)
-        
-        # Calculate Eye Aspect Ratios
-        left_ear = self.get_eye_aspect_ratio(left_eye_landmarks, frame_width, frame_height)
-        right_ear = self.get_eye_aspect_ratio(right_eye_landmarks, frame_width, frame_height)
-        avg_ear = (left_ear + right_ear) / 2.0
-        
-        # Send blink data to gaming controller
-        self.gaming_controller.detect_blink_pattern(left_ear, right_ear, time.time())
-        
-        # Send gaze data to gaming controller
-        self.gaming_controller.detect_gaze_movement(left_eye_center, right_eye_center, frame_width, frame_height)
-        
-        # Send head movement data to gaming controller
-        self.gaming_controller.detect_head_movement(face_landmarks, frame_width, frame_height)
-        
-        # Send facial expression data to gaming controller
-        self.gaming_controller.detect_facial_expressions(face_landmarks)
+        cv2.circle(frame, face_info['left_eye_center'], 3, (255, 0, 0), -1)
+        cv2.circle(frame, face_info['right_eye_center'], 3, (255, 0, 0), -1)
         
         # Detect blink (EAR threshold typically around 0.25)
+        avg_ear = face_info['avg_ear']
         blink_threshold = 0.25
         if avg_ear < blink_threshold:
-            cv2.putText(frame, "BLINK DETECTED", (10, 30), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            self.hud.draw_text(frame, "BLINK DETECTED", (10, 30), 0.7, (0, 0, 255), 2)
         
         # Display EAR value
         cv2.putText(frame, f"EAR: {avg_ear:.2f}", (10, 60), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
         
         # Draw iris landmarks (MediaPipe provides iris tracking)
-        left_iris = [face_landmarks.landmark[i] for i in [468, 469, 470, 471, 472]]
-        right_iris = [face_landmarks.landmark[i] for i in [473, 474, 475, 476, 477]]
-        
-        for iris_landmark in left_iris:
-            x = int(iris_landmark.x * frame_width)
-            y = int(iris_landmark.y * frame_height)
-            cv2.circle(frame, (x, y), 1, (0, 255, 255), -1)
-        
-        for iris_landmark in right_iris:
-            x = int(iris_landmark.x * frame_width)
-            y = int(iris_landmark.y * frame_height)
+        for x, y in points[IRISES, :2].reshape(-1, 2).astype(np.int32).tolist():
             cv2.circle(frame, (x, y), 1, (0, 255, 255), -1)
         
         return frame
     
-    def run(self):
-        """Main loop for eye tracking using MediaPipe"""
-        print("Starting eye tracking... Press 'q' to quit")
+    def apply_profile(self, profile):
+        """Apply a user profile to every player's controller"""
+        for controller in self.controllers:
+            controller.apply_profile(profile)
+        print(f"Profile '{profile.get('name', self.profile_watcher.path)}' applied")
+    
+    def check_profile(self):
+        """Swap in the user profile if its file changed (stats the file at most once a second)"""
+        if self.profile_watcher is not None:
+            profile = self.profile_watcher.poll()
+            if profile is not None:
+                self.apply_profile(profile)
+    
+    def apply_commands(self):
+        """Run the commands queued by handle_key, on the thread that runs gesture detection"""
+        commands = self.pending_commands
+        while commands:
+            method, *args = commands.popleft()
+            method(*args)
+    
+    def set_game_mode(self, mode):
+        """Switch every player to a game mode"""
+        for controller in self.controllers:
+            controller.set_game_mode(mode)
+    
+    def toggle_gestures(self):
+        """Turn gesture detection on or off for every player"""
+        for controller in self.controllers:
+            controller.toggle_gestures()
+    
+    def start_calibration(self):
+        """Start a timed calibration session for player 1 (or cancel the running one)"""
+        controller = self.gaming_controller
+        if self.calibration is not None:
+            self.calibration = None
+            controller.gesture_enabled = self.gestures_before_calibration
+            print("Calibration cancelled")
+            return
+        if self.gaze_calibration is not None:
+            print("Gaze calibration is running; press 'v' to cancel it first")
+            return
+        # Closing the eyes and looking around must not trigger gestures
+        self.gestures_before_calibration = controller.gesture_enabled
+        controller.gesture_enabled = False
+        controller.release_held_keys()
+        self.calibration = CalibrationSession(CALIBRATION, time.time())
+    
+    def update_calibration(self, session, faces, timestamp):
+        """Feed player 1's measurements to the running calibration session; finish it when done"""
+        face_info = next((face_info for face_info in faces if face_info['player'] == 0 and not face_info['too_far']),
+                         None)
+        session.add(face_info, timestamp)
+        if not session.done:
+            return
         
-        while True:
-            ret, frame = self.cap.read()
-            if not ret:
-                print("Failed to grab frame")
-                break
-            
-            # Flip frame horizontally for mirror effect
-            frame = cv2.flip(frame, 1)
-            
+        self.calibration = None
+        controller = self.gaming_controller
+        thresholds, hysteresis = session.results(controller.base_thresholds)
+        controller.apply_calibration(thresholds, hysteresis)
+        controller.gesture_enabled = self.gestures_before_calibration
+        print("Calibration complete: " + ", ".join(f"{name} {value:.3f}" for name, value in thresholds.items()))
+        if self.profile_watcher is not None:
+            self.save_calibration()
+    
+    def start_gaze_calibration(self):
+        """Start the 9-point gaze calibration for player 1 (or cancel the running one)"""
+        controller = self.gaming_controller
+        if self.gaze_calibration is not None:
+            self.gaze_calibration = None
+            controller.gesture_enabled = self.gestures_before_calibration
+            print("Gaze calibration cancelled")
+            return
+        if self.headless:
+            print("Gaze calibration needs the preview window (run without --headless)")
+            return
+        if self.calibration is not None:
+            print("Calibration is running; press 'c' to cancel it first")
+            return
+        self.gestures_before_calibration = controller.gesture_enabled
+        controller.gesture_enabled = False
+        controller.release_held_keys()
+        self.gaze_calibration = GazeCalibrationSession(GAZE, time.time())
+    
+    def update_gaze_calibration(self, session, faces, timestamp):
+        """Feed player 1's iris offset to the gaze calibration; fit and apply the mapping when done"""
+        face_info = next((face_info for face_info in faces if face_info['player'] == 0 and not face_info['too_far']),
+                         None)
+        session.add(face_info['iris_gaze'] if face_info is not None else None, timestamp)
+        if not session.done:
+            return
+        
+        self.gaze_calibration = None
+        controller = self.gaming_controller
+        gaze_mapper = session.result(GAZE['default_gain'])
+        if gaze_mapper is not None:
+            controller.apply_gaze_calibration(gaze_mapper)
+            self.save_calibration()
+        controller.gesture_enabled = self.gestures_before_calibration
+    
+    def draw_gaze_calibration(self):
+        """Show the current gaze target full screen, with a ring that shrinks while it is measured"""
+        session = self.gaze_calibration
+        if session is None:
+            if self.gaze_window_open:
+                cv2.destroyWindow('Gaze Calibration')
+                self.gaze_window_open = False
+            return
+        if not self.gaze_window_open:
+            cv2.namedWindow('Gaze Calibration', cv2.WINDOW_NORMAL)
+            cv2.setWindowProperty('Gaze Calibration', cv2.WND_PROP_FULLSCREEN, cv2.WINDOW_FULLSCREEN)
+            self.gaze_window_open = True
+        if self.gaze_canvas is None:
+            screen_width, screen_height = GAZE['screen_size']
+            self.gaze_canvas = np.zeros((screen_height // 2, screen_width // 2, 3), dtype=np.uint8)
+        
+        canvas = self.gaze_canvas
+        canvas.fill(0)
+        canvas_height, canvas_width = canvas.shape[:2]
+        x, y = session.target
+        center = (int(x * canvas_width), int(y * canvas_height))
+        radius = int(8 + 30 * (1.0 - session.progress(time.time())))
+        cv2.circle(canvas, center, radius, (0, 255, 255), 2)
+        cv2.circle(canvas, center, 5, (0, 0, 255), -1)
+        self.hud.draw_text(canvas, f"Look at the dot ({session.target_index + 1}/{len(session.targets)}), 'v' cancels",
+                           (20, canvas_height - 20), 0.6, (200, 200, 200), 1)
+        cv2.imshow('Gaze Calibration', canvas)
+    
+    def draw_calibration(self, frame):
+        """Draw the calibration prompt and phase progress"""
+        session = self.calibration
+        if session is None:
+            return
+        frame_width = frame.shape[1]
+        cv2.rectangle(frame, (0, 0), (frame_width, 50), (0, 0, 0), -1)
+        self.hud.draw_text(frame, f"Calibration: {session.prompt}", (10, 22), 0.55, (0, 255, 255), 2)
+        progress = int(session.progress(time.time()) * (frame_width - 20))
+        cv2.rectangle(frame, (10, 34), (10 + progress, 42), (0, 255, 255), -1)
+    
+    def save_calibration(self):
+        """Write the current game mode, sensitivities, thresholds and hysteresis to the user profile"""
+        if self.profile_watcher is None:
+            return
+        profile = dict(self.profile_watcher.profile or {})
+        profile['game_mode'] = self.gaming_controller.current_mode
+        profile.update(self.gaming_controller.calibration_settings())
+        self.profile_watcher.save(profile)
+        print(f"Calibration saved to {self.profile_watcher.path}")
+    
+    def process_frame(self, frame, timestamp=None, capture_time=None, points=None):
+        """Run FaceMesh and gesture detection on an unmirrored camera BGR frame
+        
+        Landmarks are mirrored to match the mirrored preview instead of flipping the frame.
+        
+        capture_time (perf_counter) is carried into triggered input events for latency measurement.
+        points is a (players, 478, 3) float32 buffer for the landmarks the returned faces refer to
+        (default: the next one of the tracker's ring).
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        if self.face_mesh is None:
+            self.wait_until_ready()
+        frame_height, frame_width = frame.shape[:2]
+        
+        # Profile changes and key commands land between frames, on the thread that runs gesture detection
+        self.check_profile()
+        self.apply_commands()
+        
+        profiler = self.profiler
+        # All faces of the frame go into one (faces, 478, 3) buffer for batched metrics
+        batch = points if points is not None else self.point_buffers.next((self.players, NUM_LANDMARKS, 3), np.float32)
+        if self.scheduler is not None:
+            # The scheduler decides between a full-frame pass, an ROI pass and extrapolation
+            with profiler.span('facemesh'):
+                face_landmarks = self.scheduler.process(frame, timestamp)[:self.players]
+            with profiler.span('landmarks'):
+                for face, landmarks in enumerate(face_landmarks):
+                    to_pixels(landmarks, frame_width, frame_height, out=self.landmark_scratch)
+                    mirror_landmarks(self.landmark_scratch, frame_width, out=batch[face])
+        else:
             # Convert BGR to RGB for MediaPipe
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            with profiler.span('color_convert'):
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.rgb_buffers.next(frame.shape))
             
             # Process the frame with MediaPipe
-            results = self.face_mesh.process(rgb_frame)
+            with profiler.span('facemesh'):
+                results = self.face_mesh.process(rgb_frame)
+            
+            # One conversion per face; all metrics work on the pixel array
+            face_landmarks = (results.multi_face_landmarks or [])[:self.players]
+            with profiler.span('landmarks'):
+                for face, landmarks in enumerate(face_landmarks):
+                    landmarks_to_pixels(landmarks, frame_width, frame_height, out=self.landmark_scratch)
+                    mirror_landmarks(self.landmark_scratch, frame_width, out=batch[face])
+        points = batch[:len(face_landmarks)]
+        
+        # Stable player slots; players gone for too long release their held keys and restart their filters
+        slots, dropped = self.player_tracker.assign(points, frame_width)
+        for slot in dropped:
+            self.controllers[slot].release_held_keys()
+            self.controllers[slot].reset_filters()
+        
+        controllers = [self.controllers[slot] if slot is not None else None for slot in slots]
+        faces = self.face_analyzer.analyze_faces(points, frame_width, frame_height, timestamp, controllers, capture_time)
+        for face_info, slot in zip(faces, slots):
+            face_info['player'] = slot
+        
+        session = self.calibration
+        if session is not None:
+            self.update_calibration(session, faces, timestamp)
+        session = self.gaze_calibration
+        if session is not None:
+            self.update_gaze_calibration(session, faces, timestamp)
+        
+        if self.record_path:
+            if self.recorder is None:
+                self.recorder = LandmarkRecorder(self.record_path, frame_width, frame_height)
+            first_player = next((face_info for face_info in faces if face_info['player'] == 0), None)
+            self.recorder.write(timestamp, to_normalized(first_player['points'], frame_width, frame_height)
+                                if first_player is not None else None)
+        return faces
+    
+    def mirror_frame(self, frame):
+        """Flip a camera frame into the reused preview buffer for display"""
+        return cv2.flip(frame, 1, dst=self.display_buffers.next(frame.shape))
+    
+    def render_frame(self, frame, faces):
+        """Draw the overlay for the analyzed faces onto the frame"""
+        if self.kiosk:
+            self.draw_calibration(frame)
+            self.draw_gaze_calibration()
+            return frame
+        
+        hud = self.hud
+        status = self.gaming_controller.get_status_info()
+        for face_info in faces:
+            # Check distance and show prompt if too far
+            self.check_distance_and_prompt(frame, face_info['face_area'], face_info['face_width'], face_info['face_height'])
+            
+            # Player label above the forehead when several players are tracked
+            if self.players > 1 and face_info['player'] is not None:
+                x, y = face_info['points'][FOREHEAD, :2].astype(np.int32).tolist()
+                hud.draw_text(frame, f"P{face_info['player'] + 1}", (x - 12, y - 10), 0.7,
+                              PLAYER_COLORS[face_info['player']], 2)
+            
+            # Only draw detailed eye tracking if user is close enough
+            if not face_info['too_far']:
+                # Draw eye tracking information
+                frame = self.draw_eye_tracking_info(frame, face_info)
+                
+                # Show "Good Distance" indicator
+                hud.draw_text(frame, "Good Distance ✓", (10, 170), 0.5, (0, 255, 0), 1)
             
-            # Draw face mesh and eye tracking info
-            if results.multi_face_landmarks:
-                for face_landmarks in results.multi_face_landmarks:
-                    frame_height, frame_width = frame.shape[:2]
-                    
-                    # Calculate face distance
-                    face_area, face_width, face_height = self.calculate_face_distance(
-                        face_landmarks, frame_width, frame_height)
-                    
-                    # Check distance and show prompt if too far
-                    is_too_far = self.check_distance_and_prompt(frame, face_area, face_width, face_height)
-                    
-                    # Only draw detailed eye tracking if user is close enough
-                    if not is_too_far:
-                        # Draw eye tracking information
-                        frame = self.draw_eye_tracking_info(frame, face_landmarks)
-                        
-                        # Show "Good Distance" indicator
-                        cv2.putText(frame, "Good Distance ✓", (10, 170), 
-                                   cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
-                    
-                    # Display gaming status with proper spacing
-                    status = self.gaming_controller.get_status_info()
-                    
-                    # Mode indicator
-                    cv2.putText(frame, f"Mode: {status['mode'].upper()}", (10, 90), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 2)
-                    
-                    # Gesture status
-                    gesture_status = "ON" if status['gestures_enabled'] else "OFF"
-                    color = (0, 255, 0) if status['gestures_enabled'] else (0, 0, 255)
-                    cv2.putText(frame, f"Gestures: {gesture_status}", (10, 115), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-                    
-                    # Head tilt (right side to avoid overlap)
-                    cv2.putText(frame, f"Head Tilt: {status['head_tilt']:.1f}°", (300, 90), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
-                    
-                    # Gaze position (right side)
-                    gaze_x, gaze_y = status['gaze_position']
-                    cv2.putText(frame, f"Gaze: ({gaze_x:.2f}, {gaze_y:.2f})", (300, 115), 
-                               cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
-                    
-                    # Optionally draw face mesh (commented out for cleaner view)
-                    # self.mp_drawing.draw_landmarks(
-                    #     frame, face_landmarks, self.mp_face_mesh.FACEMESH_CONTOURS,
-                    #     None, self.mp_drawing_styles.get_default_face_mesh_contours_style())
+            # Mode indicator
+            hud.draw_text(frame, f"Mode: {status['mode'].upper()}", (10, 90), 0.5, (0, 255, 255), 2)
             
-            # Add instructions
-            cv2.putText(frame, "Controls: q=quit, 1-4=modes, g=toggle gestures", (10, frame.shape[0] - 10), 
+            # Gesture status
+            gesture_status = "ON" if status['gestures_enabled'] else "OFF"
+            color = (0, 255, 0) if status['gestures_enabled'] else (0, 0, 255)
+            hud.draw_text(frame, f"Gestures: {gesture_status}", (10, 115), 0.5, color, 2)
+            
+            # Head tilt (right side to avoid overlap)
+            cv2.putText(frame, f"Head Tilt: {status['head_tilt']:.1f}°", (300, 90),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
             
-            # Display the frame
-            cv2.imshow('Eye Tracking Gaming Controller', frame)
+            # Gaze position (right side)
+            gaze_x, gaze_y = status['gaze_position']
+            cv2.putText(frame, f"Gaze: ({gaze_x:.2f}, {gaze_y:.2f})", (300, 115),
+                       cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 255), 1)
             
-            # Check for key presses
-            key = cv2.waitKey(1) & 0xFF
-            if key == ord('q'):
+            # Optionally draw face mesh (commented out for cleaner view)
+            # self.mp_drawing.draw_landmarks(
+            #     frame, face_landmarks, self.mp_face_mesh.FACEMESH_CONTOURS,
+            #     None, self.mp_drawing_styles.get_default_face_mesh_contours_style())
+        
+        self.draw_calibration(frame)
+        self.draw_gaze_calibration()
+        
+        # Add instructions
+        hud.draw_text(frame, f"Controls: q=quit, 1-{len(GAME_MODES)}=modes, g=toggle gestures", (10, frame.shape[0] - 10),
+                      0.4, (255, 255, 255), 1)
+        
+        # Per-stage latency overlay when profiling
+        self.profiler.draw_overlay(frame)
+        return frame
+    
+    def handle_key(self, key):
+        """React to a key press from the preview window; returns False to quit
+        
+        Called on the render thread, so commands that touch controller or calibration
+        state are only queued; process_frame applies them before the next frame.
+        """
+        if key == ord('q'):
+            return False
+        command = self.key_commands.get(key)
+        if command is not None:
+            self.pending_commands.append(command)
+        return True
+    
+    def run(self, max_frames=None):
+        """Main loop for eye tracking using MediaPipe"""
+        if self.headless:
+            print("Starting headless eye tracking...")
+        else:
+            print("Starting eye tracking... Press 'q' to quit")
+        if not self.start():
+            return
+        
+        profiler = self.profiler
+        frame_latencies = []
+        start_time = time.perf_counter()
+        
+        while max_frames is None or len(frame_latencies) < max_frames:
+            frame_start = time.perf_counter()
+            if self.alloc_monitor is not None:
+                self.alloc_monitor.begin_frame()
+            with profiler.span('capture'):
+                ret, frame = self.frame_buffers.read(self.cap)
+            capture_time = time.perf_counter()
+            if not ret:
+                if self.cap.live:
+                    print("Failed to grab frame")
                 break
-            elif key == ord('1'):
-                self.gaming_controller.set_game_mode('fps')
-            elif key == ord('2'):
-                self.gaming_controller.set_game_mode('racing')
-            elif key == ord('3'):
-                self.gaming_controller.set_game_mode('strategy')
-            elif key == ord('4'):
-                self.gaming_controller.set_game_mode('platformer')
-            elif key == ord('g'):
-                self.gaming_controller.toggle_gestures()
-            elif key == ord('c'):
-                print("Calibration mode - adjust sensitivity if needed")
-        
-        # Cleanup
-        self.cap.release()
-        cv2.destroyAllWindows()
+            
+            faces = self.process_frame(frame, capture_time=capture_time)
+            
+            if not self.headless:
+                # Flip into the preview buffer for mirror effect (landmarks are already mirrored)
+                with profiler.span('flip'):
+                    frame = self.mirror_frame(frame)
+                with profiler.span('draw'):
+                    frame = self.render_frame(frame, faces)
+                
+                # Display the frame and check for key presses
+                with profiler.span('display'):
+                    cv2.imshow(WINDOW_NAME, frame)
+                    key = cv2.waitKey(1) & 0xFF
+                if not self.handle_key(key):
+                    break
+            
+            frame_latencies.append(time.perf_counter() - frame_start)
+            profiler.add('frame', frame_latencies[-1])
+            profiler.maybe_dump()
+            if self.alloc_monitor is not None:
+                self.alloc_monitor.end_frame()
+        
+        self.print_performance_summary(frame_latencies, time.perf_counter() - start_time)
+        self.profiler.print_summary()
+        self.print_buffer_summary(len(frame_latencies))
+        if self.alloc_monitor is not None:
+            self.alloc_monitor.print_summary()
+        self.close()
+    
+    def print_performance_summary(self, frame_latencies, elapsed):
+        """Print frames/sec and per-frame latency for a finished run"""
+        if not frame_latencies or elapsed <= 0:
+            print("No frames processed")
+            return
+        
+        latencies_ms = np.array(frame_latencies) * 1000.0
+        p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99])
+        print(f"Processed {len(frame_latencies)} frames in {elapsed:.2f}s ({len(frame_latencies) / elapsed:.1f} FPS)")
+        print(f"Per-frame latency: mean {latencies_ms.mean():.1f} ms, p50 {p50:.1f} ms, "
+              f"p95 {p95:.1f} ms, p99 {p99:.1f} ms, max {latencies_ms.max():.1f} ms")
+    
+    def print_buffer_summary(self, frames, frame_buffers=None, point_buffers=None):
+        """Print how many reusable buffers had to be allocated over a run"""
+        rings = [frame_buffers or self.frame_buffers, self.rgb_buffers, self.display_buffers,
+                 point_buffers or self.point_buffers]
+        allocations = sum(ring.allocations for ring in rings)
+        allocated = sum(ring.allocated_bytes for ring in rings)
+        print(f"Frame buffers: {allocations} allocations ({allocated / 1e6:.2f} MB) over {frames} frames; "
+              f"every later frame reuses them")
+    
+    def run_pipelined(self, max_frames=None):
+        """Run capture, inference and rendering on separate threads"""
+        print("Starting pipelined eye tracking... Press 'q' to quit")
+        if not self.start():
+            return
+        try:
+            TrackingPipeline(self, max_frames=max_frames).run()
+        finally:
+            self.close()
+    
+    def close(self):
+        """Release the camera and close windows"""
+        if self.cap is None and self.source_task is not None:
+            # Quit or failed during startup: the camera may still be opening
+            try:
+                self.cap = self.source_task.result()
+            except Exception:
+                pass
+        if self.cap is not None:
+            self.cap.release()
+        if self.scheduler is not None:
+            self.scheduler.print_summary()
+        # Extra players release their keys first; player 1 then stops the shared output thread
+        for controller in reversed(self.controllers):
+            controller.shutdown()
+        if self.owns_output:
+            self.output.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.profiler.dump_path is not None:
+            self.profiler.dump()
+            print(f"Profile written to {self.profiler.dump_path}")
+        if not self.headless:
+            cv2.destroyAllWindows()
         print("Eye tracking stopped")
 
 def main():
+    parser = argparse.ArgumentParser(description="Eye Tracking Gaming Controller")
+    parser.add_argument('--pipelined', action='store_true',
+                        help="run capture, inference and rendering on separate threads")
+    parser.add_argument('--source', default='webcam',
+                        help="webcam, a camera index, a video file, an image directory or synthetic[:N]")
+    parser.add_argument('--headless', action='store_true',
+                        help="no preview window; process frames as fast as possible and report throughput")
+    parser.add_argument('--max-frames', type=int, default=None,
+                        help="stop after this many frames")
+    parser.add_argument('--record', metavar='PATH', default=None,
+                        help="record face landmarks to a session file for replay with landmark_recording.py")
+    parser.add_argument('--profile', action='store_true',
+                        help="time every stage and show p50/p95/p99 latency on screen and at exit")
+    parser.add_argument('--profile-dump', metavar='PATH', default=None,
+                        help="append stage latency percentiles every 10 s to PATH (.csv or JSON lines); implies --profile")
+    parser.add_argument('--trace-alloc', action='store_true',
+                        help="report memory allocated per frame with tracemalloc (serial loop only; slows it down)")
+    parser.add_argument('--players', type=int, default=1,
+                        help="number of players (faces) to track, each with their own gestures and keys (max 4)")
+    parser.add_argument('--adaptive', action='store_true',
+                        help="track the face in an ROI and skip/extrapolate frames when inference is over budget")
+    parser.add_argument('--user-profile', metavar='PATH', default=None,
+                        help="user profile (JSON) to load and watch for changes; 'c' saves calibration to it")
+    parser.add_argument('--kiosk', action='store_true',
+                        help="show the camera preview without the HUD overlay")
+    parser.add_argument('--output', choices=sorted(OUTPUT_BACKENDS), default=OUTPUT['backend'],
+                        help="where input goes: pynput keyboard/mouse, plus a virtual gamepad for analog axes "
+                             "(gamepad, Linux uinput), or nowhere (null)")
+    args = parser.parse_args()
+    
     try:
-        tracker = EyeTracker()
-        tracker.run()
+        tracker = EyeTracker(source=args.source, headless=args.headless,
+                             record_path=args.record, adaptive=args.adaptive,
+                             profile=args.profile, profile_dump=args.profile_dump, trace_alloc=args.trace_alloc,
+                             players=args.players, user_profile=args.user_profile, output=args.output,
+                             kiosk=args.kiosk)
+        if args.pipelined:
+            tracker.run_pipelined(max_frames=args.max_frames)
+        else:
+            tracker.run(max_frames=args.max_frames)
     except Exception as e:
         print(f"Error: {e}")
         print("Make sure you have a webcam connected and the required model file downloaded")
@@ -0,0 +1,342 @@
+"""
+Face landmark analysis for the Eye Tracker
+Each frame's landmarks are converted once into a (478, 3) float32 pixel
+array, reading only the few dozen landmarks the tracker uses; every eye,
+distance, head and mouth metric is then computed from precomputed index
+arrays on that buffer. compute_face_metrics accepts any
+number of leading batch dimensions, e.g. (faces, 478, 3) or (frames, 478, 3).
+"""
+
+import numpy as np
+
+from profiler import NULL_PROFILER
+
+NUM_LANDMARKS = 478
+
+# Eye landmark indices for MediaPipe (468 landmarks)
+LEFT_EYE = np.array([362, 382, 381, 380, 374, 373, 390, 249, 263, 466, 388, 387, 386, 385, 384, 398])
+RIGHT_EYE = np.array([33, 7, 163, 144, 145, 153, 154, 155, 133, 173, 157, 158, 159, 160, 161, 246])
+
+# Eye contours used for EAR, eye centers and drawing, stacked as (left, right)
+EYE_CONTOURS = np.array([
+    [362, 385, 387, 263, 373, 380],
+    [33, 160, 158, 133, 153, 144]
+])
+
+# Iris landmarks (refine_landmarks=True), stacked as (left, right) like EYE_CONTOURS:
+# 473-477 sit in the 362/263 eye and 468-472 in the 33/133 eye
+IRISES = np.array([
+    [473, 474, 475, 476, 477],
+    [468, 469, 470, 471, 472]
+])
+
+# Iris centers, stacked as (left, right)
+IRIS_CENTERS = IRISES[:, 0]
+
+# Face outline points: left edge, right edge, top of forehead, bottom of chin
+FACE_LEFT, FACE_RIGHT, FOREHEAD, CHIN = 234, 454, 10, 152
+NOSE_TIP = 1
+
+# Mouth points: top lip, bottom lip, left corner, right corner
+MOUTH_TOP, MOUTH_BOTTOM, MOUTH_LEFT, MOUTH_RIGHT = 13, 14, 61, 291
+
+# Middle of each eyebrow and of the upper eyelid below it, (left, right)
+BROWS = np.array([334, 105])
+UPPER_LIDS = np.array([386, 159])
+
+DEFAULT_EAR = 0.3  # Used when an eye is degenerate (zero width)
+
+# Landmarks gathered once per frame for every scalar metric
+KEY_POINTS = np.concatenate([
+    EYE_CONTOURS.ravel(),
+    [FACE_LEFT, FACE_RIGHT, FOREHEAD, CHIN, NOSE_TIP, MOUTH_TOP, MOUTH_BOTTOM, MOUTH_LEFT, MOUTH_RIGHT],
+    IRIS_CENTERS,
+    BROWS,
+    UPPER_LIDS
+])
+_FACE_LEFT, _FACE_RIGHT, _FOREHEAD, _CHIN, _NOSE_TIP, _MOUTH_TOP, _MOUTH_BOTTOM, _MOUTH_LEFT, _MOUTH_RIGHT = range(12, 21)
+_LEFT_IRIS, _RIGHT_IRIS = 21, 22
+_BROWS, _UPPER_LIDS = [23, 24], [25, 26]
+
+# Every landmark the tracker reads (metrics, head pose, drawing, player matching, the
+# inference ROI); closed under mirroring. Conversions leave the other landmarks NaN.
+TRACKED_LANDMARKS = np.unique(np.concatenate([KEY_POINTS, IRISES.ravel()]))
+_TRACKED_LIST = TRACKED_LANDMARKS.tolist()
+
+
+# Anatomical (left, right) mirror pairs: each landmark and its counterpart on the
+# other side of the face, e.g. the outer eye corners 263/33 and inner corners 362/133
+MIRROR_PAIRS = np.array([
+    # Eye rings (LEFT_EYE / RIGHT_EYE)
+    (263, 33), (249, 7), (390, 163), (373, 144), (374, 145), (380, 153), (381, 154), (382, 155),
+    (362, 133), (398, 173), (384, 157), (385, 158), (386, 159), (387, 160), (388, 161), (466, 246),
+    # Irises: the iris model sees one eye flipped, so its points pair in order
+    (473, 468), (474, 469), (475, 470), (476, 471), (477, 472),
+    (FACE_LEFT, FACE_RIGHT), (MOUTH_LEFT, MOUTH_RIGHT), (BROWS[0], BROWS[1])
+])
+
+
+def _mirror_index():
+    """Gather index that swaps the left/right landmark pairs the tracker uses"""
+    index = np.arange(NUM_LANDMARKS)
+    index[MIRROR_PAIRS[:, 0]] = MIRROR_PAIRS[:, 1]
+    index[MIRROR_PAIRS[:, 1]] = MIRROR_PAIRS[:, 0]
+    return index
+
+
+MIRROR_INDEX = _mirror_index()
+
+
+def _linear_metric_matrix():
+    """Weights that turn the gathered key points into every linear metric with one matmul
+    
+    Rows 0-5: EAR vertical, vertical and horizontal vectors for the left then right eye
+    Row 6: face right - left edge, row 7: chin - forehead, row 8: nose - forehead
+    Row 9: mouth bottom - top, row 10: mouth right - left corner
+    Rows 11-12: left and right eye centers, row 13: mouth corners - 2 * top lip
+    Rows 14-15: left and right iris center - eye corner midpoint
+    Row 16: upper eyelids - eyebrows, averaged over both eyes
+    """
+    rows = [(1, 5), (2, 4), (0, 3), (7, 11), (8, 10), (6, 9),
+            (_FACE_RIGHT, _FACE_LEFT), (_CHIN, _FOREHEAD), (_NOSE_TIP, _FOREHEAD),
+            (_MOUTH_BOTTOM, _MOUTH_TOP), (_MOUTH_RIGHT, _MOUTH_LEFT)]
+    matrix = np.zeros((17, len(KEY_POINTS)), dtype=np.float32)
+    for row, (plus, minus) in enumerate(rows):
+        matrix[row, plus] += 1.0
+        matrix[row, minus] -= 1.0
+    matrix[11, 0:6] = 1.0 / 6.0
+    matrix[12, 6:12] = 1.0 / 6.0
+    matrix[13, [_MOUTH_LEFT, _MOUTH_RIGHT]] = 1.0
+    matrix[13, _MOUTH_TOP] = -2.0
+    matrix[14, _LEFT_IRIS] = 1.0
+    matrix[14, [0, 3]] = -0.5
+    matrix[15, _RIGHT_IRIS] = 1.0
+    matrix[15, [6, 9]] = -0.5
+    matrix[16, _UPPER_LIDS] = 0.5
+    matrix[16, _BROWS] = -0.5
+    return matrix
+
+
+_LINEAR_METRICS = _linear_metric_matrix()
+
+def landmarks_to_array(face_landmarks, out=None):
+    """Convert a MediaPipe landmark list to a (478, 3) float32 array of normalized coordinates
+    
+    Only TRACKED_LANDMARKS are read, by attribute access; the other rows of out are
+    left as they are (NaN in a new array).
+    """
+    if out is None:
+        out = np.full((NUM_LANDMARKS, 3), np.nan, dtype=np.float32)
+    landmark_list = face_landmarks.landmark
+    out[TRACKED_LANDMARKS] = [(landmark.x, landmark.y, landmark.z)
+                              for landmark in map(landmark_list.__getitem__, _TRACKED_LIST)]
+    return out
+
+
+def landmarks_to_pixels(face_landmarks, frame_width, frame_height, out=None):
+    """Convert a MediaPipe landmark list straight to a (478, 3) float32 array of pixel coordinates
+    
+    Like landmarks_to_array, only TRACKED_LANDMARKS are filled in.
+    """
+    if out is None:
+        out = np.full((NUM_LANDMARKS, 3), np.nan, dtype=np.float32)
+    landmark_list = face_landmarks.landmark
+    coords = np.array([(landmark.x, landmark.y, landmark.z)
+                       for landmark in map(landmark_list.__getitem__, _TRACKED_LIST)], dtype=np.float32)
+    out[TRACKED_LANDMARKS] = coords * np.array([frame_width, frame_height, frame_width], dtype=np.float32)
+    return out
+
+
+def to_pixels(landmarks, frame_width, frame_height, out=None):
+    """Scale normalized landmarks to pixel coordinates (z uses the frame width, as in MediaPipe)"""
+    scale = np.array([frame_width, frame_height, frame_width], dtype=np.float32)
+    return np.multiply(landmarks, scale, out=out)
+
+
+def to_normalized(points, frame_width, frame_height, out=None):
+    """Inverse of to_pixels"""
+    scale = np.array([frame_width, frame_height, frame_width], dtype=np.float32)
+    return np.divide(points, scale, out=out)
+
+
+def mirror_landmarks(points, frame_width, out=None):
+    """Mirror pixel landmarks horizontally, as if they had been detected on a flipped frame
+    
+    x becomes frame_width - x and the eye, iris, face edge and mouth corner pairs
+    are swapped so left and right keep their meaning. out must not alias points.
+    """
+    out = np.take(points, MIRROR_INDEX, axis=-2, out=out)
+    np.subtract(frame_width, out[..., 0], out=out[..., 0])
+    return out
+
+
+def compute_face_metrics(points, frame_width, frame_height):
+    """Compute every eye, distance, head and mouth metric from pixel landmarks
+    
+    points has shape (..., 478, 3); every returned value has the leading shape.
+    Eye centers are (..., 2 eyes, 2) and EARs (..., 2 eyes), both ordered (left, right).
+    iris_gaze (..., 2) is the iris offset from the eye center in eye widths, along the
+    face's left-right axis and its perpendicular, averaged over both eyes.
+    """
+    linear = _LINEAR_METRICS @ points[..., KEY_POINTS, :2]
+    
+    # Eye Aspect Ratio: (vertical + vertical) / (2 * horizontal) per eye
+    eye_dist = np.hypot(linear[..., :6, 0], linear[..., :6, 1])
+    eye_dist = eye_dist.reshape(eye_dist.shape[:-1] + (2, 3))
+    horizontal = eye_dist[..., 2]
+    ears = np.where(horizontal > 0, (eye_dist[..., 0] + eye_dist[..., 1]) / (2.0 * np.maximum(horizontal, 1e-6)),
+                    DEFAULT_EAR)
+    
+    # Face width and height, mouth height and width
+    extents = np.abs(linear[..., 6:11, :])
+    face_width = extents[..., 0, 0]
+    face_height = extents[..., 1, 1]
+    
+    # Head tilt (roll) from the face edge slope, nod from the nose position between forehead and chin
+    head_tilt = np.degrees(np.arctan2(linear[..., 6, 1], linear[..., 6, 0]))
+    nose_y_relative = linear[..., 8, 1] / linear[..., 7, 1]
+    
+    # Iris offsets in eye widths, projected onto the face's left-right axis and its perpendicular
+    # (cancels head position, roll and camera distance), averaged over both eyes
+    iris_x = linear[..., 14:16, 0] / np.maximum(horizontal, 1e-6)
+    iris_y = linear[..., 14:16, 1] / np.maximum(horizontal, 1e-6)
+    edge_length = np.maximum(np.hypot(linear[..., 6, 0], linear[..., 6, 1]), 1e-6)
+    axis_x = (linear[..., 6, 0] / edge_length)[..., None]
+    axis_y = (linear[..., 6, 1] / edge_length)[..., None]
+    iris_gaze = np.stack([(iris_x * axis_x + iris_y * axis_y).mean(axis=-1),
+                          (iris_y * axis_x - iris_x * axis_y).mean(axis=-1)], axis=-1)
+    
+    return {
+        'eye_centers': linear[..., 11:13, :],
+        'ears': ears,
+        'face_width': face_width,
+        'face_height': face_height,
+        'face_area': face_width * face_height,
+        'head_tilt': head_tilt,
+        'nose_y_relative': nose_y_relative,
+        'iris_gaze': iris_gaze,
+        'mouth_height': extents[..., 3, 1] / frame_height,
+        'mouth_width': extents[..., 4, 0] / frame_width,
+        'mouth_corners_up': linear[..., 13, 1] < 0,
+        # Eyebrow height above the upper eyelids, as a fraction of the face height
+        'brow_height': linear[..., 16, 1] / linear[..., 7, 1]
+    }
+
+
+class FaceAnalyzer:
+    """Computes eye metrics from face landmarks and feeds the gaming controller"""
+    
+    def __init__(self, controller, profiler=NULL_PROFILER):
+        self.controller = controller
+        self.profiler = profiler
+    
+    def is_too_far(self, face_area, face_width):
+        """Check if the face is too small to track reliably"""
+        # Thresholds for distance detection (adjust based on testing)
+        min_face_area = 15000  # Minimum face area in pixels
+        min_face_width = 100   # Minimum face width in pixels
+        
+        # | rather than or, so it also works on arrays of faces
+        return (face_area < min_face_area) | (face_width < min_face_width)
+    
+    def analyze_face(self, points, frame_width, frame_height, timestamp, capture_time=None):
+        """Compute metrics for one face's (478, 3) pixel landmarks and send them to the gaming controller
+        
+        capture_time (perf_counter) is attached to any input event the gestures trigger
+        """
+        return self.analyze_faces(points[np.newaxis], frame_width, frame_height, timestamp,
+                                  [self.controller], capture_time)[0]
+    
+    def analyze_faces(self, points, frame_width, frame_height, timestamp, controllers, capture_time=None):
+        """Batched analyze_face for (faces, 478, 3) pixel landmarks
+        
+        Metrics for every face come from one compute_face_metrics call; face i is
+        then sent to controllers[i] (None computes the metrics without gestures).
+        """
+        with self.profiler.span('metrics'):
+            metrics = compute_face_metrics(points, frame_width, frame_height)
+            # One conversion to Python values per metric instead of per face
+            values = {name: metric.tolist() for name, metric in metrics.items()}
+        
+        faces = []
+        for face, controller in enumerate(controllers):
+            face_values = {name: metric[face] for name, metric in values.items()}
+            faces.append(self._analyze(points[face], face_values, frame_width, frame_height, timestamp,
+                                       controller, capture_time))
+        return faces
+    
+    def _analyze(self, points, metrics, frame_width, frame_height, timestamp, controller, capture_time):
+        """Build one face's info and feed its gesture metrics to its controller"""
+        face_area = metrics['face_area']
+        face_width = metrics['face_width']
+        
+        face_info = {
+            'points': points,
+            'face_area': face_area,
+            'face_width': face_width,
+            'face_height': metrics['face_height'],
+            'too_far': self.is_too_far(face_area, face_width)
+        }
+        
+        # Only run gesture detection if user is close enough; otherwise the player's keys are let go
+        if face_info['too_far']:
+            if controller is not None:
+                controller.end_frame_without_face(timestamp, capture_time)
+            return face_info
+        
+        left_ear, right_ear = metrics['ears']
+        left_eye_center, right_eye_center = metrics['eye_centers']
+        iris_h, iris_v = metrics['iris_gaze']
+        face_info.update({
+            'left_eye_center': (int(left_eye_center[0]), int(left_eye_center[1])),
+            'right_eye_center': (int(right_eye_center[0]), int(right_eye_center[1])),
+            'avg_ear': (left_ear + right_ear) / 2.0,
+            'ears': (left_ear, right_ear),
+            'iris_gaze': (iris_h, iris_v),
+            'head_tilt': metrics['head_tilt'],
+            'nose_y_relative': metrics['nose_y_relative'],
+            'brow_height': metrics['brow_height']
+        })
+        if controller is None:
+            return face_info
+        
+        controller.begin_frame(capture_time)
+        
+        # Full head pose for the analog axes (solvePnP, per player)
+        head_pose = None
+        if controller.head_pose is not None:
+            with self.profiler.span('head_pose'):
+                head_pose = controller.head_pose.estimate(points, frame_width, frame_height, timestamp)
+                if head_pose is not None:
+                    face_info['head_pose'] = head_pose
+                    controller.detect_head_pose(head_pose, timestamp)
+        
+        # Screen position the user looks at, through the player's gaze calibration when there is one;
+        # the calibration samples the same head-compensated offset
+        iris_h, iris_v = controller.compensate_iris_offset(iris_h, iris_v, head_pose)
+        face_info['iris_gaze'] = (iris_h, iris_v)
+        face_info['gaze'] = controller.gaze_mapper.map(iris_h, iris_v)
+        
+        # Send blink data to gaming controller
+        with self.profiler.span('detect_blink'):
+            controller.detect_blink_pattern(left_ear, right_ear, timestamp)
+        
+        # Send gaze data to gaming controller
+        with self.profiler.span('detect_gaze'):
+            controller.detect_gaze_movement(face_info['gaze'], timestamp)
+        
+        # Send head movement data to gaming controller
+        with self.profiler.span('detect_head'):
+            controller.detect_head_movement(metrics['head_tilt'], metrics['nose_y_relative'], timestamp)
+        
+        # Send facial expression data to gaming controller
+        with self.profiler.span('detect_expression'):
+            controller.detect_facial_expressions(metrics['mouth_height'], metrics['mouth_width'],
+                                                 metrics['mouth_corners_up'], timestamp,
+                                                 brow_height=metrics['brow_height'])
+        
+        # Every gesture is evaluated in one pass over the measured features; analog axes
+        # (head pose and gaze) go out once per frame
+        with self.profiler.span('detect_gestures'):
+            controller.end_frame(timestamp)
+        return face_info
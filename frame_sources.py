@@ -0,0 +1,266 @@
+"""
+Frame sources for the Eye Tracker
+Every source exposes the same read()/release() interface as cv2.VideoCapture,
+so the tracker can run from a webcam, a video file, a directory of images
+or a synthetic generator without knowing which one it is using.
+read(image) fills a caller-provided buffer when its shape matches, and
+FrameBufferRing (one thread) or FrameBufferPool (buffers handed between
+threads) hands out reusable buffers so steady-state capture does not
+allocate.
+"""
+
+import os
+import threading
+
+import cv2
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+
+class FrameSource:
+    """Base class for frame sources"""
+    live = False  # True for sources that deliver frames in real time
+    
+    def isOpened(self):
+        return True
+    
+    def read(self, image=None):
+        """Return (ret, frame) like cv2.VideoCapture.read, reusing image when its shape matches"""
+        raise NotImplementedError
+    
+    def release(self):
+        pass
+
+
+class WebcamSource(FrameSource):
+    """Live webcam capture"""
+    live = True
+    
+    def __init__(self, index=0, width=640, height=480, fps=30):
+        self.cap = cv2.VideoCapture(index)
+        if not self.cap.isOpened():
+            raise ValueError("Could not open webcam")
+        
+        # Set webcam properties for better performance
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.cap.set(cv2.CAP_PROP_FPS, fps)
+    
+    def isOpened(self):
+        return self.cap.isOpened()
+    
+    def read(self, image=None):
+        return self.cap.read(image)
+    
+    def release(self):
+        self.cap.release()
+
+
+class VideoFileSource(FrameSource):
+    """Frames decoded from a recorded video file"""
+    
+    def __init__(self, path, loop=False):
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise ValueError(f"Could not open video file: {path}")
+    
+    def isOpened(self):
+        return self.cap.isOpened()
+    
+    def read(self, image=None):
+        ret, frame = self.cap.read(image)
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read(image)
+        return ret, frame
+    
+    def release(self):
+        self.cap.release()
+
+
+class ImageDirectorySource(FrameSource):
+    """Frames loaded from the images in a directory, in filename order"""
+    
+    def __init__(self, path, loop=False):
+        self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.files:
+            raise ValueError(f"No images found in {path}")
+        self.loop = loop
+        self.position = 0
+    
+    def read(self, image=None):
+        if self.position >= len(self.files):
+            if not self.loop:
+                return False, None
+            self.position = 0
+        
+        # imread always decodes into a new array; copy it into the caller's buffer when possible
+        frame = cv2.imread(self.files[self.position])
+        self.position += 1
+        if frame is not None and image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            frame = image
+        return frame is not None, frame
+
+
+class SyntheticSource(FrameSource):
+    """Generated frames with a simple moving, blinking face for benchmarks"""
+    
+    def __init__(self, num_frames=300, width=640, height=480, seed=0):
+        self.num_frames = num_frames
+        self.width = width
+        self.height = height
+        self.position = 0
+        self.rng = np.random.default_rng(seed)
+        self.background = self.rng.integers(40, 80, size=(height, width, 3), dtype=np.uint8)
+    
+    def read(self, image=None):
+        if self.num_frames is not None and self.position >= self.num_frames:
+            return False, None
+        
+        if image is not None and image.shape == self.background.shape:
+            frame = image
+            np.copyto(frame, self.background)
+        else:
+            frame = self.background.copy()
+        t = self.position
+        center = (self.width // 2 + int(40 * np.sin(t / 20.0)), self.height // 2)
+        face_w, face_h = self.width // 6, self.height // 4
+        
+        # Face, eyes (closed every 45 frames) and mouth
+        cv2.ellipse(frame, center, (face_w, face_h), 0, 0, 360, (150, 180, 220), -1)
+        eye_h = 2 if t % 45 < 4 else 10
+        for dx in (-face_w // 2, face_w // 2):
+            eye = (center[0] + dx, center[1] - face_h // 4)
+            cv2.ellipse(frame, eye, (18, eye_h), 0, 0, 360, (255, 255, 255), -1)
+            cv2.circle(frame, eye, min(eye_h, 6), (40, 30, 20), -1)
+        cv2.ellipse(frame, (center[0], center[1] + face_h // 2), (30, 8), 0, 0, 360, (60, 60, 160), -1)
+        
+        self.position += 1
+        return True, frame
+
+
+class FrameBufferRing:
+    """Fixed set of reusable arrays handed out round-robin
+    
+    Size the ring to at least the number of buffers that can be in use at once
+    (e.g. frames waiting in pipeline queues), since a buffer is overwritten
+    when the ring wraps around to it.
+    """
+    
+    def __init__(self, size=1):
+        self.size = size
+        self.buffers = [None] * size
+        self.position = 0
+        self.allocations = 0
+        self.allocated_bytes = 0
+    
+    def _advance(self, buffer):
+        if buffer is not self.buffers[self.position]:
+            # First use of this slot or a shape change
+            self.buffers[self.position] = buffer
+            self.allocations += 1
+            self.allocated_bytes += buffer.nbytes
+        self.position = (self.position + 1) % self.size
+        return buffer
+    
+    def next(self, shape, dtype=np.uint8):
+        """Next buffer in the ring, allocated only when missing or of another shape/dtype"""
+        buffer = self.buffers[self.position]
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+        return self._advance(buffer)
+    
+    def read(self, source):
+        """Read the next frame from a source into the next buffer of the ring"""
+        ret, frame = source.read(self.buffers[self.position])
+        if not ret:
+            return ret, frame
+        return ret, self._advance(frame)
+
+
+class FrameBufferPool:
+    """Reusable arrays that are only handed out again after they are released
+    
+    For buffers passed between threads: a buffer stays with its holder until
+    release(), and once all size buffers are out, read and acquire wait for one.
+    """
+    
+    def __init__(self, size):
+        self.size = size
+        self.allocations = 0
+        self.allocated_bytes = 0
+        self.waits = 0  # Times a caller found every buffer in use
+        self._free = []
+        self._in_use = 0
+        self._cond = threading.Condition()
+    
+    def wait_for_free(self, timeout=None):
+        """True once a buffer is free, False if none was released within timeout"""
+        with self._cond:
+            if self._in_use < self.size:
+                return True
+            self.waits += 1
+            return self._cond.wait_for(lambda: self._in_use < self.size, timeout)
+    
+    def _take(self):
+        with self._cond:
+            self._cond.wait_for(lambda: self._in_use < self.size)
+            self._in_use += 1
+            return self._free.pop() if self._free else None
+    
+    def _track(self, buffer, taken):
+        if buffer is not taken:
+            # First use of this buffer or a shape change
+            self.allocations += 1
+            self.allocated_bytes += buffer.nbytes
+        return buffer
+    
+    def acquire(self, shape, dtype=np.uint8):
+        """A free buffer, allocated only when missing or of another shape/dtype; release it when done"""
+        taken = self._take()
+        buffer = taken
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+        return self._track(buffer, taken)
+    
+    def read(self, source):
+        """Read the next frame from a source into a free buffer; release the frame when done"""
+        taken = self._take()
+        ret, frame = source.read(taken)
+        if not ret:
+            self.release(taken)
+            return ret, frame
+        return ret, self._track(frame, taken)
+    
+    def release(self, buffer):
+        """Give a buffer back once nothing reads or writes it any more"""
+        with self._cond:
+            self._in_use -= 1
+            if buffer is not None:
+                self._free.append(buffer)
+            self._cond.notify()
+
+
+def open_source(spec):
+    """Create a frame source from a command-line spec
+    
+    'webcam' or a camera index -> WebcamSource
+    'synthetic' or 'synthetic:N' -> SyntheticSource with N frames
+    a directory -> ImageDirectorySource
+    anything else -> VideoFileSource
+    """
+    if spec is None or spec == 'webcam':
+        return WebcamSource()
+    if spec.isdigit():
+        return WebcamSource(int(spec))
+    if spec.startswith('synthetic'):
+        _, _, count = spec.partition(':')
+        return SyntheticSource(int(count) if count else 300)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec)
+    return VideoFileSource(spec)
@@ -19,9 +19,22 @@ THRESHOLDS = {
     'blink_ear': 0.25,          # Eye Aspect Ratio for blink detection
     'double_blink_window': 0.8,  # Time window for double blink (seconds)
     'head_tilt_angle': 15,       # Minimum head tilt angle (degrees)
-    'gaze_boundary': 0.3,        # Gaze boundary for directional detection
+    'head_tilt_center': 0.0,     # Head roll when the head is straight (degrees)
+    'gaze_center_x': 0.5,        # Normalized gaze position when looking at the screen center
+    'gaze_center_y': 0.5,
+    'gaze_offset_x': 0.2,        # Gaze distance from the center for directional detection
+    'gaze_offset_y': 0.2,
     'mouth_open_threshold': 0.02, # Mouth opening threshold
-    'smile_width_threshold': 0.05 # Smile width threshold
+    'smile_width_threshold': 0.05, # Smile width threshold
+    'long_blink_duration': 0.5,  # Both eyes closed this long for a long blink (seconds)
+    'wink_open_margin': 0.1,     # EAR above blink_ear the open eye needs during a wink
+    'head_nod_center': 0.5,      # Nose position between forehead and chin in the neutral pose
+    'head_nod_offset': 0.1,      # Nose offset from the neutral pose for a nod down/up (fraction of face height)
+    'head_yaw_center': 0.0,      # solvePnP head yaw and pitch in the neutral pose (degrees)
+    'head_pitch_center': 0.0,
+    'eyebrow_raise_center': 0.09, # Eyebrow height above the upper eyelids in the neutral pose (fraction of face height)
+    'eyebrow_raise_offset': 0.025, # Extra eyebrow height for an eyebrow raise
+    'dwell_radius': 0.1          # Max gaze movement while dwelling (normalized)
 }
 
 # Game mode configurations
@@ -46,6 +59,12 @@ GAME_MODES = {
             'mouth_open': 't',          # Voice chat/Team speak
             'smile': 'g',               # Gesture/Taunt
             'eyebrow_raise': Key.tab    # Scoreboard
+        },
+        # With the gamepad output: move with the head on the left stick, look with the gaze on the right
+        'gamepad_mappings': {
+            'yaw': 'pad_lx', 'pitch': 'pad_ly',
+            'gaze_x': 'pad_rx', 'gaze_y': 'pad_ry',
+            'gaze_left': None, 'gaze_right': None, 'gaze_up': None, 'gaze_down': None
         }
     },
     
@@ -53,8 +72,7 @@ GAME_MODES = {
         'name': 'Racing Game',
         'description': 'Optimized for racing games like Forza, Gran Turismo',
         'mappings': {
-            'head_tilt_left': 'a',      # Steer left
-            'head_tilt_right': 'd',     # Steer right
+            'yaw': ('a', 'd'),          # Steer: turn the head, key duty cycle follows the angle
             'gaze_up': 'w',             # Accelerate
             'gaze_down': 's',           # Brake/Reverse
             'single_blink': Key.space,   # Handbrake
@@ -68,6 +86,10 @@ GAME_MODES = {
             'smile': 'h',               # Headlights
             'gaze_left': Key.left,      # Menu left
             'gaze_right': Key.right     # Menu right
+        },
+        # With the gamepad output: proportional steering on the left stick
+        'gamepad_mappings': {
+            'yaw': 'pad_lx'
         }
     },
     
@@ -192,6 +214,7 @@ VISUAL_FEEDBACK = {
     'show_mode_indicator': True,
     'show_sensitivity_bars': False,
     'gesture_feedback_duration': 1.0,  # seconds
+    'hud_cache_layers': 64,         # Pre-rendered HUD strings kept before the cache starts over
     'colors': {
         'active_gesture': (0, 255, 0),
         'inactive_gesture': (128, 128, 128),
@@ -218,6 +241,216 @@ PERFORMANCE = {
     'smoothing_frames': 3           # Number of frames to smooth gestures over
 }
 
+# Head pose from solvePnP against a generic 3D face model (head_pose.py)
+HEAD_POSE = {
+    'enabled': True,
+    'solver': 'sqpnp',              # 'sqpnp', or 'iterative' warm-started from the previous frame
+    'max_gap': 0.5,                 # Seconds without a face after which the previous pose is not reused
+    'mouse_speed': 1200             # Pointer speed of an axis bound to mouse_x/mouse_y at full deflection (px/s)
+}
+
+# Analog axes: the head angle from the neutral pose (degrees), or the gaze offset from
+# the calibrated center (normalized screen position), maps to -1..1, zero inside the
+# deadzone and full deflection at range. Modes bind an axis in their mappings to
+# 'mouse_x'/'mouse_y' (relative pointer motion), to a (negative, positive) key pair,
+# which the axis holds down for a fraction of frames equal to its deflection, or to a
+# gamepad axis ('pad_lx', 'pad_ly', 'pad_rx', 'pad_ry', 'pad_lt', 'pad_rt') of the
+# gamepad output.
+AXES = {
+    'yaw': {'deadzone': 4.0, 'range': 30.0},
+    'pitch': {'deadzone': 4.0, 'range': 20.0},
+    'roll': {'deadzone': 4.0, 'range': 25.0},
+    'gaze_x': {'deadzone': 0.05, 'range': 0.4},
+    'gaze_y': {'deadzone': 0.05, 'range': 0.4}
+}
+
+# Where input goes (output_backends.py): 'pynput' (keyboard and mouse), 'gamepad'
+# (plus a virtual gamepad for analog axes, Linux uinput) or 'null'. Modes' optional
+# 'gamepad_mappings' apply on top of their mappings when the output has analog axes.
+OUTPUT = {
+    'backend': 'pynput',
+    'axis_resolution': 0.01         # Gamepad axis values are rounded to this step, so a held pose sends nothing
+}
+
+# Temporal filters applied to each landmark-derived signal before gesture detection
+# ('type' is one of none, ema, median, one_euro, kalman; see signal_filters.py).
+# User profiles can replace any signal's filter under "filters".
+FILTERS = {
+    # Median keeps the sharp edges of a blink while dropping single-frame EAR dropouts
+    'ear': {'type': 'median', 'window': PERFORMANCE['smoothing_frames']},
+    # Normalized screen position: heavy smoothing while fixating, little lag on saccades
+    'gaze': {'type': 'one_euro', 'min_cutoff': 1.0, 'beta': 20.0, 'd_cutoff': 1.0},
+    # Constant-velocity Kalman: roll in degrees, nod as a fraction of the face height
+    'head_tilt': {'type': 'kalman', 'process_noise': 2000.0, 'measurement_noise': 0.5},
+    'head_nod': {'type': 'kalman', 'process_noise': 0.1, 'measurement_noise': 2.5e-5},
+    # solvePnP yaw, pitch and roll (degrees) feeding the analog axes
+    'head_pose': {'type': 'one_euro', 'min_cutoff': 1.0, 'beta': 0.05, 'd_cutoff': 1.0},
+    # Mouth height and width (fractions of the frame)
+    'mouth': {'type': 'ema', 'frames': PERFORMANCE['smoothing_frames']},
+    # Eyebrow height above the eyelids (fraction of the face height)
+    'brow': {'type': 'ema', 'frames': PERFORMANCE['smoothing_frames']}
+}
+
+# Adaptive FaceMesh scheduling (eye_tracking.py --adaptive)
+INFERENCE = {
+    'roi_padding': 0.25,            # ROI margin around the last face, as a fraction of its size
+    'min_roi_size': 128,            # Minimum ROI side (pixels)
+    'full_detection_interval': 30,  # Run on the full frame at least every N inferences
+    'max_skip_frames': 2,           # Most consecutive extrapolated frames (bounds gesture latency)
+    'cpu_budget': 0.5               # Fraction of each frame period FaceMesh may use
+}
+
+# Couch co-op (eye_tracking.py --players N): one gesture controller per tracked face
+MULTIPLAYER = {
+    'max_players': 4,
+    'match_distance': 0.15,         # Max face center movement between frames (fraction of frame width)
+    'max_missing_frames': 15        # Frames a player keeps their slot while their face is not found
+}
+
+# Per-player keys applied on top of every game mode's mappings so players sharing
+# one keyboard do not collide; player 1 uses the mode mappings unchanged. Every
+# mappable gesture and key-pair axis has a key, none used by another player or by
+# any mode's player 1 mappings (checked when gaming_controller is imported).
+# The mouse pointer stays with player 1.
+PLAYER_KEY_OVERRIDES = {
+    2: {
+        'gaze_left': 'j', 'gaze_right': 'l', 'gaze_up': 'o', 'gaze_down': 'k',
+        'head_tilt_left': 'u', 'head_tilt_right': 'p', 'head_nod': 'n', 'head_nod_up': 'y',
+        'blink': ';', 'single_blink': 'b', 'double_blink': 'v', 'long_blink': Key.shift_r,
+        'left_wink': '[', 'right_wink': ']', 'dwell': "'",
+        'mouth_open': '/', 'smile': '\\', 'eyebrow_raise': '`', 'gaze_movement': None,
+        'yaw': ('u', 'p'), 'pitch': ('o', 'k'), 'roll': ('u', 'p'), 'gaze_x': ('j', 'l'), 'gaze_y': ('o', 'k')
+    },
+    3: {
+        'gaze_left': '4', 'gaze_right': '6', 'gaze_up': '8', 'gaze_down': '5',
+        'head_tilt_left': '7', 'head_tilt_right': '9', 'head_nod': '3', 'head_nod_up': '0',
+        'blink': '=', 'single_blink': ',', 'double_blink': '.', 'long_blink': '-',
+        'left_wink': Key.home, 'right_wink': Key.end, 'dwell': Key.ctrl_r,
+        'mouth_open': Key.page_up, 'smile': Key.page_down, 'eyebrow_raise': Key.backspace, 'gaze_movement': None,
+        'yaw': ('7', '9'), 'pitch': ('8', '5'), 'roll': ('7', '9'), 'gaze_x': ('4', '6'), 'gaze_y': ('8', '5')
+    },
+    4: {
+        'gaze_left': Key.f2, 'gaze_right': Key.f3, 'gaze_up': Key.f4, 'gaze_down': Key.f5,
+        'head_tilt_left': Key.f6, 'head_tilt_right': Key.f7, 'head_nod': Key.f8, 'head_nod_up': Key.f9,
+        'blink': Key.f13, 'single_blink': Key.f10, 'double_blink': Key.f11, 'long_blink': Key.f12,
+        'left_wink': Key.f14, 'right_wink': Key.f15, 'dwell': Key.alt_r,
+        'mouth_open': Key.f16, 'smile': Key.f17, 'eyebrow_raise': Key.f18, 'gaze_movement': None,
+        'yaw': (Key.f6, Key.f7), 'pitch': (Key.f4, Key.f5), 'roll': (Key.f6, Key.f7),
+        'gaze_x': (Key.f2, Key.f3), 'gaze_y': (Key.f4, Key.f5)
+    }
+}
+
+# Gestures that hold their key down while active and release it on exit;
+# all other gestures send a single tap when they activate
+CONTINUOUS_GESTURES = (
+    'gaze_left', 'gaze_right', 'gaze_up', 'gaze_down',
+    'head_tilt_left', 'head_tilt_right', 'head_nod', 'eyebrow_raise'
+)
+
+# Per-gesture state machine overrides; anything not listed here debounces over
+# PERFORMANCE['smoothing_frames'] frames and uses PERFORMANCE['gesture_cooldown']
+GESTURE_TIMING = {
+    'blink': {'debounce_frames': 1, 'cooldown': 0.3},   # Blinks only last a few frames
+    'left_wink': {'cooldown': 0.5},
+    'right_wink': {'cooldown': 0.5},
+    'mouth_open': {'cooldown': 0.5},
+    'smile': {'cooldown': 0.5},
+    'eyebrow_raise': {'cooldown': 0.5}
+}
+
+# Gesture definitions (gesture_engine.py), compiled once into one vectorized evaluator.
+# A 'when' gesture is active while all of its predicates hold, each "feature < expression"
+# or "feature > expression" where the expression adds and subtracts THRESHOLDS names and
+# numbers. Features: ear, ear_left, ear_right, gaze_x, gaze_y, head_tilt, head_nod,
+# mouth_height, mouth_width, mouth_corners_up (0 or 1), brow_height. 'hysteresis' names
+# the HYSTERESIS margin that widens the first predicate while the gesture is active.
+# Temporal rules tap once on top of another gesture: the count-th activation of a
+# 'sequence' within window seconds, a 'hold' lasting seconds, or a 'dwell' keeping two
+# features within radius for seconds. Every gesture here can be mapped in GAME_MODES.
+GESTURE_DEFINITIONS = {
+    'blink': {'when': ('ear < blink_ear',), 'hysteresis': 'blink_ear'},
+    'single_blink': {'sequence': 'blink', 'count': 1},
+    'double_blink': {'sequence': 'blink', 'count': 2, 'window': 'double_blink_window'},
+    'long_blink': {'hold': 'blink', 'seconds': 'long_blink_duration'},
+    # One eye closed while the other stays open
+    'left_wink': {'when': ('ear_left < blink_ear', 'ear_right > blink_ear + wink_open_margin'),
+                  'hysteresis': 'blink_ear'},
+    'right_wink': {'when': ('ear_right < blink_ear', 'ear_left > blink_ear + wink_open_margin'),
+                   'hysteresis': 'blink_ear'},
+    'dwell': {'dwell': ('gaze_x', 'gaze_y'), 'radius': 'dwell_radius', 'seconds': 'dwell_time'},
+    'gaze_left': {'when': ('gaze_x < gaze_center_x - gaze_offset_x',), 'hysteresis': 'gaze_boundary'},
+    'gaze_right': {'when': ('gaze_x > gaze_center_x + gaze_offset_x',), 'hysteresis': 'gaze_boundary'},
+    'gaze_up': {'when': ('gaze_y < gaze_center_y - gaze_offset_y',), 'hysteresis': 'gaze_boundary'},
+    'gaze_down': {'when': ('gaze_y > gaze_center_y + gaze_offset_y',), 'hysteresis': 'gaze_boundary'},
+    'head_tilt_left': {'when': ('head_tilt < head_tilt_center - head_tilt_angle',), 'hysteresis': 'head_tilt_angle'},
+    'head_tilt_right': {'when': ('head_tilt > head_tilt_center + head_tilt_angle',), 'hysteresis': 'head_tilt_angle'},
+    'head_nod': {'when': ('head_nod > head_nod_center + head_nod_offset',), 'hysteresis': 'head_nod'},
+    'head_nod_up': {'when': ('head_nod < head_nod_center - head_nod_offset',), 'hysteresis': 'head_nod'},
+    'mouth_open': {'when': ('mouth_height > mouth_open_threshold',), 'hysteresis': 'mouth_open_threshold'},
+    'smile': {'when': ('mouth_width > smile_width_threshold', 'mouth_corners_up > 0.5'),
+              'hysteresis': 'smile_width_threshold'},
+    'eyebrow_raise': {'when': ('brow_height > eyebrow_raise_center + eyebrow_raise_offset',),
+                      'hysteresis': 'eyebrow_raise'}
+}
+
+# Calibration routine ('c' key): phase durations and sample requirements
+CALIBRATION = {
+    'neutral_seconds': 3.0,         # Looking at the screen center, head straight
+    'closed_seconds': 2.0,          # Both eyes closed
+    'gaze_seconds': 6.0,            # Looking at each screen edge
+    'settle_seconds': 0.7,          # Samples ignored at the start of each phase
+    'gaze_smoothing_frames': 5,
+    'min_samples': 10,
+    'min_ear_gap': 0.05,            # Minimum open/closed EAR difference for a usable blink calibration
+    'min_gaze_reach': 0.02          # Minimum gaze movement (normalized) for a usable gaze calibration
+}
+
+# Threshold tuner (threshold_tuner.py): base THRESHOLDS searched between these bounds on
+# labelled landmark sessions, for the gesture scores of each user's profile
+TUNING = {
+    'ranges': {
+        'blink_ear': (0.15, 0.3),
+        'double_blink_window': (0.4, 1.2),
+        'head_tilt_angle': (8.0, 25.0),
+        'gaze_offset_x': (0.1, 0.35),
+        'gaze_offset_y': (0.1, 0.35),
+        'mouth_open_threshold': (0.01, 0.05)
+    },
+    'grid_steps': 4,                # Values per threshold in a grid search
+    'random_samples': 500,          # Candidates in a random search
+    'tolerance': 0.3                # Seconds a trigger may be early or late for a labelled gesture
+}
+
+# Iris gaze estimation and the 9-point gaze calibration ('v' key)
+GAZE = {
+    'default_gain': (2.5, 6.0),     # Uncalibrated iris offset (fraction of eye width) to screen fraction, x and y
+    'eye_radius': 0.4,              # Eyeball radius (fraction of eye width): iris shift per sine of head yaw/pitch
+    'screen_size': (1920, 1080),    # Screen resolution for gaze-driven mouse movement (pixels)
+    'pointer_rate': 120,            # Pointer (and gamepad axis) updates per second, independent of the camera
+    'pointer_filter': {             # One Euro filter on the pointer position (pixels)
+        'min_cutoff': 0.8,          # Cutoff while the gaze holds still (Hz): lower = less jitter
+        'beta': 0.01,               # Cutoff increase per pixel/second of speed: higher = less lag on saccades
+        'd_cutoff': 1.0             # Cutoff of the speed estimate (Hz)
+    },
+    'calibration_grid': 3,          # grid x grid targets
+    'point_margin': 0.1,            # Target distance from the screen edges (fraction)
+    'point_seconds': 1.5,           # Time on each target
+    'settle_seconds': 0.6,          # Samples ignored while the eyes move to a new target
+    'min_samples': 5                # Samples a target needs to be used in the fit
+}
+
+# Hysteresis margins: a gesture engages past its threshold and only releases
+# once the signal is back past the threshold by this margin
+HYSTERESIS = {
+    'blink_ear': 0.03,          # EAR
+    'gaze_boundary': 0.05,      # Normalized gaze position
+    'head_tilt_angle': 3.0,     # Degrees
+    'head_nod': 0.03,           # Relative nose position
+    'mouth_open_threshold': 0.005,
+    'smile_width_threshold': 0.005,
+    'eyebrow_raise': 0.008          # Eyebrow height (fraction of face height)
+}
+
 def get_game_mode_info(mode_name):
     """Get information about a specific game mode"""
     return GAME_MODES.get(mode_name, None)
@@ -235,6 +468,12 @@ def get_default_config():
     return {
         'sensitivity': DEFAULT_SENSITIVITY.copy(),
         'thresholds': THRESHOLDS.copy(),
+        'hysteresis': HYSTERESIS.copy(),
         'visual_feedback': VISUAL_FEEDBACK.copy(),
-        'performance': PERFORMANCE.copy()
+        'performance': PERFORMANCE.copy(),
+        'filters': {signal: settings.copy() for signal, settings in FILTERS.items()},
+        'head_pose': HEAD_POSE.copy(),
+        'axes': {axis: settings.copy() for axis, settings in AXES.items()},
+        'output': OUTPUT.copy(),
+        'inference': INFERENCE.copy()
     }
@@ -1,101 +1,233 @@
+import math
 import time
-import threading
-from collections import deque
 from pynput import keyboard, mouse
-from pynput.keyboard import Key
-import numpy as np
+from input_dispatcher import InputDispatcher
+from gesture_engine import GestureEngine
+from gaming_config import (AXES, CONTINUOUS_GESTURES, DEFAULT_SENSITIVITY, FILTERS, GAME_MODES, GAZE,
+                           GESTURE_DEFINITIONS, GESTURE_TIMING, HEAD_POSE, HYSTERESIS, MULTIPLAYER, OUTPUT,
+                           PERFORMANCE, PLAYER_KEY_OVERRIDES, THRESHOLDS, apply_accessibility_preset)
+from gaze_estimation import GazeMapper, compensate_head_pose
+from head_pose import HeadPoseEstimator
+from output_backends import PAD_AXES, has_axes
+from signal_filters import OneEuroFilter, make_filter
+from user_profiles import key_token
+
+# Mapping targets that are mouse buttons rather than keys
+MOUSE_BUTTONS = {
+    'mouse_left': mouse.Button.left,
+    'mouse_right': mouse.Button.right
+}
+
+# Gestures that can be mapped to an action: every declared gesture, then the gaze-driven
+# pointer; a gesture's id is its index here and in the gesture engine
+GESTURES = tuple(GESTURE_DEFINITIONS) + ('gaze_movement',)
+GAZE_MOVEMENT = GESTURES.index('gaze_movement')
+
+# Analog axes (head pose, then gaze) a mode can bind in its mappings; an axis id is its index here
+AXIS_NAMES = ('yaw', 'pitch', 'roll', 'gaze_x', 'gaze_y')
+YAW, PITCH, ROLL, GAZE_X, GAZE_Y = range(len(AXIS_NAMES))
+
+# Thresholds scaled by a sensitivity setting (higher sensitivity, smaller movement needed):
+# a threshold the signal must rise above is divided by it, one it must fall below is multiplied
+SENSITIVITY_SCALED = {
+    'blink_ear': 'blink',
+    'gaze_offset_x': 'gaze',
+    'gaze_offset_y': 'gaze',
+    'head_tilt_angle': 'head',
+    'head_nod_offset': 'head',
+    'mouth_open_threshold': 'facial',
+    'smile_width_threshold': 'facial',
+    'eyebrow_raise_offset': 'facial'
+}
+# Thresholds in SENSITIVITY_SCALED that gestures trigger below (eyes close when the EAR drops)
+BELOW_THRESHOLDS = ('blink_ear',)
+
+
+def _mode_mappings(mode, player, user_mappings, gamepad=False):
+    """A mode's mappings (plus its gamepad mappings with a gamepad) with the user profile's on top,
+    then the player's key overrides for what the mode maps"""
+    mappings = dict(GAME_MODES[mode]['mappings'])
+    if gamepad:
+        mappings.update(GAME_MODES[mode].get('gamepad_mappings', {}))
+    mappings.update(user_mappings or {})
+    overrides = PLAYER_KEY_OVERRIDES.get(player, {})
+    mappings.update({gesture: key for gesture, key in overrides.items() if mappings.get(gesture) is not None})
+    return mappings
+
+
+def compile_mode(mode, player=1, user_mappings=None, gamepad=False):
+    """Compile a game mode's mappings into a tuple of actions indexed by gesture id
+    
+    Each action is ('click', button) for mouse buttons, ('move', None) for the
+    gaze-driven pointer ('mouse_move'), ('key', key) for keys, or None when the
+    mode leaves the gesture unmapped. With gamepad set the mode's gamepad_mappings
+    replace its mappings; a user profile's mappings replace both, then players after
+    the first get their PLAYER_KEY_OVERRIDES keys for the gestures the mode maps
+    (so they never drive the mouse pointer).
+    """
+    mappings = _mode_mappings(mode, player, user_mappings, gamepad)
+    actions = []
+    for gesture in GESTURES:
+        target = mappings.get(gesture)
+        if target in MOUSE_BUTTONS:
+            actions.append(('click', MOUSE_BUTTONS[target]))
+        elif target == 'mouse_move':
+            actions.append(('move', None))
+        elif target is None:
+            actions.append(None)
+        else:
+            actions.append(('key', target))
+    return tuple(actions)
+
+
+def action_token(action):
+    """A compiled action as the profile token it came from ('mouse_left', 'mouse_move', a key name), or None"""
+    if action is None:
+        return None
+    kind, target = action
+    if kind == 'click':
+        return next(name for name, button in MOUSE_BUTTONS.items() if button == target)
+    if kind == 'move':
+        return 'mouse_move'
+    return key_token(target)
+
+
+def compile_axes(mode, player=1, user_mappings=None, gamepad=False):
+    """Compile a game mode's analog axis bindings into a tuple indexed by axis id
+    
+    Each binding is ('mouse', 0 or 1) for 'mouse_x'/'mouse_y', ('pad', name) for a
+    gamepad axis, ('keys', negative, positive) for a key pair, or None. Gamepad
+    mappings, profile mappings and player overrides apply as in compile_mode.
+    """
+    mappings = _mode_mappings(mode, player, user_mappings, gamepad)
+    bindings = []
+    for axis in AXIS_NAMES:
+        target = mappings.get(axis)
+        if target in ('mouse_x', 'mouse_y'):
+            bindings.append(('mouse', 0 if target == 'mouse_x' else 1))
+        elif target in PAD_AXES:
+            bindings.append(('pad', target) if gamepad else None)
+        elif target is None:
+            bindings.append(None)
+        else:
+            negative, positive = target
+            bindings.append(('keys', negative, positive))
+    return tuple(bindings)
+
+
+def player_key_conflicts(mode, gamepad=False, players=MULTIPLAYER['max_players']):
+    """Keys a mode binds for more than one player, mapped to the players that share them"""
+    owners = {}
+    for player in range(1, players + 1):
+        keys = {action[1] for action in compile_mode(mode, player, gamepad=gamepad)
+                if action is not None and action[0] == 'key'}
+        for binding in compile_axes(mode, player, gamepad=gamepad):
+            if binding is not None and binding[0] == 'keys':
+                keys.update(binding[1:])
+        for key in keys:
+            owners.setdefault(key, []).append(player)
+    return {key: players for key, players in owners.items() if len(players) > 1}
+
+
+def _check_player_keys():
+    """Fail at import if PLAYER_KEY_OVERRIDES lets two players press the same key in any mode"""
+    for mode in GAME_MODES:
+        for gamepad in (False, True):
+            conflicts = player_key_conflicts(mode, gamepad)
+            if conflicts:
+                shared = ', '.join(f"{key} (players {', '.join(map(str, players))})"
+                                   for key, players in conflicts.items())
+                raise ValueError(f"PLAYER_KEY_OVERRIDES: {mode} mode binds keys for several players: {shared}")
+
+
+_check_player_keys()
+
 
 class GamingGestureController:
-    def __init__(self):
-        # Initialize input controllers
-        self.keyboard_controller = keyboard.Controller()
-        self.mouse_controller = mouse.Controller()
+    def __init__(self, keyboard_controller=None, mouse_controller=None, dispatcher=None, player=1, output=None):
+        self.player = player
+        
+        # All key, mouse and gamepad output goes through one output thread, shared between players
+        self.owns_dispatcher = dispatcher is None
+        if dispatcher is None:
+            # Initialize input controllers (replay and tests pass recording stand-ins); an output
+            # backend (output_backends.py) stands in for both and may add analog axes
+            if output is not None:
+                keyboard_controller = mouse_controller = output
+            dispatcher = InputDispatcher(keyboard_controller or keyboard.Controller(),
+                                         mouse_controller or mouse.Controller(),
+                                         pointer_rate=GAZE['pointer_rate'],
+                                         pointer_filter=OneEuroFilter(**GAZE['pointer_filter']),
+                                         axis_output=output if has_axes(output) else None)
+            dispatcher.start()
+        self.dispatcher = dispatcher
+        self.keyboard_controller = dispatcher.keyboard_controller
+        self.mouse_controller = dispatcher.mouse_controller
         
-        # Gesture state tracking
-        self.gesture_history = deque(maxlen=30)  # Store last 30 frames of gestures
-        self.last_blink_time = 0
-        self.last_double_blink_time = 0
-        self.blink_count = 0
-        self.blink_sequence = []
+        # perf_counter time the frame being analyzed was captured; attached to every input event
+        self.capture_time = None
         
         # Gaze tracking
         self.gaze_center = (0, 0)
-        self.gaze_history = deque(maxlen=10)
-        self.dwell_start_time = None
-        self.dwell_position = None
-        self.dwell_threshold = 1.5  # seconds
+        self.gaze_mapper = GazeMapper(GAZE['default_gain'])  # Iris offset -> screen position
+        # The host has one pointer: only player 1 drives it
+        self.drives_pointer = player == 1
+        
+        # Head pose (solvePnP) and the analog axes derived from it and the gaze, -1..1 per axis id
+        self.head_pose = HeadPoseEstimator(HEAD_POSE['solver'], HEAD_POSE['max_gap']) if HEAD_POSE['enabled'] else None
+        self._gaze_head_pose = None  # Last solved pose, which stands in for frames whose solve fails
+        self.axes = [0.0] * len(AXIS_NAMES)
+        self.axis_keys = [None] * len(AXIS_NAMES)  # Key each key-pair axis currently holds down
+        self._axis_phase = [0.0] * len(AXIS_NAMES)
+        self._mouse_remainder = [0.0, 0.0]
+        self._last_drive_time = None
+        # There is one virtual gamepad as there is one pointer: only player 1 drives it
+        self.gamepad = player == 1 and dispatcher.axis_output is not None
         
         # Head movement tracking
         self.head_position = {'tilt': 0, 'nod': 0}
-        self.head_history = deque(maxlen=10)
         
-        # Facial expression tracking
-        self.mouth_open = False
-        self.eyebrow_raised = False
-        self.smile_detected = False
+        # Calibration settings: sensitivities scale the base (calibrated) thresholds into the ones detection uses
+        self.sensitivity = DEFAULT_SENSITIVITY.copy()
+        self.base_thresholds = THRESHOLDS.copy()
+        self.thresholds = self._scaled_thresholds()
+        self.hysteresis = HYSTERESIS.copy()
+        self.accessibility_preset = None
+        self.user_mappings = {}  # mode -> {gesture: key} from the user profile
         
-        # Gaming modes
-        self.current_mode = "fps"  # fps, racing, strategy, platformer
-        self.gesture_enabled = True
+        # One streaming filter per measured signal, applied before any threshold is checked
+        self.filter_settings = FILTERS
+        self.filters = self._make_filters()
         
-        # Calibration settings
-        self.sensitivity = {
-            'gaze': 1.0,
-            'blink': 1.0,
-            'head': 1.0,
-            'dwell': 1.5
-        }
+        # The declared gestures compiled into one evaluator (with their debounce, cooldown and
+        # hysteresis state), fed by the detectors and advanced in end_frame, and the keys held
+        # down by continuous gestures
+        self.engine = GestureEngine(GESTURE_DEFINITIONS, CONTINUOUS_GESTURES, GESTURE_TIMING,
+                                    PERFORMANCE['smoothing_frames'], PERFORMANCE['gesture_cooldown'])
+        self.engine.set_thresholds(self.thresholds, self.hysteresis)
+        self.held_keys = {}
         
-        # Key mappings for different game modes
-        self.key_mappings = {
-            'fps': {
-                'gaze_left': 'a',
-                'gaze_right': 'd',
-                'gaze_up': 'w',
-                'gaze_down': 's',
-                'single_blink': Key.space,  # Jump/shoot
-                'double_blink': 'r',  # Reload
-                'long_blink': Key.shift,  # Run
-                'dwell': Key.ctrl,  # Aim
-                'head_tilt_left': 'q',
-                'head_tilt_right': 'e',
-                'mouth_open': 't',  # Voice chat
-                'smile': 'g'  # Gesture/taunt
-            },
-            'racing': {
-                'head_tilt_left': 'a',  # Steer left
-                'head_tilt_right': 'd',  # Steer right
-                'gaze_up': 'w',  # Accelerate
-                'gaze_down': 's',  # Brake
-                'single_blink': Key.space,  # Handbrake
-                'double_blink': 'r',  # Reset
-                'long_blink': Key.shift,  # Boost
-                'dwell': 'c'  # Camera change
-            },
-            'strategy': {
-                'dwell': 'mouse_left',  # Select
-                'single_blink': 'mouse_right',  # Context menu
-                'double_blink': Key.delete,  # Delete
-                'gaze_movement': 'mouse_move',  # Camera pan
-                'head_nod': Key.enter,  # Confirm
-                'mouth_open': Key.space  # Pause
-            },
-            'platformer': {
-                'gaze_left': 'a',
-                'gaze_right': 'd',
-                'single_blink': Key.space,  # Jump
-                'double_blink': 'x',  # Attack
-                'long_blink': 'z',  # Special
-                'head_nod': 's',  # Duck
-                'dwell': Key.shift  # Run
-            }
-        }
+        # Gaming modes: the active mode's mappings compiled into an action per gesture id
+        self.current_mode = "fps"
+        self.action_table = compile_mode(self.current_mode, player, gamepad=self.gamepad)
+        self.axis_table = compile_axes(self.current_mode, player, gamepad=self.gamepad)
+        self.gesture_enabled = True
         
-        print(f"Gaming Controller initialized in {self.current_mode} mode")
+        if player == 1:
+            print(f"Gaming Controller initialized in {self.current_mode} mode")
+        else:
+            print(f"Gaming Controller for player {player} initialized in {self.current_mode} mode")
     
     def set_game_mode(self, mode):
         """Switch between different gaming modes"""
-        if mode in self.key_mappings:
+        if mode in GAME_MODES:
+            table = compile_mode(mode, self.player, self.user_mappings.get(mode), self.gamepad)
+            axis_table = compile_axes(mode, self.player, self.user_mappings.get(mode), self.gamepad)
+            # Keys held for the old mode's mappings must not outlive it
+            self.release_held_keys()
+            # Gestures see either the old table or the new one, never a mix
+            self.action_table = table
+            self.axis_table = axis_table
             self.current_mode = mode
             print(f"Switched to {mode} mode")
         else:
@@ -105,284 +237,353 @@ class GamingGestureController:
         """Adjust sensitivity for different gestures"""
         if gesture_type in self.sensitivity:
             self.sensitivity[gesture_type] = value
+            self._update_thresholds()
             print(f"Set {gesture_type} sensitivity to {value}")
     
-    def detect_blink_pattern(self, left_ear, right_ear, timestamp):
-        """Detect different blink patterns"""
-        avg_ear = (left_ear + right_ear) / 2.0
-        blink_threshold = 0.25
-        
-        current_time = time.time()
-        
-        if avg_ear < blink_threshold:
-            if current_time - self.last_blink_time > 0.3:  # New blink
-                self.blink_count += 1
-                self.blink_sequence.append(current_time)
-                self.last_blink_time = current_time
-                
-                # Clean old blinks (older than 2 seconds)
-                self.blink_sequence = [t for t in self.blink_sequence if current_time - t < 2.0]
-                
-                # Detect patterns
-                if len(self.blink_sequence) == 1:
-                    # Single blink detected
-                    threading.Thread(target=self._trigger_single_blink, daemon=True).start()
-                elif len(self.blink_sequence) == 2 and current_time - self.blink_sequence[0] < 0.8:
-                    # Double blink detected
-                    threading.Thread(target=self._trigger_double_blink, daemon=True).start()
-                    self.blink_sequence.clear()
-        
-        # Detect long blink (wink)
-        if left_ear < blink_threshold and right_ear > blink_threshold + 0.1:
-            threading.Thread(target=self._trigger_left_wink, daemon=True).start()
-        elif right_ear < blink_threshold and left_ear > blink_threshold + 0.1:
-            threading.Thread(target=self._trigger_right_wink, daemon=True).start()
-    
-    def detect_gaze_movement(self, left_eye_center, right_eye_center, frame_width, frame_height):
-        """Detect gaze direction and dwell"""
-        # Calculate average gaze position
-        gaze_x = (left_eye_center[0] + right_eye_center[0]) / 2
-        gaze_y = (left_eye_center[1] + right_eye_center[1]) / 2
+    def _scaled_thresholds(self):
+        """Base thresholds adjusted by the current sensitivities"""
+        thresholds = self.base_thresholds.copy()
+        for name, sensitivity in SENSITIVITY_SCALED.items():
+            if name in BELOW_THRESHOLDS:
+                thresholds[name] = self.base_thresholds[name] * self.sensitivity[sensitivity]
+            else:
+                thresholds[name] = self.base_thresholds[name] / self.sensitivity[sensitivity]
+        # The dwell sensitivity is its duration (seconds), which the dwell gesture reads like a threshold
+        thresholds['dwell_time'] = self.sensitivity['dwell']
+        return thresholds
+    
+    def _update_thresholds(self):
+        """Rescale the thresholds and resolve the gesture definitions against them and the hysteresis"""
+        self.thresholds = self._scaled_thresholds()
+        self.engine.set_thresholds(self.thresholds, self.hysteresis)
+    
+    def apply_profile(self, profile):
+        """Swap in a user profile's preset, sensitivities, thresholds, mappings and game mode
         
-        # Normalize to screen coordinates
-        norm_x = gaze_x / frame_width
-        norm_y = gaze_y / frame_height
+        Called between frames; keys held by continuous gestures stay down until the
+        gesture ends, unless the game mode changes.
+        """
+        sensitivity = DEFAULT_SENSITIVITY.copy()
+        preset = profile.get('accessibility_preset')
+        if preset is not None:
+            sensitivity.update(apply_accessibility_preset(preset).get('sensitivity', {}))
+        sensitivity.update(profile.get('sensitivity', {}))
+        base_thresholds = THRESHOLDS.copy()
+        base_thresholds.update(profile.get('thresholds', {}))
+        hysteresis = HYSTERESIS.copy()
+        hysteresis.update(profile.get('hysteresis', {}))
         
-        self.gaze_center = (norm_x, norm_y)
-        self.gaze_history.append(self.gaze_center)
+        self.accessibility_preset = preset
+        self.sensitivity = sensitivity
+        self.base_thresholds = base_thresholds
+        self.hysteresis = hysteresis
+        self._update_thresholds()
+        self.user_mappings = profile.get('mappings', {})
+        self.filter_settings = dict(FILTERS, **profile.get('filters', {}))
+        self.filters = self._make_filters()
+        if 'gaze_calibration' in profile:
+            self.gaze_mapper = GazeMapper.from_profile(profile['gaze_calibration'], GAZE['default_gain'])
+            if not self.gaze_mapper.calibrated:
+                print("Stored gaze calibration is from an older version; press 'v' to recalibrate")
+        else:
+            self.gaze_mapper = GazeMapper(GAZE['default_gain'])
         
-        # Detect gaze direction
-        if len(self.gaze_history) >= 5:
-            recent_x = [pos[0] for pos in list(self.gaze_history)[-5:]]
-            recent_y = [pos[1] for pos in list(self.gaze_history)[-5:]]
-            
-            avg_x = sum(recent_x) / len(recent_x)
-            avg_y = sum(recent_y) / len(recent_y)
-            
-            # Trigger directional movements
-            if avg_x < 0.3:  # Looking left
-                self._trigger_gaze_left()
-            elif avg_x > 0.7:  # Looking right
-                self._trigger_gaze_right()
-            
-            if avg_y < 0.3:  # Looking up
-                self._trigger_gaze_up()
-            elif avg_y > 0.7:  # Looking down
-                self._trigger_gaze_down()
+        mode = profile.get('game_mode', self.current_mode)
+        if mode != self.current_mode:
+            self.set_game_mode(mode)
+        else:
+            self.action_table = compile_mode(mode, self.player, self.user_mappings.get(mode), self.gamepad)
+            axis_table = compile_axes(mode, self.player, self.user_mappings.get(mode), self.gamepad)
+            if axis_table != self.axis_table:
+                self._release_axis_keys()
+                self.axis_table = axis_table
+    
+    def _make_filters(self):
+        """Fresh filters for every signal from the current filter settings"""
+        return {signal: make_filter(settings) for signal, settings in self.filter_settings.items()}
+    
+    def reset_filters(self):
+        """Forget filter state, e.g. after the face was lost or the signal's meaning changed"""
+        for signal_filter in self.filters.values():
+            signal_filter.reset()
+    
+    def apply_calibration(self, thresholds, hysteresis):
+        """Use thresholds and hysteresis margins measured by a calibration session"""
+        self.base_thresholds.update(thresholds)
+        self.hysteresis = dict(self.hysteresis, **hysteresis)
+        self._update_thresholds()
+    
+    def apply_gaze_calibration(self, gaze_mapper):
+        """Use a fitted 9-point gaze mapping
         
-        # Detect dwell (sustained gaze)
-        self._detect_dwell(norm_x, norm_y)
+        Gaze now lives in screen coordinates, so gaze center and offsets measured
+        in the previous mapping's space go back to their defaults.
+        """
+        self.gaze_mapper = gaze_mapper
+        for name in ('gaze_center_x', 'gaze_center_y', 'gaze_offset_x', 'gaze_offset_y'):
+            self.base_thresholds[name] = THRESHOLDS[name]
+        self._update_thresholds()
+        self.filters['gaze'].reset()
+        self.engine.reset(self.engine.dwell_gestures)
+    
+    def calibration_settings(self):
+        """Sensitivities, base thresholds and hysteresis that differ from the defaults, for saving to a profile"""
+        defaults = DEFAULT_SENSITIVITY.copy()
+        defaults.update(apply_accessibility_preset(self.accessibility_preset).get('sensitivity', {}))
+        settings = {
+            'sensitivity': {name: value for name, value in self.sensitivity.items() if value != defaults[name]},
+            'thresholds': {name: value for name, value in self.base_thresholds.items() if value != THRESHOLDS[name]},
+            'hysteresis': {name: value for name, value in self.hysteresis.items() if value != HYSTERESIS[name]}
+        }
+        if self.gaze_mapper.calibrated:
+            settings['gaze_calibration'] = self.gaze_mapper.to_profile()
+        return settings
+    
+    def begin_frame(self, capture_time=None):
+        """Start gesture detection for a new frame captured at capture_time (perf_counter)"""
+        self.capture_time = capture_time
+        self.engine.clear_features()
+    
+    def end_frame_without_face(self, timestamp, capture_time=None):
+        """Run a frame in which nothing was measured (face too far): release held keys and center the axes"""
+        self.release_held_keys()
+        self.axes[:] = [0.0] * len(AXIS_NAMES)
+        self.begin_frame(capture_time)
+        self.end_frame(timestamp)
     
-    def _detect_dwell(self, x, y):
-        """Detect when user dwells on a position"""
-        current_time = time.time()
+    def detect_blink_pattern(self, left_ear, right_ear, timestamp):
+        """Measure the eye aspect ratios the blink, blink pattern and wink gestures are declared over"""
+        left_ear, right_ear = self.filters['ear'].filter((left_ear, right_ear), timestamp)
+        self.engine.measure('ear', (left_ear + right_ear) / 2.0, left_ear, right_ear)
+    
+    def detect_gaze_movement(self, gaze_point, timestamp=None):
+        """Measure the gaze for the gaze direction and dwell gestures and the gaze axes, and move
+        the pointer in modes that map gaze_movement
         
-        if self.dwell_position is None:
-            self.dwell_position = (x, y)
-            self.dwell_start_time = current_time
-        else:
-            # Check if still looking at same position (within threshold)
-            distance = np.sqrt((x - self.dwell_position[0])**2 + (y - self.dwell_position[1])**2)
-            
-            if distance < 0.1:  # Still dwelling
-                if current_time - self.dwell_start_time > self.sensitivity['dwell']:
-                    self._trigger_dwell()
-                    self.dwell_position = None
-            else:
-                # Moved away, reset dwell
-                self.dwell_position = (x, y)
-                self.dwell_start_time = current_time
-    
-    def detect_head_movement(self, face_landmarks, frame_width, frame_height):
-        """Detect head tilt and nod movements"""
-        # Get key points for head orientation
-        nose_tip = face_landmarks.landmark[1]
-        left_ear = face_landmarks.landmark[234]
-        right_ear = face_landmarks.landmark[454]
-        forehead = face_landmarks.landmark[10]
-        chin = face_landmarks.landmark[152]
+        gaze_point is the normalized screen position from the iris gaze mapper
+        """
+        current_time = timestamp if timestamp is not None else time.time()
+        
+        # The pointer has its own fixed-rate filter on the output thread, so it gets the raw estimate
+        if self.action_table[GAZE_MOVEMENT] is not None and self.gesture_enabled and self.drives_pointer:
+            self._move_pointer(*gaze_point)
         
-        # Calculate head tilt (roll)
-        ear_diff = (right_ear.y - left_ear.y) * frame_height
-        head_tilt = np.arctan2(ear_diff, (right_ear.x - left_ear.x) * frame_width) * 180 / np.pi
+        gaze_x, gaze_y = self.filters['gaze'].filter(gaze_point, current_time)
+        self.gaze_center = (gaze_x, gaze_y)
+        self.engine.measure('gaze_x', gaze_x, gaze_y)
         
-        # Calculate head nod (pitch) - approximate
-        face_height = abs(forehead.y - chin.y) * frame_height
-        nose_y_relative = (nose_tip.y - forehead.y) / (chin.y - forehead.y)
+        sensitivity = self.sensitivity['gaze']
+        self._set_axis(GAZE_X, (gaze_x - self.thresholds['gaze_center_x']) * sensitivity)
+        self._set_axis(GAZE_Y, (gaze_y - self.thresholds['gaze_center_y']) * sensitivity)
+    
+    def _move_pointer(self, x, y):
+        """Aim the dispatcher's fixed-rate, filtered pointer at a normalized screen position"""
+        screen_width, screen_height = GAZE['screen_size']
+        self.dispatcher.set_pointer_target((min(max(x, 0.0), 1.0) * (screen_width - 1),
+                                            min(max(y, 0.0), 1.0) * (screen_height - 1)), self.capture_time)
+    
+    def detect_head_movement(self, head_tilt, nose_y_relative, timestamp=None):
+        """Measure head tilt and nod for the head gestures
         
+        head_tilt is the roll angle in degrees, nose_y_relative the nose position
+        between forehead (0) and chin (1) as an approximate pitch
+        """
+        current_time = timestamp if timestamp is not None else time.time()
+        head_tilt, = self.filters['head_tilt'].filter((head_tilt,), current_time)
+        nose_y_relative, = self.filters['head_nod'].filter((nose_y_relative,), current_time)
         self.head_position['tilt'] = head_tilt
         self.head_position['nod'] = nose_y_relative
-        
-        self.head_history.append(self.head_position.copy())
-        
-        # Trigger head movements
-        if abs(head_tilt) > 15:  # Significant tilt
-            if head_tilt > 15:
-                self._trigger_head_tilt_right()
-            elif head_tilt < -15:
-                self._trigger_head_tilt_left()
-        
-        if nose_y_relative > 0.6:  # Head down (nod)
-            self._trigger_head_nod_down()
-        elif nose_y_relative < 0.4:  # Head up
-            self._trigger_head_nod_up()
-    
-    def detect_facial_expressions(self, face_landmarks):
-        """Detect facial expressions like smile, mouth open, eyebrow raise"""
-        # Mouth landmarks
-        mouth_top = face_landmarks.landmark[13]
-        mouth_bottom = face_landmarks.landmark[14]
-        mouth_left = face_landmarks.landmark[61]
-        mouth_right = face_landmarks.landmark[291]
-        
-        # Calculate mouth opening
-        mouth_height = abs(mouth_top.y - mouth_bottom.y)
-        mouth_width = abs(mouth_left.x - mouth_right.x)
-        
-        # Detect mouth open
-        if mouth_height > 0.02:  # Threshold for mouth open
-            if not self.mouth_open:
-                self.mouth_open = True
-                self._trigger_mouth_open()
-        else:
-            self.mouth_open = False
-        
-        # Smile detection (simplified)
-        mouth_corners_up = (mouth_left.y + mouth_right.y) / 2 < mouth_top.y
-        if mouth_corners_up and mouth_width > 0.05:
-            if not self.smile_detected:
-                self.smile_detected = True
-                self._trigger_smile()
-        else:
-            self.smile_detected = False
+        self.engine.measure('head_tilt', head_tilt, nose_y_relative)
     
-    # Gesture trigger methods
-    def _trigger_single_blink(self):
-        if not self.gesture_enabled:
-            return
-        key = self.key_mappings[self.current_mode].get('single_blink')
-        if key:
-            self._press_key(key)
-            print("Single blink -> Action triggered")
+    def compensate_iris_offset(self, iris_h, iris_v, head_pose):
+        """Iris offset with the head yaw and pitch from neutral taken out (unchanged before the first pose)"""
+        if head_pose is not None:
+            self._gaze_head_pose = head_pose
+        if self._gaze_head_pose is None:
+            return iris_h, iris_v
+        yaw, pitch, _ = self._gaze_head_pose
+        thresholds = self.thresholds
+        return compensate_head_pose(iris_h, iris_v, yaw - thresholds['head_yaw_center'],
+                                    pitch - thresholds['head_pitch_center'], GAZE['eye_radius'])
     
-    def _trigger_double_blink(self):
-        if not self.gesture_enabled:
-            return
-        key = self.key_mappings[self.current_mode].get('double_blink')
-        if key:
-            self._press_key(key)
-            print("Double blink -> Secondary action triggered")
+    def detect_head_pose(self, head_pose, timestamp=None):
+        """Turn a solvePnP head pose (yaw, pitch, roll in degrees) into the head axes"""
+        current_time = timestamp if timestamp is not None else time.time()
+        yaw, pitch, roll = self.filters['head_pose'].filter(head_pose, current_time)
+        
+        # Relative to the user's neutral pose
+        thresholds = self.thresholds
+        sensitivity = self.sensitivity['head']
+        self._set_axis(YAW, (yaw - thresholds['head_yaw_center']) * sensitivity)
+        self._set_axis(PITCH, (pitch - thresholds['head_pitch_center']) * sensitivity)
+        self._set_axis(ROLL, (roll - thresholds['head_tilt_center']) * sensitivity)
     
-    def _trigger_left_wink(self):
-        if not self.gesture_enabled:
-            return
-        key = self.key_mappings[self.current_mode].get('long_blink')
-        if key:
-            self._press_key(key)
-            print("Left wink -> Special action triggered")
+    def _set_axis(self, axis, offset):
+        """Deflection of an axis for an offset from neutral: past the deadzone, as a fraction of the range"""
+        settings = AXES[AXIS_NAMES[axis]]
+        deadzone = settings['deadzone']
+        deflection = min(max(abs(offset) - deadzone, 0.0) / (settings['range'] - deadzone), 1.0)
+        self.axes[axis] = math.copysign(deflection, offset)
     
-    def _trigger_right_wink(self):
-        if not self.gesture_enabled:
-            return
-        # Right wink could be mapped to different action
-        print("Right wink detected")
+    def end_frame(self, timestamp=None):
+        """Evaluate every gesture on the features the frame's detectors measured, then drive the bound axes"""
+        current_time = timestamp if timestamp is not None else time.time()
+        for gesture, transition in self.engine.evaluate(current_time):
+            self._act(gesture, transition)
+        
+        elapsed = current_time - self._last_drive_time if self._last_drive_time is not None else 0.0
+        self._last_drive_time = current_time
+        if self.gesture_enabled:
+            self._drive_axes(min(elapsed, 0.1))
     
-    def _trigger_gaze_left(self):
-        if not self.gesture_enabled:
-            return
-        key = self.key_mappings[self.current_mode].get('gaze_left')
-        if key:
-            self._press_key(key)
+    def _drive_axes(self, elapsed):
+        """Send the input of every bound axis for one frame that lasted elapsed seconds"""
+        mouse_step = [0.0, 0.0]
+        resolution = OUTPUT['axis_resolution']
+        for axis, binding in enumerate(self.axis_table):
+            if binding is None:
+                continue
+            if binding[0] == 'mouse':
+                mouse_step[binding[1]] += self.axes[axis] * HEAD_POSE['mouse_speed'] * elapsed
+            elif binding[0] == 'pad':
+                # Absolute value, sent by the output thread on its next tick if it changed
+                self.dispatcher.set_axis(binding[1], round(self.axes[axis] / resolution) * resolution)
+            else:
+                self._modulate_axis_keys(axis, binding[1], binding[2])
+        
+        if self.drives_pointer and (mouse_step[0] or mouse_step[1]):
+            # Whole pixels go out now, fractions carry over to the next frame
+            remainder = self._mouse_remainder
+            remainder[0] += mouse_step[0]
+            remainder[1] += mouse_step[1]
+            dx, dy = int(remainder[0]), int(remainder[1])
+            if dx or dy:
+                remainder[0] -= dx
+                remainder[1] -= dy
+                self.dispatcher.submit('move_by', (dx, dy), 'head_pose', self.capture_time)
     
-    def _trigger_gaze_right(self):
-        if not self.gesture_enabled:
-            return
-        key = self.key_mappings[self.current_mode].get('gaze_right')
-        if key:
-            self._press_key(key)
+    def _modulate_axis_keys(self, axis, negative, positive):
+        """Hold an axis' key on a fraction of frames equal to its deflection (first-order delta-sigma)"""
+        value = self.axes[axis]
+        key = None
+        if value:
+            self._axis_phase[axis] += abs(value)
+            if self._axis_phase[axis] >= 1.0:
+                self._axis_phase[axis] -= 1.0
+                key = positive if value > 0 else negative
+        else:
+            self._axis_phase[axis] = 0.0
+        
+        held = self.axis_keys[axis]
+        if key != held:
+            if held is not None:
+                self.dispatcher.submit('release', held, AXIS_NAMES[axis])
+            if key is not None:
+                self.dispatcher.submit('press', key, AXIS_NAMES[axis], self.capture_time)
+            self.axis_keys[axis] = key
     
-    def _trigger_gaze_up(self):
-        if not self.gesture_enabled:
-            return
-        key = self.key_mappings[self.current_mode].get('gaze_up')
-        if key:
-            self._press_key(key)
+    def _release_axis_keys(self):
+        """Release the keys held by key-pair axes and centre the gamepad axes"""
+        for axis, key in enumerate(self.axis_keys):
+            if key is not None:
+                self.dispatcher.submit('release', key, AXIS_NAMES[axis])
+        for binding in self.axis_table:
+            if binding is not None and binding[0] == 'pad':
+                self.dispatcher.set_axis(binding[1], 0.0)
+        self.axis_keys = [None] * len(AXIS_NAMES)
+        self._axis_phase = [0.0] * len(AXIS_NAMES)
     
-    def _trigger_gaze_down(self):
-        if not self.gesture_enabled:
-            return
-        key = self.key_mappings[self.current_mode].get('gaze_down')
-        if key:
-            self._press_key(key)
+    def detect_facial_expressions(self, mouth_height, mouth_width, mouth_corners_up, timestamp=None,
+                                  brow_height=None):
+        """Measure the mouth (and eyebrows) for the expression gestures: mouth open, smile, eyebrow raise
+        
+        Mouth height and width are fractions of the frame size, brow_height the eyebrows'
+        height above the upper eyelids as a fraction of the face height
+        """
+        current_time = timestamp if timestamp is not None else time.time()
+        mouth_height, mouth_width = self.filters['mouth'].filter((mouth_height, mouth_width), current_time)
+        self.engine.measure('mouth_height', mouth_height, mouth_width, 1.0 if mouth_corners_up else 0.0)
+        if brow_height is not None:
+            brow_height, = self.filters['brow'].filter((brow_height,), current_time)
+            self.engine.measure('brow_height', brow_height)
     
-    def _trigger_dwell(self):
-        if not self.gesture_enabled:
-            return
-        key = self.key_mappings[self.current_mode].get('dwell')
-        if key:
-            if key == 'mouse_left':
-                self.mouse_controller.click(mouse.Button.left)
+    def _act(self, gesture, transition):
+        """Continuous gestures hold their key from entry to exit; others tap theirs once per entry"""
+        if self.engine.continuous[gesture]:
+            if transition == 'enter':
+                self._hold_gesture_key(gesture)
             else:
-                self._press_key(key)
-            print("Dwell -> Select/Aim triggered")
+                self._release_gesture_key(gesture)
+        elif transition == 'enter' and self._fire(gesture):
+            print(f"{GESTURES[gesture].replace('_', ' ').capitalize()} -> Action triggered")
     
-    def _trigger_head_tilt_left(self):
+    def _fire(self, gesture):
+        """Tap the key (or click the button) the active mode maps a gesture id to; False if unmapped"""
         if not self.gesture_enabled:
-            return
-        key = self.key_mappings[self.current_mode].get('head_tilt_left')
-        if key:
-            self._press_key(key)
+            return False
+        action = self.action_table[gesture]
+        if action is None:
+            return False
+        self._press_action(action, GESTURES[gesture])
+        return True
     
-    def _trigger_head_tilt_right(self):
-        if not self.gesture_enabled:
-            return
-        key = self.key_mappings[self.current_mode].get('head_tilt_right')
-        if key:
-            self._press_key(key)
+    def _press_action(self, action, gesture=None):
+        """Queue a key tap (or mouse click) on the output thread; never blocks"""
+        kind, target = action
+        self.dispatcher.submit('click' if kind == 'click' else 'tap', target, gesture, self.capture_time)
     
-    def _trigger_head_nod_down(self):
+    def _hold_gesture_key(self, gesture):
+        """Press the key mapped to a continuous gesture id and keep it down"""
         if not self.gesture_enabled:
             return
-        key = self.key_mappings[self.current_mode].get('head_nod')
-        if key:
-            self._press_key(key)
-    
-    def _trigger_head_nod_up(self):
-        if not self.gesture_enabled:
+        action = self.action_table[gesture]
+        if action is None:
             return
-        print("Head nod up detected")
-    
-    def _trigger_mouth_open(self):
-        if not self.gesture_enabled:
+        if action[0] == 'click':
+            self._press_action(action, GESTURES[gesture])
             return
-        key = self.key_mappings[self.current_mode].get('mouth_open')
-        if key:
-            self._press_key(key)
-            print("Mouth open -> Voice/Shout triggered")
+        
+        # Two gestures can share a key; only the first one presses it
+        key = action[1]
+        already_held = key in self.held_keys.values()
+        self.held_keys[gesture] = key
+        if not already_held:
+            self.dispatcher.submit('press', key, GESTURES[gesture], self.capture_time)
     
-    def _trigger_smile(self):
-        if not self.gesture_enabled:
+    def _release_gesture_key(self, gesture):
+        """Release the key a continuous gesture id is holding"""
+        key = self.held_keys.pop(gesture, None)
+        if key is not None and key not in self.held_keys.values():
+            self.dispatcher.submit('release', key, GESTURES[gesture])
+    
+    def release_held_keys(self):
+        """Release every key this controller holds and re-arm the continuous gestures"""
+        self.engine.reset(gesture for gesture, continuous in enumerate(self.engine.continuous) if continuous)
+        # Only this player's keys; the dispatcher may be shared with other players
+        for key in set(self.held_keys.values()):
+            self.dispatcher.submit('release', key)
+        self.held_keys.clear()
+        self._release_axis_keys()
+        if self.drives_pointer:
+            self.dispatcher.clear_pointer()
+    
+    def shutdown(self):
+        """Flush pending input, release held keys and stop the output thread (if not shared)"""
+        if not self.owns_dispatcher:
+            self.release_held_keys()
             return
-        key = self.key_mappings[self.current_mode].get('smile')
-        if key:
-            self._press_key(key)
-            print("Smile -> Positive action triggered")
-    
-    def _press_key(self, key):
-        """Helper method to press keys safely"""
-        try:
-            if isinstance(key, str):
-                self.keyboard_controller.press(key)
-                self.keyboard_controller.release(key)
-            else:  # Special keys
-                self.keyboard_controller.press(key)
-                self.keyboard_controller.release(key)
-        except Exception as e:
-            print(f"Error pressing key {key}: {e}")
+        self.dispatcher.stop()
+        stats = self.dispatcher.get_stats()
+        print(f"Input dispatcher: {stats['dispatched']} events injected, {stats['dropped']} dropped, "
+              f"{stats['errors']} errors, max queue depth {stats['max_depth']}, "
+              f"{stats['pointer_moves']} pointer moves, {stats['axis_updates']} axis updates")
+        self.dispatcher.latency.print_summary("Capture-to-inject latency per gesture")
     
     def toggle_gestures(self):
         """Enable/disable gesture recognition"""
         self.gesture_enabled = not self.gesture_enabled
+        if not self.gesture_enabled:
+            self.release_held_keys()
         status = "enabled" if self.gesture_enabled else "disabled"
         print(f"Gestures {status}")
     
@@ -393,5 +594,6 @@ class GamingGestureController:
             'gestures_enabled': self.gesture_enabled,
             'gaze_position': self.gaze_center,
             'head_tilt': self.head_position.get('tilt', 0),
-            'blink_count': len(self.blink_sequence)
+            'axes': dict(zip(AXIS_NAMES, self.axes)),
+            'blink_count': self.engine.sequence_length(self.engine.ids.get('blink'))
         }
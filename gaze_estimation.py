@@ -0,0 +1,152 @@
+"""
+Iris-based gaze estimation
+compute_face_metrics measures each iris center relative to its eye in a
+face-aligned frame (eye corner midpoint as origin, the face's left-right
+axis as x, eye width as unit), which cancels head position, roll and
+distance to the camera. compensate_head_pose removes what head yaw and
+pitch add to it: with the eyes held on one point, turning the head moves
+each iris the other way by the eyeball radius times the sine of the
+angle. GazeMapper turns the compensated offset into a normalized screen
+position: with a fixed gain until the user runs the 9-point calibration,
+then with a least-squares quadratic fit that is stored in the user
+profile.
+"""
+
+import math
+
+import numpy as np
+
+from calibration import RunningStats
+
+# Bumped whenever the iris offset changes meaning; older stored fits are dropped
+CALIBRATION_VERSION = 3
+
+
+def compensate_head_pose(h, v, yaw, pitch, radius):
+    """Iris offset with the head yaw and pitch (degrees from neutral) taken out; floats or arrays"""
+    if np.isscalar(h):
+        return h + radius * math.sin(math.radians(yaw)), v + radius * math.sin(math.radians(pitch))
+    return h + radius * np.sin(np.radians(yaw)), v + radius * np.sin(np.radians(pitch))
+
+
+def _features(h, v):
+    """Quadratic polynomial terms of an iris offset; works on floats and arrays alike"""
+    if np.isscalar(h):
+        return (1.0, h, v, h * v, h * h, v * v)
+    return np.stack([np.ones_like(h), h, v, h * v, h * h, v * v], axis=-1)
+
+
+class GazeMapper:
+    """Maps iris offsets (h, v) to normalized screen positions (0..1, 0..1)"""
+    
+    def __init__(self, gain, coefficients=None, residual=None):
+        self.gain = gain
+        self.coefficients = coefficients  # (6, 2) polynomial weights, None until calibrated
+        self.residual = residual          # RMS fit error at the calibration points (screen fraction)
+        # Plain Python rows for the per-frame scalar path
+        self._rows = coefficients.T.tolist() if coefficients is not None else None
+    
+    @property
+    def calibrated(self):
+        return self.coefficients is not None
+    
+    def map(self, h, v):
+        """Screen position for one iris offset (Python floats, called every frame)"""
+        if self._rows is None:
+            return 0.5 + h * self.gain[0], 0.5 + v * self.gain[1]
+        terms = _features(h, v)
+        return tuple(sum(weight * term for weight, term in zip(row, terms)) for row in self._rows)
+    
+    def map_array(self, offsets):
+        """Screen positions for an (..., 2) array of iris offsets"""
+        offsets = np.asarray(offsets, dtype=np.float64)
+        if self.coefficients is None:
+            return 0.5 + offsets * np.asarray(self.gain)
+        return _features(offsets[..., 0], offsets[..., 1]) @ self.coefficients
+    
+    @classmethod
+    def fit(cls, offsets, targets, gain):
+        """Least-squares quadratic fit from measured iris offsets (n, 2) to screen targets (n, 2)"""
+        offsets = np.asarray(offsets, dtype=np.float64)
+        targets = np.asarray(targets, dtype=np.float64)
+        features = _features(offsets[:, 0], offsets[:, 1])
+        coefficients = np.linalg.lstsq(features, targets, rcond=None)[0]
+        residual = float(np.sqrt(np.mean(np.sum((features @ coefficients - targets) ** 2, axis=1))))
+        return cls(gain, coefficients, residual)
+    
+    def to_profile(self):
+        """Profile entry for a calibrated mapper"""
+        return {'coefficients': self.coefficients.tolist(), 'residual': self.residual, 'version': CALIBRATION_VERSION}
+    
+    @classmethod
+    def from_profile(cls, entry, gain):
+        """Mapper from a profile's gaze_calibration entry (raises ValueError if malformed)
+        
+        An entry fitted by an older version is not applicable and gives an uncalibrated mapper.
+        """
+        try:
+            coefficients = np.array(entry['coefficients'], dtype=np.float64)
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("gaze_calibration needs a 6x2 'coefficients' list")
+        if coefficients.shape != (6, 2) or not np.isfinite(coefficients).all():
+            raise ValueError("gaze_calibration needs a 6x2 'coefficients' list")
+        if entry.get('version', 1) != CALIBRATION_VERSION:
+            return cls(gain)
+        return cls(gain, coefficients, entry.get('residual'))
+
+
+def calibration_targets(grid, margin):
+    """Screen positions of a grid x grid calibration pattern, row by row"""
+    steps = np.linspace(margin, 1.0 - margin, grid)
+    return [(x, y) for y in steps.tolist() for x in steps.tolist()]
+
+
+class GazeCalibrationSession:
+    """Shows one target at a time and averages the iris offset measured while the user looks at it"""
+    
+    def __init__(self, settings, start_time):
+        self.settings = settings
+        self.targets = calibration_targets(settings['calibration_grid'], settings['point_margin'])
+        self.target_index = 0
+        self.target_start = start_time
+        self.done = False
+        self.samples = [(RunningStats(), RunningStats()) for _ in self.targets]
+        print(f"Gaze calibration: look at each of the {len(self.targets)} targets as it appears")
+    
+    @property
+    def target(self):
+        return self.targets[self.target_index]
+    
+    def progress(self, timestamp):
+        """Fraction of the current target's time that has elapsed"""
+        return min(1.0, (timestamp - self.target_start) / self.settings['point_seconds'])
+    
+    def add(self, iris_gaze, timestamp):
+        """Add one frame's iris offset (None without a usable face); moves to the next target on time"""
+        if self.done:
+            return
+        if iris_gaze is not None and timestamp - self.target_start >= self.settings['settle_seconds']:
+            stats_h, stats_v = self.samples[self.target_index]
+            stats_h.add(iris_gaze[0])
+            stats_v.add(iris_gaze[1])
+        if self.progress(timestamp) >= 1.0:
+            if self.target_index + 1 < len(self.targets):
+                self.target_index += 1
+                self.target_start = timestamp
+            else:
+                self.done = True
+    
+    def result(self, gain):
+        """Fitted GazeMapper, or None when too few targets got enough samples"""
+        offsets, targets = [], []
+        for target, (stats_h, stats_v) in zip(self.targets, self.samples):
+            if stats_h.count >= self.settings['min_samples']:
+                offsets.append((stats_h.mean, stats_v.mean))
+                targets.append(target)
+        # The quadratic fit has six terms per axis
+        if len(offsets) < 6:
+            print(f"Gaze calibration: only {len(offsets)} targets measured; keeping the previous gaze mapping")
+            return None
+        mapper = GazeMapper.fit(offsets, targets, gain)
+        print(f"Gaze calibration: fitted {len(offsets)} targets, RMS error {mapper.residual:.3f} of the screen")
+        return mapper
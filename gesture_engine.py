@@ -0,0 +1,508 @@
+"""
+Declarative gesture engine for the Gaming Controller
+Gestures are declared in gaming_config.GESTURE_DEFINITIONS as predicates
+over a per-frame feature vector (the filtered eye, gaze, head, mouth and
+eyebrow signals) plus temporal rules built on other gestures.
+GestureEngine compiles them once into flat NumPy arrays, so a frame's
+predicates, debounce counters, cooldowns and hysteresis for every gesture
+are evaluated in a few array operations; only gestures that change state
+come back to Python.
+
+A 'when' gesture engages while all of its predicates hold, activates after
+debounce_frames consecutive engaged frames outside its cooldown, and its
+hysteresis margin widens its first predicate while it is active, so noise
+around the boundary does not toggle it every frame. Features that were not
+measured this frame stay NaN, so predicates reading them fail: the gesture
+is not engaged, an active one exits and its debounce starts over.
+Temporal rules activate once (a tap) on top of a 'when' gesture:
+  'sequence': its count-th activation, all within window seconds
+  'hold': it stays active for seconds
+  'dwell': two features stay within radius of where they started for seconds
+evaluate_series runs the same logic over a whole recorded session at once,
+for offline analysis.
+"""
+
+import math
+
+import numpy as np
+
+# Per-frame signals gestures are declared over; the detectors fill them in this order
+FEATURES = (
+    'ear', 'ear_left', 'ear_right', 'gaze_x', 'gaze_y', 'head_tilt', 'head_nod',
+    'mouth_height', 'mouth_width', 'mouth_corners_up', 'brow_height'
+)
+FEATURE_IDS = {name: index for index, name in enumerate(FEATURES)}
+
+# Frames evaluate_series compares at a time, to bound its temporary arrays
+SERIES_CHUNK = 65536
+
+
+def parse_predicate(text):
+    """'feature < name - name + 0.1' -> (feature id, sign, {threshold name: coefficient}, constant)
+    
+    sign is 1 for '>' and -1 for '<', so a predicate holds when sign * (feature - threshold) > 0
+    """
+    tokens = text.split()
+    if len(tokens) < 3 or len(tokens) % 2 == 0 or tokens[1] not in ('<', '>'):
+        raise ValueError(f"invalid predicate {text!r}")
+    if tokens[0] not in FEATURE_IDS:
+        raise ValueError(f"unknown feature {tokens[0]!r} in {text!r}")
+    
+    terms = {}
+    constant = 0.0
+    coefficient = 1.0
+    for position, token in enumerate(tokens[2:]):
+        if position % 2:
+            if token not in ('+', '-'):
+                raise ValueError(f"expected + or - instead of {token!r} in {text!r}")
+            coefficient = 1.0 if token == '+' else -1.0
+            continue
+        try:
+            constant += coefficient * float(token)
+        except ValueError:
+            terms[token] = terms.get(token, 0.0) + coefficient
+    return FEATURE_IDS[tokens[0]], 1.0 if tokens[1] == '>' else -1.0, terms, constant
+
+
+class GestureEngine:
+    """Compiled gesture definitions and their state, advanced once per frame"""
+    
+    def __init__(self, definitions, continuous=(), timing=None, debounce_frames=1, cooldown=0.0):
+        timing = timing or {}
+        self.names = tuple(definitions)
+        self.ids = {name: gesture for gesture, name in enumerate(self.names)}
+        # Only 'when' gestures can hold a key; temporal rules are taps
+        self.continuous = tuple(name in continuous and 'when' in definitions[name] for name in self.names)
+        
+        # This frame's features, NaN until a detector measures them, then one constant slot
+        # that pads gestures with fewer predicates than the longest; a list until evaluate
+        # turns it into one array, as the detectors set a few values each
+        self._unmeasured = [math.nan] * len(FEATURES) + [0.0]
+        self.features = list(self._unmeasured)
+        
+        # 'when' gestures, and their predicates laid out as rows: row k holds every gesture's
+        # k-th predicate, so a gesture is engaged when its column holds in every row
+        conditions = [gesture for gesture, name in enumerate(self.names) if 'when' in definitions[name]]
+        for gesture in conditions:
+            if not definitions[self.names[gesture]]['when']:
+                raise ValueError(f"gesture {self.names[gesture]!r} has no predicates")
+        rows = max((len(definitions[self.names[gesture]]['when']) for gesture in conditions), default=1)
+        count = len(conditions)
+        feature_index = np.full(rows * count, len(FEATURES), dtype=np.intp)
+        sign = np.ones(rows * count)
+        self._terms = [None] * (rows * count)  # (gesture name, {threshold name: coefficient}, constant) per predicate
+        for column, gesture in enumerate(conditions):
+            name = self.names[gesture]
+            for row, text in enumerate(definitions[name]['when']):
+                feature, direction, terms, constant = parse_predicate(text)
+                feature_index[row * count + column] = feature
+                sign[row * count + column] = direction
+                self._terms[row * count + column] = (name, terms, constant)
+        self._rows = rows
+        self._conditions = conditions
+        self._condition_ids = {gesture: index for index, gesture in enumerate(conditions)}
+        self._feature_index = feature_index
+        self._sign = sign
+        self._margin_names = [definitions[self.names[gesture]].get('hysteresis') for gesture in conditions]
+        # A predicate holds when sign * feature > bound; the bound of a gesture's first predicate
+        # drops by its hysteresis margin while the gesture is active
+        self._base_bound = np.full(rows * count, -np.inf)
+        self._margin = [0.0] * count
+        self._bound = self._base_bound.copy()
+        
+        # Debounce/cooldown state per 'when' gesture; only gestures whose engaged state differs from
+        # their active state (a change, or a debounce or cooldown in progress) are looked at in Python
+        self._debounce = [max(1, timing.get(self.names[gesture], {}).get('debounce_frames', debounce_frames))
+                          for gesture in conditions]
+        self._cooldown = [timing.get(self.names[gesture], {}).get('cooldown', cooldown) for gesture in conditions]
+        self._active = np.zeros(count, dtype=bool)
+        self._last_activated = [-math.inf] * count
+        self._engaged_frames = {}  # index -> consecutive engaged frames, for inactive engaged gestures
+        
+        # Temporal rules on top of the 'when' gestures
+        self._sequences = {}  # 'when' index of the base gesture -> _Sequence
+        self._holds = []
+        self._dwells = []
+        for gesture, name in enumerate(self.names):
+            definition = definitions[name]
+            if 'sequence' in definition:
+                base = self._base(name, definition['sequence'])
+                sequence = self._sequences.setdefault(base, _Sequence())
+                sequence.rules.append(_Rule(gesture, name, definition.get('window'), definition.get('count', 1)))
+            elif 'hold' in definition:
+                self._holds.append(_Hold(gesture, name, definition['seconds'], self._base(name, definition['hold'])))
+            elif 'dwell' in definition:
+                x, y = (FEATURE_IDS[feature] for feature in definition['dwell'])
+                self._dwells.append(_Dwell(gesture, name, definition['seconds'], x, y, definition['radius']))
+            elif 'when' not in definition:
+                raise ValueError(f"gesture {name!r} needs 'when', 'sequence', 'hold' or 'dwell'")
+        self.dwell_gestures = tuple(dwell.gesture for dwell in self._dwells)
+    
+    def _base(self, name, base):
+        if self.ids.get(base) not in self._condition_ids:
+            raise ValueError(f"gesture {name!r} builds on {base!r}, which is not a 'when' gesture")
+        return self._condition_ids[self.ids[base]]
+    
+    def set_thresholds(self, thresholds, hysteresis):
+        """Resolve every threshold expression, rule duration and hysteresis margin against the current settings"""
+        def value(name, setting):
+            if isinstance(setting, (int, float)):
+                return float(setting)
+            if setting not in thresholds:
+                raise ValueError(f"gesture {name!r} uses unknown threshold {setting!r}")
+            return thresholds[setting]
+        
+        for predicate, compiled in enumerate(self._terms):
+            if compiled is not None:
+                name, terms, constant = compiled
+                threshold = constant + sum(coefficient * value(name, term) for term, coefficient in terms.items())
+                self._base_bound[predicate] = self._sign[predicate] * threshold
+        self._margin = [hysteresis.get(margin, 0.0) if margin else 0.0 for margin in self._margin_names]
+        self._bound = self._base_bound.copy()
+        self._bound[:len(self._conditions)] -= np.array(self._margin) * self._active
+        for sequence in self._sequences.values():
+            for rule in sequence.rules:
+                rule.seconds = math.inf if rule.setting is None else value(rule.name, rule.setting)
+            sequence.window = max((rule.seconds for rule in sequence.rules if rule.count > 1), default=math.inf)
+            sequence.count = max(rule.count for rule in sequence.rules)
+        for rule in self._holds:
+            rule.seconds = value(rule.name, rule.setting)
+        for rule in self._dwells:
+            rule.seconds = value(rule.name, rule.setting)
+            rule.radius = value(rule.name, rule.radius_setting)
+    
+    def clear_features(self):
+        """Start a frame: no feature measured yet"""
+        self.features[:] = self._unmeasured
+    
+    def measure(self, feature, *values):
+        """Set consecutive features (in FEATURES order) starting at the named one"""
+        start = FEATURE_IDS[feature]
+        self.features[start:start + len(values)] = values
+    
+    def evaluate(self, timestamp):
+        """Advance every gesture one frame on the measured features; returns [(gesture id, 'enter' or 'exit')]
+        
+        A gesture reading a feature that was not measured this frame is not engaged.
+        Temporal rules only ever enter; they are taps.
+        """
+        count = len(self._conditions)
+        values = np.array(self.features)[self._feature_index]
+        holds = np.multiply(values, self._sign, out=values) > self._bound
+        engaged = holds[:count]
+        for row in range(1, self._rows):
+            engaged = engaged & holds[row * count:(row + 1) * count]
+        
+        transitions = []
+        engaged_frames = {}
+        # Usually every gesture is where it was: comparing the raw bytes is cheaper than finding differences
+        changed = np.flatnonzero(engaged != self._active).tolist() if engaged.tobytes() != self._active.tobytes() else ()
+        for index in changed:
+            if self._active[index]:
+                self._set_active(index, False)
+                transitions.append((self._conditions[index], 'exit'))
+                continue
+            frames = self._engaged_frames.get(index, 0) + 1
+            if frames < self._debounce[index] or timestamp - self._last_activated[index] < self._cooldown[index]:
+                engaged_frames[index] = frames
+                continue
+            self._set_active(index, True)
+            self._last_activated[index] = timestamp
+            transitions.append((self._conditions[index], 'enter'))
+            sequence = self._sequences.get(index)
+            if sequence is not None:
+                self._advance_sequence(sequence, timestamp, transitions)
+        # Gestures no longer engaged (or now active) start their debounce over
+        self._engaged_frames = engaged_frames
+        
+        for hold in self._holds:
+            if not self._active[hold.base]:
+                hold.fired = False
+            elif not hold.fired and timestamp - self._last_activated[hold.base] >= hold.seconds:
+                hold.fired = True
+                transitions.append((hold.gesture, 'enter'))
+        for dwell in self._dwells:
+            self._advance_dwell(dwell, timestamp, transitions)
+        return transitions
+    
+    def evaluate_series(self, timestamps, features, gestures=None):
+        """Run every gesture over a recorded series from a fresh state; returns [(frame, gesture id, transition)]
+        
+        features is (frames, len(FEATURES)), what the detectors measured each frame. The
+        transitions are those evaluate returns frame by frame, in frame order, but the
+        predicates are checked for every frame at once and each gesture then jumps from one
+        transition to the next, so the Python work grows with the transitions, not the
+        frames. gestures (ids) limits the work and the transitions to those gestures. The
+        per-frame state is left untouched.
+        """
+        wanted = set(range(len(self.names)) if gestures is None else gestures)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        frames = len(timestamps)
+        count = len(self._conditions)
+        stay_bound = self._base_bound.copy()
+        stay_bound[:count] -= np.array(self._margin)
+        engaged = np.empty((frames, count), dtype=bool)
+        staying = np.empty((frames, count), dtype=bool)
+        for start in range(0, frames, SERIES_CHUNK):
+            chunk = slice(start, start + SERIES_CHUNK)
+            values = np.append(features[chunk], np.zeros((len(engaged[chunk]), 1)), axis=1)
+            values = values[:, self._feature_index] * self._sign
+            engaged[chunk] = (values > self._base_bound).reshape(-1, self._rows, count).all(axis=1)
+            staying[chunk] = (values > stay_bound).reshape(-1, self._rows, count).all(axis=1)
+        # Consecutive engaged frames up to each frame, for the debounce
+        index = np.arange(frames)[:, np.newaxis]
+        run = index - np.maximum.accumulate(np.where(engaged, -1, index), axis=0)
+        
+        # 'when' gestures wanted themselves or under a wanted rule
+        needed = {column for column, gesture in enumerate(self._conditions) if gesture in wanted}
+        needed.update(column for column, sequence in self._sequences.items()
+                      if any(rule.gesture in wanted for rule in sequence.rules))
+        needed.update(hold.base for hold in self._holds if hold.gesture in wanted)
+        
+        transitions = []
+        activations = {}  # 'when' index -> [(enter frame, exit frame or None)]
+        for column in sorted(needed):
+            gesture = self._conditions[column]
+            report = gesture in wanted
+            ready = np.flatnonzero(run[:, column] >= self._debounce[column])
+            ready_times = timestamps[ready]
+            breaks = np.flatnonzero(~staying[:, column])
+            spans = []
+            start, last_activated = 0, -math.inf
+            while True:
+                # The first debounced frame from start outside the cooldown activates it,
+                # and the first frame its hysteresis-widened predicates fail deactivates it
+                position = _first_reached(ready_times, int(np.searchsorted(ready, start)),
+                                          last_activated, self._cooldown[column])
+                if position == len(ready):
+                    break
+                enter = int(ready[position])
+                last_activated = ready_times[position]
+                position = int(np.searchsorted(breaks, enter, side='right'))
+                exit = int(breaks[position]) if position < len(breaks) else None
+                spans.append((enter, exit))
+                if report:
+                    transitions.append((enter, gesture, 'enter'))
+                    if exit is not None:
+                        transitions.append((exit, gesture, 'exit'))
+                if exit is None:
+                    break
+                start = exit + 1
+            activations[column] = spans
+        
+        for column, sequence in self._sequences.items():
+            if column not in activations:
+                continue
+            times = []
+            for enter, _ in activations[column]:
+                timestamp = timestamps[enter]
+                if times and timestamp - times[0] >= sequence.window:
+                    times.clear()
+                times.append(timestamp)
+                for rule in sequence.rules:
+                    if rule.gesture in wanted and rule.count == len(times) and timestamp - times[0] < rule.seconds:
+                        transitions.append((enter, rule.gesture, 'enter'))
+                if len(times) >= sequence.count:
+                    times.clear()
+        for hold in self._holds:
+            if hold.gesture not in wanted:
+                continue
+            for enter, exit in activations[hold.base]:
+                fire = _first_reached(timestamps, enter, timestamps[enter], hold.seconds)
+                if fire < (frames if exit is None else exit):
+                    transitions.append((fire, hold.gesture, 'enter'))
+        for dwell in self._dwells:
+            if dwell.gesture in wanted:
+                self._dwell_series(dwell, timestamps, features, transitions)
+        transitions.sort(key=lambda transition: transition[0])
+        return transitions
+    
+    def _dwell_series(self, dwell, timestamps, features, transitions):
+        """evaluate_series for one dwell: how an anchor at each frame would end, then a walk from anchor to anchor"""
+        measured = np.flatnonzero(~np.isnan(features[:, dwell.x]) & ~np.isnan(features[:, dwell.y]))
+        xs, ys, times = features[measured, dwell.x], features[measured, dwell.y], timestamps[measured]
+        count = len(measured)
+        index = np.arange(count)
+        # The first frame past the dwell time of an anchor at each frame taps, unless a frame
+        # up to it leaves the radius first and becomes the next anchor (count: no such frame)
+        due = _first_reached_all(times, dwell.seconds, strict=True)
+        reach = np.minimum(due, count - 1) - index
+        away = np.full(count, count)
+        for offset in range(1, int(reach.max(initial=0)) + 1):
+            anchors = np.flatnonzero((away[:count - offset] == count) & (reach[:count - offset] >= offset))
+            moved = ~(np.hypot(xs[anchors + offset] - xs[anchors], ys[anchors + offset] - ys[anchors]) < dwell.radius)
+            away[anchors[moved]] = anchors[moved] + offset
+        
+        due, away = due.tolist(), away.tolist()
+        anchor = 0
+        while anchor < count:
+            if away[anchor] < count:
+                anchor = away[anchor]
+            elif due[anchor] < count:
+                transitions.append((int(measured[due[anchor]]), dwell.gesture, 'enter'))
+                anchor = due[anchor] + 1
+            else:
+                break
+    
+    def _set_active(self, index, active):
+        """Activate or deactivate a 'when' gesture and move its hysteresis bound"""
+        self._active[index] = active
+        self._bound[index] = self._base_bound[index] - (self._margin[index] if active else 0.0)
+    
+    def _advance_sequence(self, sequence, timestamp, transitions):
+        """Count one activation of a sequence's base gesture and tap the rules it completes"""
+        times = sequence.times
+        if times and timestamp - times[0] >= sequence.window:
+            times.clear()
+        times.append(timestamp)
+        for rule in sequence.rules:
+            if rule.count == len(times) and timestamp - times[0] < rule.seconds:
+                transitions.append((rule.gesture, 'enter'))
+        if len(times) >= sequence.count:
+            times.clear()
+    
+    def _advance_dwell(self, dwell, timestamp, transitions):
+        """Tap a dwell once its features stayed within its radius for its duration"""
+        x, y = self.features[dwell.x], self.features[dwell.y]
+        if x != x or y != y:
+            return
+        if dwell.anchor is not None and math.hypot(x - dwell.anchor[0], y - dwell.anchor[1]) < dwell.radius:
+            if timestamp - dwell.start > dwell.seconds:
+                transitions.append((dwell.gesture, 'enter'))
+                dwell.anchor = None
+        else:
+            # Start (or restart after moving away) where the features are now
+            dwell.anchor = (x, y)
+            dwell.start = timestamp
+    
+    def is_active(self, gesture):
+        """Whether a 'when' gesture is active"""
+        index = self._condition_ids.get(gesture)
+        return index is not None and bool(self._active[index])
+    
+    def thresholds_used(self, gestures):
+        """Names of the thresholds that decide when the given gestures (ids) trigger"""
+        wanted = set(gestures)
+        sequences = [sequence for sequence in self._sequences.values()
+                     if any(rule.gesture in wanted for rule in sequence.rules)]
+        # A sequence's rules share its activation times, so every rule's window matters
+        rules = [rule for sequence in sequences for rule in sequence.rules]
+        rules += [rule for rule in self._holds + self._dwells if rule.gesture in wanted]
+        conditions = {self.names[gesture] for gesture in wanted if gesture in self._condition_ids}
+        conditions.update(self.names[self._conditions[column]] for column, sequence in self._sequences.items()
+                          if sequence in sequences)
+        conditions.update(self.names[self._conditions[hold.base]] for hold in self._holds if hold.gesture in wanted)
+        
+        used = set()
+        for compiled in self._terms:
+            if compiled is not None and compiled[0] in conditions:
+                used.update(compiled[1])
+        for rule in rules:
+            used.update(setting for setting in (rule.setting, getattr(rule, 'radius_setting', None))
+                        if isinstance(setting, str))
+        return used
+    
+    def is_tap(self, gesture):
+        """Whether a gesture is a temporal rule, which only ever enters"""
+        return gesture not in self._condition_ids
+    
+    def sequence_length(self, gesture):
+        """Activations of a 'when' gesture counted toward its pending sequence"""
+        sequence = self._sequences.get(self._condition_ids.get(gesture))
+        return len(sequence.times) if sequence is not None else 0
+    
+    def reset(self, gestures):
+        """Forget the current activation of gestures (e.g. after a mode switch released all keys)"""
+        for gesture in gestures:
+            index = self._condition_ids.get(gesture)
+            if index is not None:
+                self._set_active(index, False)
+                self._engaged_frames.pop(index, None)
+            for dwell in self._dwells:
+                if dwell.gesture == gesture:
+                    dwell.anchor = None
+
+
+def _first_reached(times, start, origin, seconds, strict=False):
+    """First index from start in sorted times with times[i] - origin >= seconds (> if strict), or len(times)
+    
+    Found by bisection, then checked with the same subtraction the per-frame path does.
+    """
+    def reached(index):
+        elapsed = times[index] - origin
+        return elapsed > seconds if strict else elapsed >= seconds
+    
+    index = max(start, int(np.searchsorted(times, origin + seconds, side='right' if strict else 'left')))
+    while index > start and reached(index - 1):
+        index -= 1
+    while index < len(times) and not reached(index):
+        index += 1
+    return index
+
+
+def _first_reached_all(times, seconds, strict=False):
+    """_first_reached from every index of sorted times, with the time at that index as origin"""
+    index = np.arange(len(times))
+    first = np.maximum(index, np.searchsorted(times, times + seconds, side='right' if strict else 'left'))
+    
+    def reached(at, origin):
+        elapsed = times[at] - times[origin]
+        return elapsed > seconds if strict else elapsed >= seconds
+    
+    # Bisection on times + seconds can be off by the rounding of the addition
+    while True:
+        back = first > index
+        back[back] = reached(first[back] - 1, index[back])
+        if not back.any():
+            break
+        first[back] -= 1
+    while True:
+        forward = first < len(times)
+        forward[forward] = ~reached(first[forward], index[forward])
+        if not forward.any():
+            break
+        first[forward] += 1
+    return first
+
+
+class _Rule:
+    """A temporal rule: the gesture it taps and its duration (a threshold name or number, resolved to seconds)"""
+    
+    def __init__(self, gesture, name, setting, count=1):
+        self.gesture = gesture
+        self.name = name
+        self.setting = setting
+        self.seconds = None
+        self.count = count
+
+
+class _Sequence:
+    """Activation times of one base gesture, shared by the sequence rules built on it"""
+    
+    def __init__(self):
+        self.rules = []
+        self.times = []
+        self.window = math.inf  # Longest window of a rule counting past one activation
+        self.count = 1
+
+
+class _Hold(_Rule):
+    """Taps once per activation of its base gesture that lasts its duration"""
+    
+    def __init__(self, gesture, name, setting, base):
+        super().__init__(gesture, name, setting)
+        self.base = base
+        self.fired = False
+
+
+class _Dwell(_Rule):
+    """Taps when two features stay within a radius of where they started for its duration"""
+    
+    def __init__(self, gesture, name, setting, x, y, radius_setting):
+        super().__init__(gesture, name, setting)
+        self.x = x
+        self.y = y
+        self.radius_setting = radius_setting
+        self.radius = None
+        self.anchor = None
+        self.start = None
@@ -0,0 +1,102 @@
+"""
+Head pose estimation for the Eye Tracker
+Solves yaw, pitch and roll with cv2.solvePnP from six face landmarks
+against a generic 3D face model. The pinhole camera model is cached per
+frame size. The default SQPnP solver finds the global solution directly;
+the iterative (Levenberg-Marquardt) solver instead starts from the
+previous frame's rotation and translation. On six points SQPnP is the
+cheaper of the two (see benchmarks/bench_head_pose.py).
+Angles are in degrees in the mirrored preview: yaw is positive when the
+head turns towards the right of the screen, pitch when it tips down, and
+roll follows compute_face_metrics' head_tilt.
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+from face_analysis import CHIN, EYE_CONTOURS, MOUTH_LEFT, MOUTH_RIGHT, NOSE_TIP
+
+# Landmarks matched against the model: nose tip, chin, outer eye corners (33 and 263), mouth corners
+# (screen-left before screen-right in the mirrored landmarks, which keep anatomical pairs)
+POSE_LANDMARKS = np.array([NOSE_TIP, CHIN, EYE_CONTOURS[1, 0], EYE_CONTOURS[0, 3], MOUTH_LEFT, MOUTH_RIGHT])
+
+# Generic face model in mm, in camera axes for a face looking straight into the camera:
+# x to the right of the screen, y down, z away from the camera
+MODEL_POINTS = np.array([
+    [0.0, 0.0, 0.0],          # Nose tip
+    [0.0, 330.0, 65.0],       # Chin
+    [-225.0, -170.0, 135.0],  # Outer eye corner, screen-left
+    [225.0, -170.0, 135.0],   # Outer eye corner, screen-right
+    [-150.0, 150.0, 125.0],   # Mouth corner, screen-left
+    [150.0, 150.0, 125.0]     # Mouth corner, screen-right
+])
+
+
+def camera_model(frame_width, frame_height):
+    """Pinhole camera matrix for a frame size, with the focal length approximated by the frame width"""
+    focal = float(frame_width)
+    return np.array([[focal, 0.0, frame_width / 2.0],
+                     [0.0, focal, frame_height / 2.0],
+                     [0.0, 0.0, 1.0]])
+
+
+def rotation_to_angles(rotation):
+    """(yaw, pitch, roll) in degrees of a rotation matrix R = Rz(roll) Ry(yaw) Rx(pitch)"""
+    yaw = math.degrees(math.asin(max(-1.0, min(1.0, -rotation[2, 0]))))
+    pitch = math.degrees(math.atan2(rotation[2, 1], rotation[2, 2]))
+    roll = math.degrees(math.atan2(rotation[1, 0], rotation[0, 0]))
+    # A head turned towards the screen's right is a negative rotation about y in camera axes
+    return -yaw, pitch, roll
+
+
+SOLVERS = {
+    'sqpnp': cv2.SOLVEPNP_SQPNP,
+    'iterative': cv2.SOLVEPNP_ITERATIVE
+}
+
+
+class HeadPoseEstimator:
+    """Per-face solvePnP head pose; the iterative solver is warm-started from the previous frame"""
+    
+    def __init__(self, solver='sqpnp', max_gap=0.5):
+        if solver not in SOLVERS:
+            raise ValueError(f"unknown head pose solver {solver!r}")
+        self.flags = SOLVERS[solver]
+        self.warm_start = solver == 'iterative'
+        self.max_gap = max_gap  # Seconds without a pose after which the previous one is not reused
+        self.rvec = None
+        self.tvec = None
+        self.last_timestamp = None
+        self._camera_size = None
+        self._camera_matrix = None
+        self._dist_coeffs = np.zeros((4, 1))
+    
+    def reset(self):
+        self.rvec = None
+        self.tvec = None
+    
+    def estimate(self, points, frame_width, frame_height, timestamp):
+        """(yaw, pitch, roll) in degrees for one face's (478, 3) pixel landmarks, or None if the solve failed"""
+        if self._camera_size != (frame_width, frame_height):
+            self._camera_size = (frame_width, frame_height)
+            self._camera_matrix = camera_model(frame_width, frame_height)
+            self.reset()
+        if self.last_timestamp is not None and timestamp - self.last_timestamp > self.max_gap:
+            self.reset()
+        self.last_timestamp = timestamp
+        
+        image_points = points[POSE_LANDMARKS, :2].astype(np.float64)
+        if self.warm_start and self.rvec is not None:
+            ok, rvec, tvec = cv2.solvePnP(MODEL_POINTS, image_points, self._camera_matrix, self._dist_coeffs,
+                                          self.rvec, self.tvec, useExtrinsicGuess=True, flags=self.flags)
+        else:
+            ok, rvec, tvec = cv2.solvePnP(MODEL_POINTS, image_points, self._camera_matrix, self._dist_coeffs,
+                                          flags=self.flags)
+        # A face behind the camera is a mirror solution; start over next frame
+        if not ok or tvec[2, 0] <= 0:
+            self.reset()
+            return None
+        self.rvec, self.tvec = rvec, tvec
+        return rotation_to_angles(cv2.Rodrigues(rvec)[0])
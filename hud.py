@@ -0,0 +1,87 @@
+"""
+Cached text layers for the preview overlay
+cv2.putText rasterizes every glyph stroke on each call, and most of the
+HUD is the same from one frame to the next: labels, the controls line,
+the mode and gesture status, distance prompts. HudCache renders such a
+string once into a small premultiplied BGRA layer keyed by its content
+and style and composites it per frame with two saturating OpenCV ops
+(frame * (255 - alpha) / 255 + color * alpha / 255). A changed string (a new mode,
+gestures toggled off) is a new key, so nothing has to be invalidated by
+hand; the cache starts over once it holds max_layers layers.
+Per-frame values (EAR, gaze, head tilt) should keep using cv2.putText.
+The alpha plane is putText's own coverage (binary with OpenCV 4's
+8-connected lines, anti-aliased with OpenCV 5), so composited pixels are
+within one level of drawing directly.
+"""
+
+import cv2
+import numpy as np
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+
+class HudCache:
+    """Cache of pre-rendered text layers, composited onto frames"""
+    
+    def __init__(self, max_layers=64):
+        self.max_layers = max_layers
+        self._layers = {}
+        self._sizes = {}
+        self.stats = {'misses': 0}  # Layers rendered
+    
+    def text_size(self, text, scale, thickness=1, font=FONT):
+        """Cached cv2.getTextSize: ((width, height), baseline)"""
+        key = (text, scale, thickness, font)
+        size = self._sizes.get(key)
+        if size is None:
+            if len(self._sizes) >= self.max_layers:
+                self._sizes.clear()
+            size = self._sizes[key] = cv2.getTextSize(text, font, scale, thickness)
+        return size
+    
+    def layer(self, text, scale, color, thickness=1, font=FONT):
+        """(color * alpha, 255 - alpha, origin of the text baseline in the layer) for a string,
+        rendered on first use; both planes are (h, w, 3) uint8"""
+        key = (text, scale, color, thickness, font)
+        layer = self._layers.get(key)
+        if layer is not None:
+            return layer
+        self.stats['misses'] += 1
+        if len(self._layers) >= self.max_layers:
+            self._layers.clear()
+        
+        (width, height), baseline = self.text_size(text, scale, thickness, font)
+        pad = thickness + 1  # Stroke width spills past getTextSize's box
+        shape = (height + baseline + 2 * pad, width + 2 * pad)
+        origin = (pad, height + pad)
+        alpha = np.zeros(shape, dtype=np.uint8)
+        cv2.putText(alpha, text, origin, font, scale, 255, thickness)
+        alpha = cv2.merge((alpha, alpha, alpha))
+        solid = np.empty(shape + (3,), dtype=np.uint8)
+        solid[:] = color
+        layer = self._layers[key] = (cv2.multiply(solid, alpha, scale=1 / 255), 255 - alpha, origin)
+        return layer
+    
+    def draw_text(self, frame, text, org, scale, color, thickness=1, font=FONT):
+        """Drop-in for cv2.putText(frame, text, org, font, scale, color, thickness) using a cached layer"""
+        premultiplied, inverse_alpha, (origin_x, origin_y) = self.layer(text, scale, color, thickness, font)
+        x, y = org[0] - origin_x, org[1] - origin_y
+        height, width = inverse_alpha.shape[:2]
+        frame_height, frame_width = frame.shape[:2]
+        if x < 0 or y < 0 or x + width > frame_width or y + height > frame_height:
+            # Clip the layer to the frame
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + width, frame_width), min(y + height, frame_height)
+            if x0 >= x1 or y0 >= y1:
+                return frame
+            premultiplied = premultiplied[y0 - y:y1 - y, x0 - x:x1 - x]
+            inverse_alpha = inverse_alpha[y0 - y:y1 - y, x0 - x:x1 - x]
+            x, y, width, height = x0, y0, x1 - x0, y1 - y0
+        roi = frame[y:y + height, x:x + width]
+        cv2.multiply(roi, inverse_alpha, dst=roi, scale=1 / 255)
+        cv2.add(roi, premultiplied, dst=roi)
+        return frame
+    
+    def clear(self):
+        self._layers.clear()
+        self._sizes.clear()
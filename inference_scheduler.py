@@ -0,0 +1,165 @@
+"""
+Adaptive FaceMesh scheduling for the Eye Tracker
+Instead of running FaceMesh on every full frame, the scheduler crops to a
+padded region of interest around the previous landmarks, falls back to the
+full frame on tracking loss or every few inferences, and when inference
+does not fit in the CPU budget serves in-between frames by extrapolating
+the last landmarks. Results are always full-frame normalized (478, 3) arrays.
+"""
+
+import math
+import time
+
+import cv2
+import numpy as np
+
+from face_analysis import landmarks_to_array
+
+ROI_ALIGNMENT = 32  # ROI sides are rounded up to a multiple of this to keep crop sizes stable
+
+
+class FaceMeshScheduler:
+    """Chooses per frame between a full-frame pass, an ROI pass and extrapolation"""
+    
+    def __init__(self, face_mesh, target_fps=30, roi_padding=0.25, min_roi_size=128,
+                 full_detection_interval=30, max_skip_frames=2, cpu_budget=0.5):
+        self.face_mesh = face_mesh
+        self.frame_period = 1.0 / target_fps
+        self.roi_padding = roi_padding
+        self.min_roi_size = min_roi_size
+        self.full_detection_interval = full_detection_interval
+        self.max_skip_frames = max_skip_frames
+        self.cpu_budget = cpu_budget
+        
+        self.landmarks = []        # Faces from the last inference, normalized to the full frame
+        self.velocities = []       # Per-face landmark velocity (normalized units per second)
+        self.last_inference_time = None
+        self.inference_cost = 0.0  # Smoothed seconds per FaceMesh call
+        self.inferences_since_full = 0
+        self.skipped_frames = 0
+        self.last_mode = None
+        
+        self._rgb = np.empty(0, dtype=np.uint8)  # Reused flat RGB buffer, viewed at each crop's size
+        
+        self.stats = {'full': 0, 'roi': 0, 'predicted': 0, 'lost': 0}
+        self.total_inference_time = 0.0
+    
+    def process(self, frame, timestamp):
+        """Return the normalized landmark arrays for every face in a BGR frame"""
+        if self._should_skip():
+            self.skipped_frames += 1
+            self.stats['predicted'] += 1
+            self.last_mode = 'predicted'
+            return self._extrapolate(timestamp)
+        
+        start = time.perf_counter()
+        faces = []
+        if self.landmarks and self.inferences_since_full < self.full_detection_interval:
+            roi = self._roi(frame.shape[1], frame.shape[0])
+            if roi is not None:
+                faces = self._run(frame, roi)
+                if faces:
+                    self.last_mode = 'roi'
+                    self.inferences_since_full += 1
+                else:
+                    # Face left the ROI (or tracking failed); redetect on the full frame
+                    self.stats['lost'] += 1
+        if not faces:
+            faces = self._run(frame, None)
+            self.last_mode = 'full'
+            self.inferences_since_full = 0
+        self.stats[self.last_mode] += 1
+        
+        cost = time.perf_counter() - start
+        self.total_inference_time += cost
+        self.inference_cost = cost if self.inference_cost == 0.0 else 0.8 * self.inference_cost + 0.2 * cost
+        self._update_motion(faces, timestamp)
+        return faces
+    
+    def _should_skip(self):
+        """Skip inference on this frame if the last one is recent enough and inference is over budget"""
+        if not self.landmarks or self.max_skip_frames <= 0:
+            return False
+        
+        # Run inference on every stride-th frame so it uses at most cpu_budget of each frame period
+        stride = math.ceil(self.inference_cost / (self.cpu_budget * self.frame_period))
+        stride = min(max(stride, 1), self.max_skip_frames + 1)
+        return self.skipped_frames < stride - 1
+    
+    def _roi(self, frame_width, frame_height):
+        """Padded pixel box (x0, y0, x1, y1) around the last faces, or None if it is most of the frame"""
+        stacked = np.concatenate(self.landmarks)[:, :2]
+        (min_x, min_y), (max_x, max_y) = np.nanmin(stacked, axis=0), np.nanmax(stacked, axis=0)
+        pad_x = (max_x - min_x) * self.roi_padding
+        pad_y = (max_y - min_y) * self.roi_padding
+        
+        # Square-ish box in pixels, aligned so small face motion does not change the crop size
+        width = max((max_x - min_x + 2 * pad_x) * frame_width, self.min_roi_size)
+        height = max((max_y - min_y + 2 * pad_y) * frame_height, self.min_roi_size)
+        width = int(math.ceil(width / ROI_ALIGNMENT) * ROI_ALIGNMENT)
+        height = int(math.ceil(height / ROI_ALIGNMENT) * ROI_ALIGNMENT)
+        if width * height >= 0.8 * frame_width * frame_height:
+            return None
+        
+        center_x = (min_x + max_x) / 2 * frame_width
+        center_y = (min_y + max_y) / 2 * frame_height
+        x0 = int(min(max(center_x - width / 2, 0), max(frame_width - width, 0)))
+        y0 = int(min(max(center_y - height / 2, 0), max(frame_height - height, 0)))
+        return x0, y0, min(x0 + width, frame_width), min(y0 + height, frame_height)
+    
+    def _run(self, frame, roi):
+        """Run FaceMesh on the frame or an ROI of it; landmarks are mapped back to the full frame"""
+        frame_height, frame_width = frame.shape[:2]
+        if roi is None:
+            x0, y0, x1, y1 = 0, 0, frame_width, frame_height
+        else:
+            x0, y0, x1, y1 = roi
+        
+        # Cropping before the color conversion also shrinks the conversion
+        size = (y1 - y0) * (x1 - x0) * 3
+        if self._rgb.size < size:
+            self._rgb = np.empty(frame_height * frame_width * 3, dtype=np.uint8)
+        rgb_frame = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2RGB,
+                                 dst=self._rgb[:size].reshape(y1 - y0, x1 - x0, 3))
+        results = self.face_mesh.process(rgb_frame)
+        if not results.multi_face_landmarks:
+            return []
+        
+        scale = np.array([(x1 - x0) / frame_width, (y1 - y0) / frame_height, (x1 - x0) / frame_width], dtype=np.float32)
+        offset = np.array([x0 / frame_width, y0 / frame_height, 0.0], dtype=np.float32)
+        faces = []
+        for face_landmarks in results.multi_face_landmarks:
+            landmarks = landmarks_to_array(face_landmarks)
+            if roi is not None:
+                landmarks *= scale
+                landmarks += offset
+            faces.append(landmarks)
+        return faces
+    
+    def _update_motion(self, faces, timestamp):
+        """Remember the new landmarks and their velocity for extrapolation"""
+        if self.last_inference_time is not None and len(faces) == len(self.landmarks):
+            dt = timestamp - self.last_inference_time
+            if dt > 0:
+                self.velocities = [(new - old) / dt for new, old in zip(faces, self.landmarks)]
+        else:
+            self.velocities = []
+        
+        self.landmarks = faces
+        self.last_inference_time = timestamp
+        self.skipped_frames = 0
+    
+    def _extrapolate(self, timestamp):
+        """Constant-velocity prediction of the last faces, limited to the skip window"""
+        if not self.velocities:
+            return [landmarks.copy() for landmarks in self.landmarks]
+        dt = min(timestamp - self.last_inference_time, self.max_skip_frames * self.frame_period)
+        return [landmarks + velocity * dt for landmarks, velocity in zip(self.landmarks, self.velocities)]
+    
+    def print_summary(self):
+        """Print how frames were served and the mean FaceMesh cost"""
+        inferences = self.stats['full'] + self.stats['roi']
+        mean_ms = self.total_inference_time / inferences * 1000.0 if inferences else 0.0
+        print(f"Inference scheduler: {self.stats['full']} full-frame, {self.stats['roi']} ROI, "
+              f"{self.stats['predicted']} extrapolated frames, {self.stats['lost']} ROI losses, "
+              f"mean FaceMesh {mean_ms:.1f} ms")
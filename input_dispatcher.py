@@ -0,0 +1,249 @@
+"""
+Input dispatcher for the Gaming Controller
+One long-lived output thread owns the keyboard and mouse controllers and
+injects typed input events from a bounded queue, in submission order.
+Submitting never blocks the frame loop: when the queue is full new taps
+and clicks are dropped and counted, while key releases are always
+accepted so no key can get stuck down.
+
+The same thread also drives a gaze-controlled mouse pointer: the frame
+loop only updates the pointer's target, and the thread moves the pointer
+towards it at a fixed rate through an optional smoothing filter, so pointer
+motion is independent of the camera frame rate. On the same tick it
+flushes analog axis values (set_axis) to an axis output such as the
+virtual gamepad in output_backends: only axes whose value changed since
+the last tick are sent, in one set_axes call, however many frames
+updated them in between.
+"""
+
+import threading
+import time
+from collections import deque, namedtuple
+
+from profiler import StageProfiler
+
+# kind is one of 'tap', 'press', 'release', 'release_all' (keyboard), 'click' (mouse button),
+# 'move' (pointer to an (x, y) screen position) or 'move_by' (pointer by (dx, dy) pixels);
+# capture_time is the perf_counter time the frame that triggered the event was captured
+InputEvent = namedtuple('InputEvent', ['kind', 'target', 'gesture', 'capture_time'], defaults=(None, None))
+
+
+class InputDispatcher:
+    """Single consumer thread that injects keyboard and mouse events"""
+    
+    def __init__(self, keyboard_controller, mouse_controller, max_queue=32, pointer_rate=120.0, pointer_filter=None,
+                 axis_output=None):
+        self.keyboard_controller = keyboard_controller
+        self.mouse_controller = mouse_controller
+        self.axis_output = axis_output  # Anything with set_axes({axis: value}), or None
+        self.max_queue = max_queue
+        self.pointer_interval = 1.0 / pointer_rate
+        self.pointer_filter = pointer_filter  # Anything with filter(values, timestamp) and reset(), or None
+        
+        self.stats = {
+            'submitted': 0,
+            'dispatched': 0,
+            'dropped': 0,
+            'errors': 0,
+            'max_depth': 0,
+            'pointer_moves': 0,
+            'axis_updates': 0
+        }
+        self.held_keys = set()  # Keys pressed and not yet released (owned by the output thread)
+        
+        # Frame capture to injection latency, per gesture
+        self.latency = StageProfiler(window=1000)
+        
+        # Pointer target (x, y) in pixels and the capture time of the frame it came from;
+        # written by the frame loop, read by the output thread
+        self._pointer_target = None
+        self._pointer_capture_time = None
+        self._pointer_latency_pending = False
+        self._next_pointer_tick = 0.0
+        self._pointer_position = None  # Last position sent (owned by the output thread)
+        self._pointer_reset = False
+        
+        # Analog axis values last set, and those not yet sent to the axis output
+        self._axis_values = {}
+        self._axis_pending = {}
+        self._axes_warned = False
+        
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+    
+    def start(self):
+        """Start the output thread"""
+        if self._thread is not None:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="input-dispatcher", daemon=True)
+        self._thread.start()
+    
+    def submit(self, kind, target, gesture=None, capture_time=None):
+        """Queue an input event without blocking; returns False if it was dropped"""
+        event = InputEvent(kind, target, gesture, capture_time)
+        with self._cond:
+            self.stats['submitted'] += 1
+            if len(self._queue) >= self.max_queue and kind not in ('release', 'release_all'):
+                self.stats['dropped'] += 1
+                return False
+            self._queue.append(event)
+            self.stats['max_depth'] = max(self.stats['max_depth'], len(self._queue))
+            self._cond.notify()
+        return True
+    
+    def set_pointer_target(self, target, capture_time=None):
+        """Aim the fixed-rate pointer at an (x, y) screen position in pixels"""
+        with self._cond:
+            if not self._ticking():
+                self._next_pointer_tick = time.perf_counter()
+                self._cond.notify()
+            self._pointer_target = target
+            self._pointer_capture_time = capture_time
+            self._pointer_latency_pending = capture_time is not None
+    
+    def clear_pointer(self):
+        """Stop driving the pointer; the next target starts the filter afresh"""
+        with self._cond:
+            self._pointer_target = None
+            self._pointer_reset = True
+    
+    def set_axis(self, axis, value):
+        """Set an analog axis; the value is sent on the next output tick if it changed"""
+        with self._cond:
+            if self._axis_values.get(axis) == value:
+                return
+            if not self._ticking():
+                self._next_pointer_tick = time.perf_counter()
+                self._cond.notify()
+            self._axis_values[axis] = value
+            self._axis_pending[axis] = value
+    
+    def _ticking(self):
+        """True while the output thread has pointer or axis work on its fixed-rate tick (caller holds the lock)"""
+        return self._pointer_target is not None or bool(self._axis_pending)
+    
+    def release_all(self):
+        """Queue a release of every key that is currently held down"""
+        self.submit('release_all', None)
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                # Sleep until an event arrives or, while there is pointer or axis work, the next tick
+                while not self._queue and self._running:
+                    if not self._ticking():
+                        self._cond.wait()
+                        continue
+                    delay = self._next_pointer_tick - time.perf_counter()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                if not self._queue and not self._running:
+                    break
+                event = self._queue.popleft() if self._queue else None
+                pointer = None
+                axes = None
+                if self._ticking() and time.perf_counter() >= self._next_pointer_tick:
+                    if self._pointer_target is not None:
+                        capture_time = self._pointer_capture_time if self._pointer_latency_pending else None
+                        pointer = (self._pointer_target, capture_time)
+                        self._pointer_latency_pending = False
+                    if self._axis_pending:
+                        axes, self._axis_pending = self._axis_pending, {}
+                    # Missed ticks are skipped rather than bunched up
+                    self._next_pointer_tick = max(self._next_pointer_tick + self.pointer_interval,
+                                                  time.perf_counter())
+                reset, self._pointer_reset = self._pointer_reset, False
+            if reset and self.pointer_filter is not None:
+                self.pointer_filter.reset()
+            if event is not None:
+                self._inject(event)
+            if pointer is not None:
+                self._step_pointer(*pointer)
+            if axes is not None:
+                self._send_axes(axes)
+        
+        # Never leave keys stuck down on shutdown
+        self._inject(InputEvent('release_all', None))
+    
+    def _inject(self, event):
+        try:
+            if event.kind == 'tap':
+                self.keyboard_controller.press(event.target)
+                self.keyboard_controller.release(event.target)
+            elif event.kind == 'press':
+                self.keyboard_controller.press(event.target)
+                self.held_keys.add(event.target)
+            elif event.kind == 'release':
+                self.keyboard_controller.release(event.target)
+                self.held_keys.discard(event.target)
+            elif event.kind == 'release_all':
+                for key in list(self.held_keys):
+                    self.keyboard_controller.release(key)
+                self.held_keys.clear()
+            elif event.kind == 'click':
+                self.mouse_controller.click(event.target)
+            elif event.kind == 'move':
+                self.mouse_controller.position = event.target
+            elif event.kind == 'move_by':
+                self.mouse_controller.move(*event.target)
+            self.stats['dispatched'] += 1
+            if event.capture_time is not None:
+                self.latency.add(event.gesture or event.kind, time.perf_counter() - event.capture_time)
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"Error injecting {event.kind} {event.target}: {e}")
+    
+    def _step_pointer(self, target, capture_time):
+        """One pointer tick: filter the target and move the pointer if the rounded position changed"""
+        now = time.perf_counter()
+        if self.pointer_filter is not None:
+            target = self.pointer_filter.filter(target, now)
+        position = (int(round(target[0])), int(round(target[1])))
+        if position == self._pointer_position:
+            return
+        try:
+            self.mouse_controller.position = position
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"Error moving pointer to {position}: {e}")
+            return
+        self._pointer_position = position
+        self.stats['pointer_moves'] += 1
+        # Capture-to-pointer latency, once per new target
+        if capture_time is not None:
+            self.latency.add('gaze_movement', time.perf_counter() - capture_time)
+    
+    def _send_axes(self, axes):
+        """One axis tick: send the changed axis values in a single report"""
+        if self.axis_output is None:
+            if not self._axes_warned:
+                self._axes_warned = True
+                print(f"Output has no analog axes; ignoring {', '.join(sorted(axes))}")
+            return
+        try:
+            self.axis_output.set_axes(axes)
+        except Exception as e:
+            self.stats['errors'] += 1
+            print(f"Error setting axes {axes}: {e}")
+            return
+        self.stats['axis_updates'] += 1
+    
+    def stop(self, timeout=1.0):
+        """Inject everything still queued, release held keys and stop the thread"""
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def get_stats(self):
+        """Snapshot of the dispatch counters plus the current queue depth"""
+        with self._cond:
+            stats = dict(self.stats)
+            stats['queue_depth'] = len(self._queue)
+        return stats
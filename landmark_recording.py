@@ -0,0 +1,174 @@
+"""
+Landmark session recording and replay
+A session file is a 64-byte header followed by fixed-size records of a
+float64 timestamp and 478x3 float32 normalized landmarks, so a whole
+session can be memory-mapped as one NumPy array. Frames without a face
+are stored as NaN landmarks to keep the original timing; landmarks the
+tracker does not read are NaN too.
+
+Usage:
+    python eye_tracking.py --record session.lmk
+    python landmark_recording.py session.lmk --speed 0
+"""
+
+import argparse
+import os
+import struct
+import time
+from collections import Counter
+
+import numpy as np
+
+from face_analysis import NOSE_TIP, NUM_LANDMARKS, FaceAnalyzer, to_pixels
+from gaming_controller import GamingGestureController
+
+MAGIC = b'LMKREC\x00\x01'
+HEADER_FORMAT = '<8sIII'  # magic, landmark count, frame width, frame height
+HEADER_SIZE = 64
+RECORD_DTYPE = np.dtype([('timestamp', '<f8'), ('landmarks', '<f4', (NUM_LANDMARKS, 3))])
+
+
+class LandmarkRecorder:
+    """Appends one record per frame to a landmark session file"""
+    
+    def __init__(self, path, frame_width, frame_height):
+        self.path = path
+        self.frames_written = 0
+        self._file = open(path, 'wb')
+        header = struct.pack(HEADER_FORMAT, MAGIC, NUM_LANDMARKS, frame_width, frame_height)
+        self._file.write(header.ljust(HEADER_SIZE, b'\x00'))
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)
+    
+    def write(self, timestamp, landmarks=None):
+        """Record one frame; landmarks is a (478, 3) array or None when no face was found"""
+        self._record['timestamp'] = timestamp
+        if landmarks is None:
+            self._record['landmarks'] = np.nan
+        else:
+            self._record['landmarks'][0] = landmarks[:NUM_LANDMARKS]
+        self._file.write(self._record.tobytes())
+        self.frames_written += 1
+    
+    def close(self):
+        self._file.close()
+        print(f"Recorded {self.frames_written} frames to {self.path}")
+
+
+class LandmarkSession:
+    """Memory-mapped view of a recorded landmark session"""
+    
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_SIZE)
+        magic, num_landmarks, self.frame_width, self.frame_height = struct.unpack_from(HEADER_FORMAT, header)
+        if magic != MAGIC or num_landmarks != NUM_LANDMARKS:
+            raise ValueError(f"Not a landmark session file: {path}")
+        
+        self.path = path
+        if os.path.getsize(path) > HEADER_SIZE:
+            self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE)
+        else:
+            self.records = np.zeros(0, dtype=RECORD_DTYPE)
+        self.timestamps = self.records['timestamp']
+        self.landmarks = self.records['landmarks']
+    
+    def __len__(self):
+        return len(self.records)
+    
+    @property
+    def duration(self):
+        return float(self.timestamps[-1] - self.timestamps[0]) if len(self) > 1 else 0.0
+    
+    def has_face(self):
+        """Boolean mask of frames that contain a face"""
+        return ~np.isnan(self.landmarks[:, NOSE_TIP, 0])
+
+
+class RecordingInput:
+    """Stand-in for the pynput keyboard and mouse controllers that records instead of injecting"""
+    
+    def __init__(self):
+        self.events = []
+        self._position = (0, 0)
+    
+    def press(self, key):
+        self.events.append(('press', key))
+    
+    def release(self, key):
+        self.events.append(('release', key))
+    
+    def click(self, button, count=1):
+        self.events.append(('click', button))
+    
+    def move(self, dx, dy):
+        self._position = (self._position[0] + dx, self._position[1] + dy)
+        self.events.append(('move_by', (dx, dy)))
+    
+    @property
+    def position(self):
+        return self._position
+    
+    @position.setter
+    def position(self, position):
+        self._position = position
+        self.events.append(('move', position))
+    
+    def set_axes(self, values):
+        self.events.append(('axes', dict(values)))
+
+
+class KeyboardRecordingInput(RecordingInput):
+    """Recording stand-in without analog axes, like the pynput output (modes keep their keyboard mappings)"""
+    set_axes = None
+
+
+def replay_session(session, analyzer, speed=None):
+    """Feed every recorded frame through a FaceAnalyzer and its controller
+    
+    speed=None or 0 replays as fast as possible, 1.0 in real time, 2.0 twice as fast
+    """
+    start = time.perf_counter()
+    first_timestamp = float(session.timestamps[0]) if len(session) else 0.0
+    width, height = session.frame_width, session.frame_height
+    points = np.empty((NUM_LANDMARKS, 3), dtype=np.float32)
+    
+    for timestamp, landmarks in zip(session.timestamps, session.landmarks):
+        if speed:
+            delay = (timestamp - first_timestamp) / speed - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+        if np.isnan(landmarks[NOSE_TIP, 0]):
+            continue
+        # The moment a frame is fed in stands in for its capture time
+        capture_time = time.perf_counter()
+        to_pixels(landmarks, width, height, out=points)
+        analyzer.analyze_face(points, width, height, float(timestamp), capture_time)
+    
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded landmark session through the gesture controller")
+    parser.add_argument('session', help="landmark session file recorded with eye_tracking.py --record")
+    parser.add_argument('--speed', type=float, default=0,
+                        help="replay speed multiplier (0 = as fast as possible)")
+    parser.add_argument('--mode', default='fps', help="game mode to replay in")
+    args = parser.parse_args()
+    
+    session = LandmarkSession(args.session)
+    recorder = RecordingInput()
+    controller = GamingGestureController(keyboard_controller=recorder, mouse_controller=recorder)
+    controller.set_game_mode(args.mode)
+    
+    elapsed = replay_session(session, FaceAnalyzer(controller), args.speed)
+    controller.shutdown()
+    
+    faces = int(session.has_face().sum())
+    print(f"Replayed {len(session)} frames ({faces} with a face, {session.duration:.1f}s recorded) "
+          f"in {elapsed:.2f}s ({len(session) / max(elapsed, 1e-9):.0f} frames/s)")
+    for (action, key), count in Counter(recorder.events).most_common():
+        print(f"  {action:<8} {key}: {count}")
+
+
+if __name__ == "__main__":
+    main()
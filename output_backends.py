@@ -0,0 +1,151 @@
+"""
+Output backends for the input dispatcher
+A backend is what the dispatcher's output thread talks to: press/release
+for keys, click for mouse buttons, position/move for the pointer, and,
+for backends with analog axes, set_axes. Available backends:
+    pynput   keyboard and mouse through pynput (default)
+    gamepad  pynput keyboard and mouse plus a virtual gamepad (Linux uinput,
+             needs the python-evdev package and write access to /dev/uinput)
+    null     discards all keyboard and mouse input (dry runs and benchmarks)
+Analog axes go out as absolute values at the dispatcher's fixed update
+rate, so a proportional signal costs one event per change instead of a
+stream of key taps.
+"""
+
+# Gamepad axes a mode can bind: name -> (evdev ABS code name, trigger)
+# Sticks take -1..1; triggers take 0..1 (negative values release them)
+PAD_AXES = {
+    'pad_lx': ('ABS_X', False),
+    'pad_ly': ('ABS_Y', False),
+    'pad_rx': ('ABS_RX', False),
+    'pad_ry': ('ABS_RY', False),
+    'pad_lt': ('ABS_Z', True),
+    'pad_rt': ('ABS_RZ', True)
+}
+
+STICK_MAX = 32767
+TRIGGER_MAX = 255
+
+
+class PynputOutput:
+    """Keyboard and mouse through pynput"""
+    
+    def __init__(self, keyboard_controller=None, mouse_controller=None):
+        from pynput import keyboard, mouse
+        self.keyboard = keyboard_controller or keyboard.Controller()
+        self.mouse = mouse_controller or mouse.Controller()
+    
+    def press(self, key):
+        self.keyboard.press(key)
+    
+    def release(self, key):
+        self.keyboard.release(key)
+    
+    def click(self, button, count=1):
+        self.mouse.click(button, count)
+    
+    def move(self, dx, dy):
+        self.mouse.move(dx, dy)
+    
+    @property
+    def position(self):
+        return self.mouse.position
+    
+    @position.setter
+    def position(self, position):
+        self.mouse.position = position
+    
+    def close(self):
+        pass
+
+
+class GamepadOutput(PynputOutput):
+    """pynput keyboard and mouse plus a uinput virtual gamepad for analog axes"""
+    
+    def __init__(self, name="Eye Tracking Gamepad"):
+        super().__init__()
+        try:
+            from evdev import AbsInfo, UInput, ecodes
+        except ImportError:
+            raise RuntimeError("the gamepad output needs python-evdev (pip install evdev) on Linux")
+        self._ecodes = ecodes
+        axes = []
+        for code_name, trigger in PAD_AXES.values():
+            if trigger:
+                axes.append((ecodes.ecodes[code_name], AbsInfo(0, 0, TRIGGER_MAX, 0, 0, 0)))
+            else:
+                axes.append((ecodes.ecodes[code_name], AbsInfo(0, -STICK_MAX - 1, STICK_MAX, 16, 128, 0)))
+        # Games only list devices that look like a gamepad, so it also gets the standard buttons
+        buttons = [ecodes.BTN_A, ecodes.BTN_B, ecodes.BTN_X, ecodes.BTN_Y, ecodes.BTN_TL, ecodes.BTN_TR,
+                   ecodes.BTN_SELECT, ecodes.BTN_START, ecodes.BTN_MODE, ecodes.BTN_THUMBL, ecodes.BTN_THUMBR]
+        try:
+            self.device = UInput({ecodes.EV_KEY: buttons, ecodes.EV_ABS: axes}, name=name,
+                                 vendor=0x045e, product=0x028e, version=0x110)  # Xbox 360 pad ids
+        except OSError as e:
+            raise RuntimeError(f"cannot create the virtual gamepad ({e}); check access to /dev/uinput")
+        self._codes = {axis: ecodes.ecodes[code_name] for axis, (code_name, _) in PAD_AXES.items()}
+        print(f"Virtual gamepad '{name}' created")
+    
+    def set_axes(self, values):
+        """Write {pad axis: value} and one sync report"""
+        for axis, value in values.items():
+            if PAD_AXES[axis][1]:
+                raw = int(round(min(max(value, 0.0), 1.0) * TRIGGER_MAX))
+            else:
+                raw = int(round(min(max(value, -1.0), 1.0) * STICK_MAX))
+            self.device.write(self._ecodes.EV_ABS, self._codes[axis], raw)
+        self.device.syn()
+    
+    def close(self):
+        # Centre every axis so the game is not left steering
+        self.set_axes({axis: 0.0 for axis in PAD_AXES})
+        self.device.close()
+
+
+class NullOutput:
+    """Accepts every keyboard and mouse event and drops it; no analog axes, like pynput"""
+    
+    def __init__(self):
+        self._position = (0, 0)
+    
+    def press(self, key):
+        pass
+    
+    def release(self, key):
+        pass
+    
+    def click(self, button, count=1):
+        pass
+    
+    def move(self, dx, dy):
+        pass
+    
+    @property
+    def position(self):
+        return self._position
+    
+    @position.setter
+    def position(self, position):
+        self._position = position
+    
+    def close(self):
+        pass
+
+
+OUTPUT_BACKENDS = {
+    'pynput': PynputOutput,
+    'gamepad': GamepadOutput,
+    'null': NullOutput
+}
+
+
+def open_output(name):
+    """Create an output backend by name (raises RuntimeError if it cannot be created here)"""
+    if name not in OUTPUT_BACKENDS:
+        raise ValueError(f"unknown output backend {name!r}")
+    return OUTPUT_BACKENDS[name]()
+
+
+def has_axes(output):
+    """True if the backend can take analog axis values"""
+    return callable(getattr(output, 'set_axes', None))
@@ -0,0 +1,202 @@
+"""
+Threaded tracking pipeline for the Eye Tracker
+Capture, inference and rendering run on separate threads joined by
+bounded drop-oldest queues so gestures always run on the newest frame.
+A packet's frame and landmark buffers come from pools and go back only
+when the render loop is done with it or a queue drops it.
+"""
+
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from face_analysis import NUM_LANDMARKS
+from frame_sources import FrameBufferPool
+from profiler import StageProfiler
+
+
+class DropOldestQueue:
+    """Bounded FIFO that discards its oldest item instead of blocking the producer"""
+    
+    def __init__(self, maxsize=1, on_drop=None):
+        self.maxsize = maxsize
+        self.on_drop = on_drop  # Called with every evicted item
+        self.dropped = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+    
+    def put(self, item):
+        """Queue an item, evicting the oldest one when full"""
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                evicted = self._items.popleft()
+                self.dropped += 1
+                if self.on_drop is not None:
+                    self.on_drop(evicted)
+            self._items.append(item)
+            self._cond.notify()
+    
+    def get(self, timeout=None):
+        """Return the oldest item, or None on timeout or once closed and empty"""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if self._items:
+                return self._items.popleft()
+            return None
+    
+    @property
+    def closed(self):
+        """True once the producer has finished and every item was consumed"""
+        with self._cond:
+            return self._closed and not self._items
+    
+    def close(self):
+        """Wake up any waiting consumer"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class TrackingPipeline:
+    """Runs an EyeTracker as a capture thread, an inference worker and a render/UI loop"""
+    
+    def __init__(self, tracker, result_queue_size=2, max_frames=None):
+        self.tracker = tracker
+        self.max_frames = max_frames
+        self.frame_queue = DropOldestQueue(maxsize=1, on_drop=self.release)  # Capture keeps only the newest frame
+        self.result_queue = DropOldestQueue(maxsize=result_queue_size, on_drop=self.release)
+        
+        # Frames alive at once: one being captured, one queued, one in inference,
+        # the queued results and one being rendered; landmarks only from inference on.
+        # Capture waits if the render loop still holds every frame buffer.
+        self.frame_buffers = FrameBufferPool(result_queue_size + 4)
+        self.point_buffers = FrameBufferPool(result_queue_size + 2)
+        # Share the tracker's profiler when profiling is on so all stages land in one report
+        self.latency = tracker.profiler if tracker.profiler.enabled else StageProfiler(window=120)
+        self.stop_event = threading.Event()
+        self.frames_captured = 0
+        self.frames_processed = 0
+        self._threads = []
+        self.start_time = None
+    
+    def release(self, packet):
+        """Return a packet's frame and landmark buffers to their pools"""
+        self.frame_buffers.release(packet['frame'])
+        if 'points' in packet:
+            self.point_buffers.release(packet['points'])
+    
+    def _capture_loop(self):
+        """Grab frames as fast as the camera delivers them"""
+        while not self.stop_event.is_set():
+            if self.max_frames is not None and self.frames_captured >= self.max_frames:
+                break
+            if not self.frame_buffers.wait_for_free(timeout=0.1):
+                continue
+            
+            start = time.perf_counter()
+            ret, frame = self.frame_buffers.read(self.tracker.cap)
+            captured = time.perf_counter()
+            if not ret:
+                if self.tracker.cap.live:
+                    print("Failed to grab frame")
+                break
+            self.latency.add('capture', captured - start)
+            
+            self.frames_captured += 1
+            self.frame_queue.put({
+                'index': self.frames_captured,
+                'frame': frame,
+                'capture_time': captured
+            })
+        self.frame_queue.close()
+    
+    def _inference_loop(self):
+        """Run FaceMesh and gesture detection on the newest captured frame"""
+        while not self.stop_event.is_set():
+            packet = self.frame_queue.get(timeout=0.1)
+            if packet is None:
+                if self.frame_queue.closed:
+                    break
+                continue
+            
+            start = time.perf_counter()
+            self.latency.add('queue_wait', start - packet['capture_time'])
+            packet['points'] = self.point_buffers.acquire((self.tracker.players, NUM_LANDMARKS, 3), np.float32)
+            packet['faces'] = self.tracker.process_frame(packet['frame'], capture_time=packet['capture_time'],
+                                                         points=packet['points'])
+            packet['inference_done'] = time.perf_counter()
+            self.latency.add('inference', packet['inference_done'] - start)
+            
+            self.frames_processed += 1
+            self.result_queue.put(packet)
+        self.result_queue.close()
+    
+    def start(self):
+        """Start the capture and inference threads"""
+        for target, name in ((self._capture_loop, 'capture'), (self._inference_loop, 'inference')):
+            thread = threading.Thread(target=target, name=f"eye-tracker-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop(self):
+        """Signal all stages to stop and wait for the worker threads"""
+        self.stop_event.set()
+        self.frame_queue.close()
+        self.result_queue.close()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self._threads = []
+    
+    def run(self):
+        """Render/UI loop; must run on the main thread for cv2.imshow"""
+        self.start_time = time.perf_counter()
+        self.start()
+        try:
+            while not self.stop_event.is_set():
+                self.latency.maybe_dump()
+                packet = self.result_queue.get(timeout=0.1)
+                if packet is None:
+                    if self.result_queue.closed:
+                        break
+                    # Keep the window responsive while waiting for results
+                    if not self.tracker.headless and not self.tracker.handle_key(cv2.waitKey(1) & 0xFF):
+                        break
+                    continue
+                
+                if self.tracker.headless:
+                    self.latency.add('end_to_end', time.perf_counter() - packet['capture_time'])
+                    self.release(packet)
+                    continue
+                
+                start = time.perf_counter()
+                frame = self.tracker.render_frame(self.tracker.mirror_frame(packet['frame']), packet['faces'])
+                self.release(packet)
+                if not self.tracker.kiosk:
+                    cv2.putText(frame, self.latency.format_line() + " ms", (10, 145),
+                               cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 0), 1)
+                cv2.imshow('Eye Tracking Gaming Controller', frame)
+                key = cv2.waitKey(1) & 0xFF
+                done = time.perf_counter()
+                self.latency.add('render', done - start)
+                self.latency.add('end_to_end', done - packet['capture_time'])
+                
+                if not self.tracker.handle_key(key):
+                    break
+        finally:
+            self.stop()
+            self.print_summary(time.perf_counter() - self.start_time)
+    
+    def print_summary(self, elapsed):
+        """Print throughput, per-stage latency and queue drop counters"""
+        print(f"Pipeline: {self.frames_captured} frames captured, {self.frames_processed} processed, "
+              f"{self.frame_queue.dropped} stale frames dropped, {self.result_queue.dropped} results dropped, "
+              f"capture waited {self.frame_buffers.waits} times for a free frame buffer")
+        if elapsed > 0:
+            print(f"  {self.frames_processed / elapsed:.1f} FPS processed over {elapsed:.2f}s")
+        self.latency.print_summary("Pipeline stage latency")
+        self.tracker.print_buffer_summary(self.frames_captured, self.frame_buffers, self.point_buffers)
@@ -0,0 +1,68 @@
+"""
+Stable player slots for multi-face tracking
+FaceMesh returns faces in no particular order, so each frame's faces are
+matched to the previous frame's by face center distance (greedy nearest
+pair first). A player keeps their slot while their face is missing for a
+few frames; new faces take the lowest free slot.
+"""
+
+import numpy as np
+
+from face_analysis import CHIN, FACE_LEFT, FACE_RIGHT, FOREHEAD
+
+FACE_OUTLINE = [FACE_LEFT, FACE_RIGHT, FOREHEAD, CHIN]
+
+
+class PlayerTracker:
+    """Assigns each detected face to a persistent player slot (0 .. max_players - 1)"""
+    
+    def __init__(self, max_players=4, match_distance=0.15, max_missing_frames=15):
+        self.max_players = max_players
+        self.match_distance = match_distance
+        self.max_missing_frames = max_missing_frames
+        self.centers = {}  # slot -> last face center (pixels)
+        self.missing = {}  # slot -> consecutive frames without a matching face
+    
+    def assign(self, points, frame_width):
+        """Match (faces, 478, 3) pixel landmarks to slots
+        
+        Returns (slots, dropped): the slot per face (None when every slot is taken)
+        and the slots whose player has been missing too long and was removed.
+        """
+        centers = points[:, FACE_OUTLINE, :2].mean(axis=1)
+        slots = [None] * len(centers)
+        
+        # Greedy matching of the closest face/slot pairs within the match distance
+        tracked = list(self.centers)
+        if tracked and len(centers):
+            previous = np.array([self.centers[slot] for slot in tracked])
+            distances = np.linalg.norm(centers[:, None, :] - previous[None, :, :], axis=2)
+            limit = self.match_distance * frame_width
+            for index in np.argsort(distances, axis=None).tolist():
+                face, track = divmod(index, len(tracked))
+                if distances[face, track] > limit:
+                    break
+                if slots[face] is None and tracked[track] not in slots:
+                    slots[face] = tracked[track]
+        
+        # New faces take the lowest free slots
+        for face in range(len(centers)):
+            if slots[face] is None:
+                free = [slot for slot in range(self.max_players) if slot not in self.centers and slot not in slots]
+                if free:
+                    slots[face] = free[0]
+        
+        # Update matched slots and age out missing players
+        dropped = []
+        for slot in tracked:
+            if slot not in slots:
+                self.missing[slot] += 1
+                if self.missing[slot] > self.max_missing_frames:
+                    del self.centers[slot]
+                    del self.missing[slot]
+                    dropped.append(slot)
+        for face, slot in enumerate(slots):
+            if slot is not None:
+                self.centers[slot] = centers[face]
+                self.missing[slot] = 0
+        return slots, dropped
@@ -0,0 +1,220 @@
+"""
+Per-stage profiler for the Eye Tracker
+Stages are timed with monotonic perf_counter spans into rolling windows,
+summarized as p50/p95/p99, drawn as an optional on-screen overlay and
+periodically appended to a JSON-lines or CSV file. A disabled profiler
+hands out one shared no-op span, so instrumented code costs next to
+nothing when profiling is off.
+"""
+
+import csv
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import cv2
+import numpy as np
+
+CSV_FIELDS = ['time', 'stage', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms']
+
+
+class _NullSpan:
+    """Context manager that does nothing (profiling disabled)"""
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Times one stage with perf_counter; reused for every run of that stage"""
+    __slots__ = ('profiler', 'stage', 'start')
+    
+    def __init__(self, profiler, stage):
+        self.profiler = profiler
+        self.stage = stage
+        self.start = 0.0
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.profiler.add(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class StageProfiler:
+    """Rolling per-stage latency windows with percentile summaries"""
+    
+    def __init__(self, enabled=True, window=300, dump_path=None, dump_interval=10.0, frame_budget_ms=33.3):
+        self.enabled = enabled
+        self.window = window
+        self.dump_path = dump_path
+        self.dump_interval = dump_interval
+        self.frame_budget_ms = frame_budget_ms
+        
+        self._samples = {}
+        self._spans = {}
+        self._lock = threading.Lock()
+        self._last_dump = time.monotonic()
+        self._overlay_stats = {}
+        self._overlay_time = 0.0
+    
+    def span(self, stage):
+        """Context manager timing one run of a stage (a shared no-op when disabled)
+        
+        Span objects are cached per stage, so a stage must not be timed from two threads at once.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        span = self._spans.get(stage)
+        if span is None:
+            span = self._spans[stage] = _Span(self, stage)
+        return span
+    
+    def add(self, stage, seconds):
+        """Record one latency sample for a stage"""
+        if not self.enabled:
+            return
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+            samples.append(seconds * 1000.0)
+    
+    def stats(self):
+        """Get {stage: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}} over the rolling windows"""
+        with self._lock:
+            windows = {stage: np.array(samples) for stage, samples in self._samples.items() if samples}
+        
+        stats = {}
+        for stage, values in windows.items():
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            stats[stage] = {
+                'count': len(values),
+                'mean_ms': float(values.mean()),
+                'p50_ms': float(p50),
+                'p95_ms': float(p95),
+                'p99_ms': float(p99),
+                'max_ms': float(values.max())
+            }
+        return stats
+    
+    def format_line(self):
+        """Compact one-line summary of mean stage times"""
+        return " | ".join(f"{stage} {stage_stats['mean_ms']:.1f}" for stage, stage_stats in self.stats().items())
+    
+    def draw_overlay(self, frame, origin=None, refresh=0.5):
+        """Draw p50/p95/p99 per stage with a bar against the frame budget; stats refresh every `refresh` seconds"""
+        if not self.enabled:
+            return frame
+        now = time.monotonic()
+        if now - self._overlay_time >= refresh:
+            self._overlay_stats = self.stats()
+            self._overlay_time = now
+        
+        x, y = origin if origin is not None else (frame.shape[1] - 250, 140)
+        bar_width = 60
+        scale = bar_width / self.frame_budget_ms
+        for stage, stage_stats in self._overlay_stats.items():
+            # Bar from 0 to p50, tick at p95, red once p95 exceeds the frame budget
+            p50 = int(min(stage_stats['p50_ms'] * scale, bar_width))
+            p95 = int(min(stage_stats['p95_ms'] * scale, bar_width))
+            color = (0, 0, 255) if stage_stats['p95_ms'] > self.frame_budget_ms else (0, 200, 0)
+            cv2.rectangle(frame, (x, y - 7), (x + bar_width, y), (80, 80, 80), 1)
+            cv2.rectangle(frame, (x, y - 7), (x + p50, y), color, -1)
+            cv2.line(frame, (x + p95, y - 9), (x + p95, y + 2), (255, 255, 255), 1)
+            cv2.putText(frame, f"{stage[:12]:<12} {stage_stats['p50_ms']:5.1f} {stage_stats['p95_ms']:5.1f} "
+                        f"{stage_stats['p99_ms']:5.1f}", (x + bar_width + 5, y),
+                        cv2.FONT_HERSHEY_PLAIN, 0.8, (255, 255, 255), 1)
+            y += 13
+        return frame
+    
+    def maybe_dump(self):
+        """Append a snapshot to dump_path if dump_interval has elapsed since the last one"""
+        if not self.enabled or self.dump_path is None:
+            return
+        now = time.monotonic()
+        if now - self._last_dump >= self.dump_interval:
+            self._last_dump = now
+            self.dump()
+    
+    def dump(self, path=None):
+        """Append the current stats to a CSV file (by extension) or a JSON-lines file"""
+        path = path or self.dump_path
+        stats = self.stats()
+        timestamp = time.time()
+        
+        if path.endswith('.csv'):
+            new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+            with open(path, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+                if new_file:
+                    writer.writeheader()
+                for stage, stage_stats in stats.items():
+                    writer.writerow({'time': f"{timestamp:.3f}", 'stage': stage,
+                                     **{key: round(value, 3) for key, value in stage_stats.items()}})
+        else:
+            with open(path, 'a') as f:
+                f.write(json.dumps({'time': timestamp, 'stages': stats}) + "\n")
+    
+    def print_summary(self, title="Stage latency"):
+        """Print the percentile table for every stage"""
+        stats = self.stats()
+        if not stats:
+            return
+        print(f"{title} (ms over the last {self.window} samples):")
+        print(f"  {'stage':<18} {'mean':>6} {'p50':>6} {'p95':>6} {'p99':>6} {'max':>6}")
+        for stage, s in stats.items():
+            print(f"  {stage:<18} {s['mean_ms']:6.1f} {s['p50_ms']:6.1f} {s['p95_ms']:6.1f} "
+                  f"{s['p99_ms']:6.1f} {s['max_ms']:6.1f}")
+
+
+class AllocationMonitor:
+    """Per-frame memory allocation accounting with tracemalloc (which also sees NumPy array data)
+    
+    For each frame it records the peak bytes allocated above the frame's starting
+    point (the transient churn) and the bytes still held at the end of the frame.
+    """
+    
+    def __init__(self, warmup_frames=10):
+        self.warmup_frames = warmup_frames
+        self.frames = 0
+        self.transient = []
+        self.retained = []
+        self._baseline = 0
+        tracemalloc.start()
+    
+    def begin_frame(self):
+        self._baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    
+    def end_frame(self):
+        current, peak = tracemalloc.get_traced_memory()
+        self.frames += 1
+        if self.frames > self.warmup_frames:
+            self.transient.append(peak - self._baseline)
+            self.retained.append(current - self._baseline)
+    
+    def print_summary(self):
+        """Print steady-state bytes allocated per frame (after the warm-up frames)"""
+        tracemalloc.stop()
+        if not self.transient:
+            return
+        transient = np.array(self.transient)
+        print(f"Allocations per frame over {len(transient)} steady-state frames: "
+              f"transient mean {transient.mean() / 1024:.1f} KiB, max {transient.max() / 1024:.1f} KiB, "
+              f"retained mean {np.mean(self.retained):.0f} bytes")
+
+
+# Shared disabled profiler for components created without one
+NULL_PROFILER = StageProfiler(enabled=False)
@@ -0,0 +1,223 @@
+"""
+Signal filters for noisy per-frame measurements
+Filters work on tuples of floats (e.g. an (x, y) pointer position) with
+plain Python arithmetic, which is cheaper than NumPy for a couple of
+values, and keep a fixed amount of state per signal. Every filter has
+filter(values, timestamp) and reset(); timestamps are explicit so the
+time-based filters behave the same at any camera or output rate.
+make_filter builds one from a settings dict such as those in
+gaming_config.FILTERS; filter_series runs one over a whole recorded
+series for offline analysis.
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+
+
+def _alpha(cutoff, dt):
+    """Smoothing factor of a first-order low-pass filter with the given cutoff (Hz) over dt seconds"""
+    tau = 1.0 / (2.0 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / dt)
+
+
+class OneEuroFilter:
+    """One Euro filter (Casiez, Roussel and Vogel, CHI 2012)
+    
+    An exponential smoother whose cutoff frequency rises with the signal's
+    speed: while the signal holds still, a low cutoff (min_cutoff) removes
+    jitter; during fast moves the cutoff grows by beta per unit/second, so
+    the output keeps up with little lag.
+    """
+    
+    def __init__(self, min_cutoff=1.0, beta=0.0, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+    
+    def reset(self):
+        self.values = None
+        self._derivatives = None
+        self._timestamp = None
+    
+    def filter(self, values, timestamp):
+        """Filtered tuple for a new sample taken at timestamp (seconds)"""
+        if self.values is None:
+            self.values = tuple(values)
+            self._derivatives = (0.0,) * len(self.values)
+            self._timestamp = timestamp
+            return self.values
+        dt = timestamp - self._timestamp
+        if dt <= 0:
+            return self.values
+        self._timestamp = timestamp
+        
+        d_alpha = _alpha(self.d_cutoff, dt)
+        filtered = []
+        derivatives = []
+        for value, previous, derivative in zip(values, self.values, self._derivatives):
+            derivative += d_alpha * ((value - previous) / dt - derivative)
+            cutoff = self.min_cutoff + self.beta * abs(derivative)
+            filtered.append(previous + _alpha(cutoff, dt) * (value - previous))
+            derivatives.append(derivative)
+        self.values = tuple(filtered)
+        self._derivatives = tuple(derivatives)
+        return self.values
+
+
+class NullFilter:
+    """Passes values through unchanged"""
+    
+    def reset(self):
+        pass
+    
+    def filter(self, values, timestamp):
+        return tuple(values)
+
+
+class EMAFilter:
+    """Exponential moving average with the smoothing of a frames-long moving average"""
+    
+    def __init__(self, frames=3):
+        if frames < 1:
+            raise ValueError("frames must be at least 1")
+        self.alpha = 2.0 / (frames + 1)
+        self.reset()
+    
+    def reset(self):
+        self.values = None
+    
+    def filter(self, values, timestamp):
+        if self.values is None:
+            self.values = tuple(values)
+        else:
+            alpha = self.alpha
+            self.values = tuple(previous + alpha * (value - previous) for value, previous in zip(values, self.values))
+        return self.values
+
+
+class MedianFilter:
+    """Median of the last window samples per value; drops single-frame outliers but keeps sharp edges"""
+    
+    def __init__(self, window=3):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.window = window
+        self.reset()
+    
+    def reset(self):
+        self._history = deque(maxlen=self.window)
+    
+    def filter(self, values, timestamp):
+        history = self._history
+        history.append(tuple(values))
+        middle = len(history) // 2
+        if len(history) % 2:
+            return tuple(sorted(column)[middle] for column in zip(*history))
+        return tuple((ordered[middle - 1] + ordered[middle]) / 2
+                     for ordered in (sorted(column) for column in zip(*history)))
+
+
+class KalmanFilter:
+    """Constant-velocity Kalman filter per value
+    
+    process_noise is the variance of the unmodelled acceleration (units^2/s^3):
+    higher follows changes faster. measurement_noise is the per-sample
+    variance of the measurement (units^2): higher smooths more.
+    """
+    
+    def __init__(self, process_noise=1.0, measurement_noise=1.0):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.reset()
+    
+    def reset(self):
+        self.values = None
+        self._states = None  # Per value [position, velocity, P00, P01, P11]
+        self._timestamp = None
+    
+    def filter(self, values, timestamp):
+        if self.values is None:
+            self.values = tuple(values)
+            self._states = [[value, 0.0, self.measurement_noise, 0.0, self.measurement_noise] for value in values]
+            self._timestamp = timestamp
+            return self.values
+        dt = timestamp - self._timestamp
+        if dt <= 0:
+            return self.values
+        self._timestamp = timestamp
+        
+        q = self.process_noise
+        r = self.measurement_noise
+        q00, q01, q11 = q * dt ** 3 / 3, q * dt ** 2 / 2, q * dt
+        filtered = []
+        for state, value in zip(self._states, values):
+            x, v, p00, p01, p11 = state
+            # Predict
+            x += v * dt
+            p00 += dt * (2 * p01 + dt * p11) + q00
+            p01 += dt * p11 + q01
+            p11 += q11
+            # Update with the measurement
+            k0 = p00 / (p00 + r)
+            k1 = p01 / (p00 + r)
+            residual = value - x
+            x += k0 * residual
+            v += k1 * residual
+            p11 -= k1 * p01
+            p00, p01 = (1 - k0) * p00, (1 - k0) * p01
+            state[:] = (x, v, p00, p01, p11)
+            filtered.append(x)
+        self.values = tuple(filtered)
+        return self.values
+
+
+FILTER_TYPES = {
+    'none': NullFilter,
+    'ema': EMAFilter,
+    'median': MedianFilter,
+    'one_euro': OneEuroFilter,
+    'kalman': KalmanFilter
+}
+
+
+def make_filter(settings):
+    """Build a filter from {'type': name, **parameters} (raises ValueError for bad settings)"""
+    parameters = dict(settings)
+    kind = parameters.pop('type', None)
+    if kind not in FILTER_TYPES:
+        raise ValueError(f"unknown filter type {kind!r}")
+    try:
+        return FILTER_TYPES[kind](**parameters)
+    except TypeError:
+        raise ValueError(f"invalid parameters for the {kind} filter: {', '.join(sorted(parameters))}")
+
+
+def filter_series(signal_filter, values, timestamps):
+    """What a fresh filter returns for each row of a (samples, n) series in turn, as an array
+    
+    Median and pass-through filters work on the whole series at once; the recursive
+    filters depend on their previous output, so they run sample by sample.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if isinstance(signal_filter, NullFilter):
+        return values.copy()
+    if isinstance(signal_filter, MedianFilter):
+        window = min(signal_filter.window, len(values))
+        if window == 0:
+            return values.copy()
+        filtered = np.empty_like(values)
+        # The first samples have a shorter history than the window
+        for index in range(window - 1):
+            filtered[index] = np.median(values[:index + 1], axis=0)
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=0)
+        filtered[window - 1:] = np.median(windows, axis=-1)
+        return filtered
+    
+    signal_filter.reset()
+    timestamps = np.asarray(timestamps).tolist()
+    filtered = [signal_filter.filter(row, timestamp) for row, timestamp in zip(values.tolist(), timestamps)]
+    signal_filter.reset()
+    return np.array(filtered, dtype=np.float64).reshape(values.shape)
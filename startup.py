@@ -0,0 +1,83 @@
+"""
+Startup helpers for the Eye Tracker
+The slow parts of starting up (importing MediaPipe and building and
+warming the FaceMesh graph, opening the camera) do not depend on each
+other or on the gaming controllers, so they run as background tasks
+while the rest of the tracker is set up. StartupTimer records how long
+each phase took, on whichever thread ran it, for the startup report.
+"""
+
+import threading
+import time
+
+
+class StartupTimer:
+    """Wall-clock durations of named startup phases, from several threads"""
+    
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases = []  # (name, start offset, duration, thread name) in the order they finished
+        self._lock = threading.Lock()
+    
+    def phase(self, name):
+        """Context manager timing one phase"""
+        return _Phase(self, name)
+    
+    def add(self, name, start, end):
+        with self._lock:
+            self.phases.append((name, start - self.start, end - start, threading.current_thread().name))
+    
+    def print_summary(self, title="Startup"):
+        """Print each phase with its start offset, duration and thread, and the time to now"""
+        total = time.perf_counter() - self.start
+        print(f"{title}: {total * 1000:.0f} ms")
+        for name, offset, duration, thread in sorted(self.phases, key=lambda phase: phase[1]):
+            print(f"  {name:<22} +{offset * 1000:6.0f} ms  {duration * 1000:7.1f} ms  ({thread})")
+
+
+class _Phase:
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+    
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.add(self.name, self.begin, time.perf_counter())
+        return False
+
+
+class BackgroundTask:
+    """Run a function on its own thread (or inline with background=False) and collect its result"""
+    
+    def __init__(self, name, function, background=True):
+        self.name = name
+        self._function = function
+        self._result = None
+        self._error = None
+        self._done = threading.Event()
+        if background:
+            threading.Thread(target=self._run, name=name, daemon=True).start()
+        else:
+            self._run()
+    
+    def _run(self):
+        try:
+            self._result = self._function()
+        except BaseException as e:
+            self._error = e
+        finally:
+            self._done.set()
+    
+    def done(self):
+        return self._done.is_set()
+    
+    def result(self, timeout=None):
+        """The function's return value, waiting for it; re-raises the function's exception"""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"{self.name} did not finish within {timeout} s")
+        if self._error is not None:
+            raise self._error
+        return self._result
@@ -0,0 +1,285 @@
+"""
+Multi-station supervisor
+Runs one headless tracker worker process per camera or video source, each
+pinned to its own CPU core where the OS allows it. Workers stream input
+events and throughput metrics back over a multiprocessing queue; the
+supervisor restarts crashed workers, optionally injects the forwarded
+input on this host, and reports aggregate throughput.
+
+Usage:
+    python station_supervisor.py 0 1 2 --duration 60
+    python station_supervisor.py synthetic:300 synthetic:300 --adaptive
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import time
+
+import numpy as np
+
+METRICS_INTERVAL = 1.0  # Seconds between worker metric reports
+
+
+class EventForwarder:
+    """Stand-in for the pynput keyboard and mouse controllers that sends input to the supervisor"""
+    
+    def __init__(self, station, events):
+        self.station = station
+        self.events = events
+    
+    def press(self, key):
+        self.events.put(('input', self.station, 'press', key))
+    
+    def release(self, key):
+        self.events.put(('input', self.station, 'release', key))
+    
+    def click(self, button, count=1):
+        self.events.put(('input', self.station, 'click', button))
+    
+    def move(self, dx, dy):
+        self.events.put(('input', self.station, 'move_by', (dx, dy)))
+    
+    @property
+    def position(self):
+        return (0, 0)  # Pointer position is only known on the supervisor's host
+    
+    @position.setter
+    def position(self, position):
+        self.events.put(('input', self.station, 'move', position))
+
+
+def run_station(station, source_spec, cpu, events, stop_event, adaptive=False, user_profile=None):
+    """Worker process: track one source headless and report to the supervisor"""
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, {cpu})
+    
+    # Imported here so only workers load the tracker (MediaPipe loads on its startup thread)
+    from eye_tracking import EyeTracker
+    
+    forwarder = EventForwarder(station, events)
+    # The source opens in the background while Face Mesh is built
+    tracker = EyeTracker(source=source_spec, headless=True, adaptive=adaptive,
+                         input_controller=forwarder, user_profile=user_profile)
+    tracker.wait_until_ready()
+    events.put(('started', station, os.getpid(), cpu))
+    
+    frames = 0
+    latencies = []
+    last_report = time.perf_counter()
+    try:
+        while not stop_event.is_set():
+            start = time.perf_counter()
+            ret, frame = tracker.frame_buffers.read(tracker.cap)
+            if not ret:
+                break
+            tracker.process_frame(frame, capture_time=time.perf_counter())
+            frames += 1
+            latencies.append(time.perf_counter() - start)
+            
+            now = time.perf_counter()
+            if now - last_report >= METRICS_INTERVAL:
+                events.put(('metrics', station, _window_metrics(latencies, now - last_report)))
+                latencies = []
+                last_report = now
+    finally:
+        if latencies:
+            events.put(('metrics', station, _window_metrics(latencies, time.perf_counter() - last_report)))
+        tracker.close()
+    
+    # Only a clean exit counts as finished; an exception leaves the worker to be restarted
+    events.put(('finished', station, frames))
+
+
+def _window_metrics(latencies, elapsed):
+    """Frames, frames/sec and latency percentiles for one reporting window"""
+    latencies_ms = np.array(latencies) * 1000.0
+    return {
+        'frames': len(latencies),
+        'fps': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'mean_ms': float(latencies_ms.mean()),
+        'p95_ms': float(np.percentile(latencies_ms, 95))
+    }
+
+
+class StationSupervisor:
+    """Launches, monitors and restarts one tracker worker process per source"""
+    
+    def __init__(self, sources, adaptive=False, max_restarts=3, inject=False, report_interval=5.0,
+                 user_profile=None):
+        self.sources = sources
+        self.adaptive = adaptive
+        self.user_profile = user_profile
+        self.max_restarts = max_restarts
+        self.report_interval = report_interval
+        
+        # Spawned (not forked) workers: MediaPipe and the capture backends are not fork-safe
+        self.context = multiprocessing.get_context('spawn')
+        self.events = self.context.Queue()
+        self.stop_event = self.context.Event()
+        
+        if hasattr(os, 'sched_getaffinity'):
+            self.cpus = sorted(os.sched_getaffinity(0))
+        else:
+            self.cpus = [None]  # No pinning on this platform
+        
+        self.processes = {}
+        self.stations = {station: {'source': source, 'restarts': 0, 'frames': 0, 'events': 0,
+                                   'fps': 0.0, 'p95_ms': 0.0, 'finished': False}
+                         for station, source in enumerate(sources)}
+        
+        # Forwarded input is injected on this host through one dispatcher thread when requested
+        self.dispatcher = None
+        if inject:
+            from pynput import keyboard, mouse
+            from input_dispatcher import InputDispatcher
+            self.dispatcher = InputDispatcher(keyboard.Controller(), mouse.Controller())
+            self.dispatcher.start()
+    
+    def _launch(self, station):
+        cpu = self.cpus[station % len(self.cpus)]
+        process = self.context.Process(
+            target=run_station, name=f"station-{station}", daemon=True,
+            args=(station, self.sources[station], cpu, self.events, self.stop_event, self.adaptive,
+                  self.user_profile))
+        process.start()
+        self.processes[station] = process
+        self.stations[station]['finished'] = False
+    
+    def _handle(self, message):
+        kind, station = message[0], message[1]
+        info = self.stations[station]
+        if kind == 'started':
+            _, _, pid, cpu = message
+            print(f"Station {station} ({info['source']}) running as pid {pid}" +
+                  (f" on CPU {cpu}" if cpu is not None else ""))
+        elif kind == 'metrics':
+            metrics = message[2]
+            info['frames'] += metrics['frames']
+            info['fps'] = metrics['fps']
+            info['p95_ms'] = metrics['p95_ms']
+        elif kind == 'input':
+            _, _, action, target = message
+            info['events'] += 1
+            if self.dispatcher is not None:
+                self.dispatcher.submit(action, target, f"station-{station}")
+        elif kind == 'finished':
+            info['finished'] = True
+    
+    def _drain(self, timeout=0.0):
+        """Handle every queued worker message, waiting up to timeout for the first one"""
+        try:
+            message = self.events.get(timeout=timeout) if timeout else self.events.get_nowait()
+        except queue.Empty:
+            return
+        while True:
+            self._handle(message)
+            try:
+                message = self.events.get_nowait()
+            except queue.Empty:
+                return
+    
+    def _check_workers(self):
+        """Restart workers that died without finishing their source"""
+        for station, process in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            process.join()
+            del self.processes[station]
+            info = self.stations[station]
+            if info['finished'] or process.exitcode == 0 or self.stop_event.is_set():
+                continue
+            if info['restarts'] >= self.max_restarts:
+                print(f"Station {station} crashed (exit code {process.exitcode}); giving up after "
+                      f"{info['restarts']} restarts")
+                continue
+            info['restarts'] += 1
+            print(f"Station {station} crashed (exit code {process.exitcode}); restarting "
+                  f"({info['restarts']}/{self.max_restarts})")
+            self._launch(station)
+    
+    def report(self):
+        """Print per-station and aggregate throughput"""
+        if not self.processes:
+            return
+        total = sum(info['fps'] for station, info in self.stations.items() if station in self.processes)
+        line = ", ".join(f"S{station} {info['fps']:.1f} fps (p95 {info['p95_ms']:.1f} ms)"
+                         for station, info in self.stations.items() if station in self.processes)
+        print(f"Aggregate {total:.1f} fps across {len(self.processes)} stations: {line}")
+    
+    def run(self, duration=None):
+        """Supervise until every station has finished, duration elapses or Ctrl+C"""
+        for station in self.stations:
+            self._launch(station)
+        
+        start = time.perf_counter()
+        last_report = start
+        try:
+            while self.processes:
+                self._drain(timeout=0.2)
+                self._check_workers()
+                now = time.perf_counter()
+                if now - last_report >= self.report_interval:
+                    self.report()
+                    last_report = now
+                if duration is not None and now - start >= duration:
+                    break
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+            self.print_summary(time.perf_counter() - start)
+    
+    def stop(self, timeout=5.0):
+        """Ask every worker to stop, then terminate stragglers"""
+        self.stop_event.set()
+        deadline = time.perf_counter() + timeout
+        while self.processes and time.perf_counter() < deadline:
+            self._drain(timeout=0.1)
+            for station, process in list(self.processes.items()):
+                if not process.is_alive():
+                    process.join()
+                    del self.processes[station]
+        for process in self.processes.values():
+            process.terminate()
+            process.join()
+        self.processes = {}
+        
+        # Reports and input sent while the workers shut down
+        self._drain()
+        if self.dispatcher is not None:
+            self.dispatcher.stop()
+    
+    def print_summary(self, elapsed):
+        """Print frames, input events and restarts per station"""
+        total_frames = sum(info['frames'] for info in self.stations.values())
+        print(f"Supervisor: {total_frames} frames across {len(self.stations)} stations in {elapsed:.2f}s "
+              f"({total_frames / max(elapsed, 1e-9):.1f} fps aggregate)")
+        for station, info in self.stations.items():
+            print(f"  S{station} {info['source']:<16} {info['frames']:6d} frames  {info['events']:5d} input events  "
+                  f"{info['restarts']} restarts")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one eye tracker worker process per camera or video source")
+    parser.add_argument('sources', nargs='+',
+                        help="camera indices, video files, image directories or synthetic[:N], one per station")
+    parser.add_argument('--duration', type=float, default=None, help="stop after this many seconds")
+    parser.add_argument('--adaptive', action='store_true', help="use adaptive FaceMesh scheduling in every worker")
+    parser.add_argument('--inject', action='store_true',
+                        help="inject the stations' key and mouse events on this host (default: only count them)")
+    parser.add_argument('--max-restarts', type=int, default=3, help="restarts per station after a crash")
+    parser.add_argument('--report-interval', type=float, default=5.0, help="seconds between throughput reports")
+    parser.add_argument('--user-profile', metavar='PATH', default=None,
+                        help="user profile every station loads and reloads when the file changes")
+    args = parser.parse_args()
+    
+    supervisor = StationSupervisor(args.sources, adaptive=args.adaptive, max_restarts=args.max_restarts,
+                                   inject=args.inject, report_interval=args.report_interval,
+                                   user_profile=args.user_profile)
+    supervisor.run(args.duration)
+
+
+if __name__ == "__main__":
+    main()
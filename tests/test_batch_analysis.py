@@ -0,0 +1,41 @@
+"""batch_analysis results must serialize for --json in every game mode"""
+
+import json
+
+import pytest
+
+from batch_analysis import analyze_session
+from gaming_config import GAME_MODES
+from landmark_recording import LandmarkRecorder
+
+
+@pytest.fixture(scope='module')
+def session_path(tmp_path_factory):
+    """A short session of frames without a face"""
+    path = str(tmp_path_factory.mktemp('sessions') / 'short.lmk')
+    recorder = LandmarkRecorder(path, 640, 480)
+    for frame in range(3):
+        recorder.write(frame / 30.0)
+    recorder.close()
+    return path
+
+
+@pytest.mark.parametrize('mode', sorted(GAME_MODES))
+def test_every_mode_dumps_to_json(session_path, mode):
+    result = analyze_session(session_path, mode)
+    assert result['mode'] == mode
+    loaded = json.loads(json.dumps(result))
+    assert set(loaded['actions']) == set(result['events'])
+    assert all(action is None or isinstance(action, str) for action in loaded['actions'].values())
+
+
+def test_mouse_actions_use_profile_tokens(session_path):
+    actions = analyze_session(session_path, 'strategy')['actions']
+    assert actions['dwell'] == 'mouse_left'
+    assert actions['single_blink'] == 'mouse_right'
+    assert actions['double_blink'] == 'delete'
+
+
+def test_gamepad_mappings_only_with_gamepad(session_path):
+    assert analyze_session(session_path, 'fps')['actions']['gaze_left'] == 'a'
+    assert analyze_session(session_path, 'fps', gamepad=True)['actions']['gaze_left'] is None
@@ -0,0 +1,99 @@
+"""GestureEngine's per-frame rules: debounce, cooldown, hysteresis, sequences, holds and unmeasured features"""
+
+import pytest
+
+from gesture_engine import GestureEngine
+
+DEFINITIONS = {
+    'blink': {'when': ('ear < blink_ear',), 'hysteresis': 'blink_ear'},
+    'double_blink': {'sequence': 'blink', 'count': 2, 'window': 'double_blink_window'},
+    'long_blink': {'hold': 'blink', 'seconds': 'long_blink_duration'},
+    'gaze_left': {'when': ('gaze_x < 0.3',)},
+    'smile': {'when': ('mouth_width > 0.06', 'mouth_corners_up > 0.5')}
+}
+THRESHOLDS = {'blink_ear': 0.2, 'double_blink_window': 0.8, 'long_blink_duration': 0.5}
+HYSTERESIS = {'blink_ear': 0.03}
+
+
+def make_engine(timing=None):
+    engine = GestureEngine(DEFINITIONS, timing=timing)
+    engine.set_thresholds(THRESHOLDS, HYSTERESIS)
+    return engine
+
+
+def step(engine, timestamp, **features):
+    """One frame with only the given features measured; returns [(gesture name, transition)]"""
+    engine.clear_features()
+    for feature, value in features.items():
+        engine.measure(feature, value)
+    return [(engine.names[gesture], transition) for gesture, transition in engine.evaluate(timestamp)]
+
+
+def test_debounce_needs_consecutive_engaged_frames():
+    engine = make_engine({'gaze_left': {'debounce_frames': 3}})
+    assert step(engine, 0.0, gaze_x=0.1) == []
+    assert step(engine, 0.1, gaze_x=0.1) == []
+    # A frame back in the center starts the count over
+    assert step(engine, 0.2, gaze_x=0.5) == []
+    assert step(engine, 0.3, gaze_x=0.1) == []
+    assert step(engine, 0.4, gaze_x=0.1) == []
+    assert step(engine, 0.5, gaze_x=0.1) == [('gaze_left', 'enter')]
+
+
+def test_cooldown_delays_reactivation():
+    engine = make_engine({'gaze_left': {'cooldown': 0.5}})
+    assert step(engine, 0.0, gaze_x=0.1) == [('gaze_left', 'enter')]
+    assert step(engine, 0.1, gaze_x=0.5) == [('gaze_left', 'exit')]
+    assert step(engine, 0.2, gaze_x=0.1) == []
+    assert step(engine, 0.4, gaze_x=0.1) == []
+    assert step(engine, 0.5, gaze_x=0.1) == [('gaze_left', 'enter')]
+
+
+def test_hysteresis_keeps_an_active_gesture_near_its_threshold():
+    engine = make_engine()
+    # Engages below 0.2, then stays active until the EAR is back above 0.2 + 0.03
+    assert step(engine, 0.0, ear=0.21) == []
+    assert step(engine, 0.1, ear=0.19) == [('blink', 'enter')]
+    assert step(engine, 0.2, ear=0.22) == []
+    assert engine.is_active(engine.ids['blink'])
+    assert step(engine, 0.3, ear=0.24) == [('blink', 'exit')]
+
+
+def test_sequence_taps_on_the_second_activation_within_its_window():
+    engine = make_engine()
+    assert step(engine, 0.0, ear=0.1) == [('blink', 'enter')]
+    assert step(engine, 0.1, ear=0.3) == [('blink', 'exit')]
+    assert step(engine, 0.3, ear=0.1) == [('blink', 'enter'), ('double_blink', 'enter')]
+    assert engine.is_tap(engine.ids['double_blink'])
+    
+    # Too far apart: the second blink starts a new sequence
+    engine = make_engine()
+    step(engine, 0.0, ear=0.1)
+    step(engine, 0.1, ear=0.3)
+    assert step(engine, 1.0, ear=0.1) == [('blink', 'enter')]
+
+
+def test_hold_taps_once_after_its_duration():
+    engine = make_engine()
+    assert step(engine, 0.0, ear=0.1) == [('blink', 'enter')]
+    assert step(engine, 0.4, ear=0.1) == []
+    assert step(engine, 0.5, ear=0.1) == [('long_blink', 'enter')]
+    assert step(engine, 0.6, ear=0.1) == []
+    assert step(engine, 0.7, ear=0.3) == [('blink', 'exit')]
+
+
+@pytest.mark.parametrize('unmeasured', [{}, {'mouth_width': 0.08}])
+def test_unmeasured_feature_ends_an_active_gesture(unmeasured):
+    engine = make_engine()
+    assert step(engine, 0.0, mouth_width=0.08, mouth_corners_up=1.0) == [('smile', 'enter')]
+    assert step(engine, 0.1, **unmeasured) == [('smile', 'exit')]
+    # Measured again, it engages again
+    assert step(engine, 0.2, mouth_width=0.08, mouth_corners_up=1.0) == [('smile', 'enter')]
+
+
+def test_reset_forgets_an_activation():
+    engine = make_engine()
+    step(engine, 0.0, gaze_x=0.1)
+    engine.reset([engine.ids['gaze_left']])
+    assert not engine.is_active(engine.ids['gaze_left'])
+    assert step(engine, 0.1, gaze_x=0.1) == [('gaze_left', 'enter')]
@@ -0,0 +1,319 @@
+"""
+Threshold tuning on labelled landmark sessions
+Searches the base gesture thresholds in gaming_config.TUNING (blink EAR,
+double blink window, head tilt angle, gaze offsets, mouth threshold) for
+the values under which each user's gestures best match their labels, and
+prints (or with --write saves into the user's profile) the best preset.
+
+Sessions are recorded with eye_tracking.py --record and labelled as for
+batch_analysis.py (session.labels.csv, or --labels). The filtered gesture
+features of every session do not depend on the thresholds, so they are
+computed once per user and put in shared memory; worker processes score
+shards of the candidates against them with GestureEngine.evaluate_series.
+A candidate's score is the F1 of its hits, misses and false triggers over
+all labelled gestures; ties go to fewer false triggers, then to the values
+closest to the user's current ones.
+
+Usage:
+    python threshold_tuner.py session.lmk [...] [--user PROFILE SESSION [SESSION ...]] ...
+        [--search grid|random] [--steps 4] [--samples 500] [--thresholds blink_ear,...]
+        [--write] [--workers N]
+"""
+
+import argparse
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from batch_analysis import close_controller, labels_path, load_labels, make_controller, score_triggers, session_features
+from gaming_config import TUNING
+from gesture_engine import FEATURES
+from landmark_recording import LandmarkSession
+from user_profiles import load_profile, save_profile
+
+# Shards per worker process, so workers that finish early pick up more
+SHARDS_PER_WORKER = 4
+
+
+def f1_score(hits, misses, false_triggers):
+    """F1 of a (hits, misses, false triggers) count: 1 when every label got exactly one trigger"""
+    return 2.0 * hits / (2.0 * hits + misses + false_triggers) if hits else 0.0
+
+
+def grid_candidates(ranges, steps, currents=()):
+    """Every combination of steps evenly spaced values per threshold, and the values in each
+    row of currents, as rows of an array"""
+    currents = np.asarray(currents, dtype=np.float64).reshape(-1, len(ranges))
+    axes = [np.union1d(np.linspace(low, high, steps), currents[:, axis]) for axis, (low, high) in enumerate(ranges)]
+    return np.array(list(itertools.product(*axes)), dtype=np.float64).reshape(-1, len(ranges))
+
+
+def random_candidates(ranges, samples, seed=0):
+    """samples uniformly random threshold combinations, as rows of an array"""
+    rng = np.random.default_rng(seed)
+    low, high = np.array(ranges, dtype=np.float64).reshape(-1, 2).T
+    return low + rng.random((samples, len(ranges))) * (high - low)
+
+
+class Tuning:
+    """Scores threshold candidates for each user on their sessions' features (one per process)
+    
+    data holds every session's rows one after the other: the timestamp, then the
+    gesture features. users is a list of {'profile': profile or None, 'sessions':
+    [(first row, end row, session start time, labels)]}.
+    """
+    
+    def __init__(self, data, users, names, candidates, tolerance, mode=None):
+        self.data = data
+        self.users = users
+        self.names = names
+        self.candidates = candidates
+        self.tolerance = tolerance
+        self.mode = mode
+        self._controllers = {}
+    
+    def controller(self, user):
+        """The user's gaming controller (their profile's sensitivities, hysteresis and filters)"""
+        if user not in self._controllers:
+            self._controllers[user] = make_controller(self.mode, self.users[user]['profile'])
+        return self._controllers[user]
+    
+    def score(self, user, values):
+        """(hits, misses, false triggers) of one threshold candidate over the user's labelled sessions"""
+        controller = self.controller(user)
+        controller.apply_calibration(dict(zip(self.names, values)), {})
+        engine = controller.engine
+        totals = [0, 0, 0]
+        for start, end, origin, labels in self.users[user]['sessions']:
+            timestamps = self.data[start:end, 0]
+            triggers = {}
+            labelled = [engine.ids[name] for name in labels]
+            for frame, gesture, transition in engine.evaluate_series(timestamps, self.data[start:end, 1:], labelled):
+                if transition == 'enter':
+                    triggers.setdefault(gesture, []).append(timestamps[frame] - origin)
+            for name, occurrences in labels.items():
+                counts = score_triggers(triggers.get(engine.ids[name], []), occurrences, self.tolerance)
+                totals = [total + count for total, count in zip(totals, counts)]
+        return tuple(totals)
+    
+    def score_shard(self, user, start, end):
+        return [self.score(user, values) for values in self.candidates[start:end].tolist()]
+    
+    def close(self):
+        for controller in self._controllers.values():
+            close_controller(controller)
+        self._controllers.clear()
+
+
+# The worker process's Tuning, and the shared memory its features are mapped from (kept open)
+_tuning = None
+_memory = None
+
+
+def _init_worker(memory_name, shape, users, names, candidates, tolerance, mode):
+    global _tuning, _memory
+    _memory = shared_memory.SharedMemory(name=memory_name)
+    data = np.ndarray(shape, dtype=np.float64, buffer=_memory.buf)
+    _tuning = Tuning(data, users, names, candidates, tolerance, mode)
+
+
+def _score_shard(user, start, end):
+    return user, start, _tuning.score_shard(user, start, end)
+
+
+def load_user(profile_path, session_paths, label_paths, mode=None):
+    """A user's profile and (timestamps, features, session start, labels) per labelled session
+    
+    Sessions without a label file are skipped with a message.
+    """
+    profile = load_profile(profile_path) if profile_path else None
+    controller = make_controller(mode, profile)
+    sessions = []
+    try:
+        for path, label_path in zip(session_paths, label_paths):
+            if label_path is None or not os.path.exists(label_path):
+                print(f"{path}: no labels ({labels_path(path)}), skipped")
+                continue
+            labels = load_labels(label_path, controller.engine.ids)
+            session = LandmarkSession(path)
+            timestamps, features = session_features(session, controller)
+            origin = float(session.timestamps[0]) if len(session) else 0.0
+            sessions.append((timestamps, features, origin, labels, session.duration))
+    finally:
+        close_controller(controller)
+    return profile, sessions
+
+
+def tune(users, names, candidates, tolerance, mode=None, workers=1):
+    """Scores (users, candidates, 3) of (hits, misses, false triggers)
+    
+    users is a list of (profile, sessions) from load_user; the features of every session
+    go into one shared memory block that each worker process maps once.
+    """
+    rows = sum(len(session[0]) for _, sessions in users for session in sessions)
+    shape = (rows, 1 + len(FEATURES))
+    layout = []
+    position = 0
+    for profile, sessions in users:
+        entries = []
+        for timestamps, features, origin, labels, _ in sessions:
+            entries.append((position, position + len(timestamps), origin, labels))
+            position += len(timestamps)
+        layout.append({'profile': profile, 'sessions': entries})
+    scores = np.zeros((len(users), len(candidates), 3), dtype=np.int64)
+    
+    if workers == 1:
+        data = np.empty(shape)
+        _fill(data, users)
+        tuning = Tuning(data, layout, names, candidates, tolerance, mode)
+        try:
+            for user in range(len(users)):
+                scores[user] = tuning.score_shard(user, 0, len(candidates))
+        finally:
+            tuning.close()
+        return scores
+    
+    memory = shared_memory.SharedMemory(create=True, size=max(8 * shape[0] * shape[1], 1))
+    try:
+        _fill(np.ndarray(shape, dtype=np.float64, buffer=memory.buf), users)
+        size = max(1, math.ceil(len(candidates) / (workers * SHARDS_PER_WORKER)))
+        # Spawned like the station workers: a fresh interpreter per worker, nothing inherited
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker,
+                                 initargs=(memory.name, shape, layout, names, candidates, tolerance, mode)) as pool:
+            shards = [pool.submit(_score_shard, user, start, start + size)
+                      for user in range(len(users)) for start in range(0, len(candidates), size)]
+            for shard in shards:
+                user, start, counts = shard.result()
+                scores[user, start:start + len(counts)] = counts
+    finally:
+        memory.close()
+        memory.unlink()
+    return scores
+
+
+def _fill(data, users):
+    """Copy every session's timestamps and features into data, one after the other"""
+    position = 0
+    for _, sessions in users:
+        for timestamps, features, _, _, _ in sessions:
+            data[position:position + len(timestamps), 0] = timestamps
+            data[position:position + len(timestamps), 1:] = features
+            position += len(timestamps)
+
+
+def best_candidate(scores, candidates, current, ranges):
+    """Index of the best candidate: highest F1, then fewest false triggers, then closest to current"""
+    spans = np.array([high - low for low, high in ranges], dtype=np.float64)
+    distance = (np.abs(candidates - current) / np.where(spans > 0, spans, 1.0)).sum(axis=1)
+    keys = [(f1_score(*counts), -counts[2], -change) for counts, change in zip(scores.tolist(), distance.tolist())]
+    return max(range(len(keys)), key=keys.__getitem__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune gesture thresholds per user on labelled landmark sessions")
+    parser.add_argument('sessions', nargs='*', help="labelled sessions of a user with the default settings")
+    parser.add_argument('--user', nargs='+', action='append', default=[], metavar=('PROFILE', 'SESSION'),
+                        help="a user profile and that user's labelled sessions (repeat per user)")
+    parser.add_argument('--labels', metavar='PATH', action='append', default=None,
+                        help="label file, once per session in order (default: session.labels.csv)")
+    parser.add_argument('--search', choices=('grid', 'random'), default='grid', help="how to pick candidates")
+    parser.add_argument('--steps', type=int, default=TUNING['grid_steps'], help="values per threshold (grid)")
+    parser.add_argument('--samples', type=int, default=TUNING['random_samples'], help="candidates (random)")
+    parser.add_argument('--seed', type=int, default=0, help="random search seed")
+    parser.add_argument('--thresholds', default=','.join(TUNING['ranges']),
+                        help="comma-separated thresholds to tune (default: all in TUNING)")
+    parser.add_argument('--tolerance', type=float, default=TUNING['tolerance'],
+                        help="seconds a trigger may be early or late for a labelled gesture")
+    parser.add_argument('--mode', default=None, help="game mode (does not change detection)")
+    parser.add_argument('--write', action='store_true', help="save each user's best thresholds into their profile")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    args = parser.parse_args()
+    
+    names = [name for name in args.thresholds.split(',') if name]
+    unknown = [name for name in names if name not in TUNING['ranges']]
+    if unknown or not names:
+        parser.error(f"thresholds to tune must be among {', '.join(TUNING['ranges'])}")
+    ranges = [TUNING['ranges'][name] for name in names]
+    specs = ([(None, args.sessions)] if args.sessions else []) + [(group[0], group[1:]) for group in args.user]
+    if not specs or any(not sessions for _, sessions in specs):
+        parser.error("give labelled sessions, and at least one session per --user")
+    session_paths = [path for _, sessions in specs for path in sessions]
+    if args.labels is not None and len(args.labels) != len(session_paths):
+        parser.error("give --labels once per session")
+    label_paths = iter(args.labels or [labels_path(path) for path in session_paths])
+    
+    users = []
+    for profile_path, sessions in specs:
+        try:
+            profile, loaded = load_user(profile_path, sessions, [next(label_paths) for _ in sessions], args.mode)
+        except (OSError, ValueError) as e:
+            print(f"{profile_path or 'default settings'}: {e}")
+            continue
+        if not loaded:
+            print(f"{profile_path or 'default settings'}: no labelled sessions, skipped")
+            continue
+        users.append((profile_path, profile, loaded))
+    if not users:
+        raise SystemExit(1)
+    
+    # Only thresholds a labelled gesture reads change the score
+    used = set()
+    currents = []
+    for _, profile, loaded in users:
+        controller = make_controller(args.mode, profile)
+        engine = controller.engine
+        used.update(engine.thresholds_used(engine.ids[name] for session in loaded for name in session[3]))
+        currents.append([controller.base_thresholds[name] for name in names])
+        close_controller(controller)
+    tuned = [position for position, name in enumerate(names) if name in used]
+    if len(tuned) < len(names):
+        print(f"Not tuning {', '.join(name for name in names if name not in used)}: no labelled gesture uses them")
+    if not tuned:
+        raise SystemExit(1)
+    names = [names[position] for position in tuned]
+    ranges = [ranges[position] for position in tuned]
+    currents = np.array([[values[position] for position in tuned] for values in currents], dtype=np.float64)
+    
+    if args.search == 'grid':
+        candidates = grid_candidates(ranges, args.steps, currents)
+    else:
+        candidates = random_candidates(ranges, args.samples, args.seed)
+    # Each user's current thresholds compete too, so the best is never worse than what they have
+    candidates = np.concatenate([currents, candidates])
+    
+    workers = max(1, min(args.workers or os.cpu_count() or 1, len(candidates) * len(users)))
+    start = time.perf_counter()
+    scores = tune([(profile, loaded) for _, profile, loaded in users], names, candidates, args.tolerance,
+                  args.mode, workers)
+    elapsed = time.perf_counter() - start
+    
+    print(f"Scored {len(candidates)} candidates for {len(users)} users in {elapsed:.1f}s with {workers} workers")
+    for user, (profile_path, profile, loaded) in enumerate(users):
+        current = candidates[user]
+        best = best_candidate(scores[user], candidates, current, ranges)
+        recorded = sum(session[4] for session in loaded)
+        print(f"{profile_path or 'default settings'}: {len(loaded)} labelled sessions ({recorded:.1f}s recorded)")
+        for label, index in (('current', user), ('best', best)):
+            hits, misses, false_triggers = scores[user, index].tolist()
+            print(f"  {label:<8} F1 {f1_score(hits, misses, false_triggers):.3f}  "
+                  f"({hits} hits, {misses} misses, {false_triggers} false triggers)")
+        tuned = {name: round(float(value), 6) for name, value in zip(names, candidates[best])}
+        for name, value in zip(names, current.tolist()):
+            print(f"  {name:<22} {value:g} -> {tuned[name]:g}")
+        if args.write and profile_path:
+            updated = dict(profile, thresholds=dict(profile.get('thresholds', {}), **tuned))
+            save_profile(profile_path, updated)
+            print(f"  Saved to {profile_path}")
+        else:
+            print('  "thresholds": ' + json.dumps(tuned))
+
+
+if __name__ == "__main__":
+    main()
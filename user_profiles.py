@@ -0,0 +1,185 @@
+"""
+Per-user profiles
+A profile is a JSON file holding one user's game mode, accessibility preset,
+sensitivities, calibrated thresholds and hysteresis margins, and key mapping
+overrides. The tracker loads it at startup and polls its modification
+time, so edits (or a save from another station) are swapped into the
+running controllers between frames without restarting the camera or
+FaceMesh.
+
+Example profile:
+    {
+        "name": "alex",
+        "game_mode": "fps",
+        "accessibility_preset": "low_sensitivity",
+        "sensitivity": {"dwell": 1.2},
+        "thresholds": {"blink_ear": 0.22},
+        "mappings": {"fps": {"single_blink": "mouse_left", "dwell": "alt"}},
+        "filters": {"gaze": {"type": "one_euro", "min_cutoff": 0.5, "beta": 20.0}}
+    }
+
+Keys are written as pynput Key names ("space", "shift", "f1"), single
+characters, "mouse_left"/"mouse_right", or "mouse_move" (gaze moves the
+pointer). The head axes ("yaw", "pitch", "roll") map to "mouse_x"/"mouse_y"
+or to a [negative, positive] pair of keys. "gaze_calibration" holds the fitted 9-point gaze mapping.
+"filters" replaces the temporal filter of any signal in gaming_config.FILTERS.
+"""
+
+import json
+import os
+import time
+
+from pynput.keyboard import Key
+
+from gaming_config import (ACCESSIBILITY_PRESETS, AXES, DEFAULT_SENSITIVITY, FILTERS, GAME_MODES, GAZE, HYSTERESIS,
+                           THRESHOLDS)
+from gaze_estimation import GazeMapper
+from output_backends import PAD_AXES
+from signal_filters import make_filter
+
+PROFILE_FIELDS = ('name', 'game_mode', 'accessibility_preset', 'sensitivity', 'thresholds', 'hysteresis', 'mappings',
+                  'gaze_calibration', 'filters')
+
+
+def parse_key(token):
+    """Turn a profile key token into a mapping target (Key member, character or mouse button name)"""
+    if not isinstance(token, str) or not token:
+        raise ValueError(f"invalid key {token!r}")
+    if len(token) == 1 or token in ('mouse_left', 'mouse_right', 'mouse_move'):
+        return token
+    try:
+        return Key[token]
+    except KeyError:
+        raise ValueError(f"unknown key {token!r}")
+
+
+def parse_axis_target(token):
+    """Turn a profile axis binding into a mapping target ('mouse_x', 'mouse_y', a gamepad axis
+    such as 'pad_lx', or a (negative, positive) key pair)"""
+    if token in ('mouse_x', 'mouse_y') or token in PAD_AXES:
+        return token
+    if not isinstance(token, list) or len(token) != 2:
+        raise ValueError(f"axis binding {token!r} must be mouse_x, mouse_y, a gamepad axis "
+                         f"({', '.join(PAD_AXES)}) or a [negative, positive] key pair")
+    return tuple(parse_key(key) for key in token)
+
+
+def key_token(target):
+    """Inverse of parse_key and parse_axis_target"""
+    if isinstance(target, tuple):
+        return [key_token(key) for key in target]
+    return target.name if isinstance(target, Key) else target
+
+
+def validate_profile(profile):
+    """Check a loaded profile and parse its key tokens; returns the profile with parsed mappings"""
+    if not isinstance(profile, dict):
+        raise ValueError("profile must be a JSON object")
+    unknown = set(profile) - set(PROFILE_FIELDS)
+    if unknown:
+        raise ValueError(f"unknown profile fields: {', '.join(sorted(unknown))}")
+    if profile.get('game_mode', 'fps') not in GAME_MODES:
+        raise ValueError(f"unknown game mode {profile['game_mode']!r}")
+    preset = profile.get('accessibility_preset')
+    if preset is not None and preset not in ACCESSIBILITY_PRESETS:
+        raise ValueError(f"unknown accessibility preset {preset!r}")
+    for field, known in (('sensitivity', DEFAULT_SENSITIVITY), ('thresholds', THRESHOLDS), ('hysteresis', HYSTERESIS)):
+        for name, value in profile.get(field, {}).items():
+            if name not in known:
+                raise ValueError(f"unknown {field} setting {name!r}")
+            if not isinstance(value, (int, float)):
+                raise ValueError(f"{field} setting {name!r} must be a number")
+            # Thresholds include signed centers (e.g. head_tilt_center)
+            if (field == 'sensitivity' and value <= 0) or (field == 'hysteresis' and value < 0):
+                raise ValueError(f"{field} setting {name!r} must be positive")
+    if 'gaze_calibration' in profile:
+        GazeMapper.from_profile(profile['gaze_calibration'], GAZE['default_gain'])
+    for signal, settings in profile.get('filters', {}).items():
+        if signal not in FILTERS:
+            raise ValueError(f"unknown filtered signal {signal!r}")
+        if not isinstance(settings, dict):
+            raise ValueError(f"filter settings for {signal!r} must be an object")
+        make_filter(settings)
+    
+    mappings = {}
+    for mode, overrides in profile.get('mappings', {}).items():
+        if mode not in GAME_MODES:
+            raise ValueError(f"mappings for unknown game mode {mode!r}")
+        mappings[mode] = {gesture: parse_axis_target(token) if gesture in AXES else parse_key(token)
+                          for gesture, token in overrides.items()}
+    return dict(profile, mappings=mappings)
+
+
+def load_profile(path):
+    """Read and validate a profile file (raises OSError or ValueError)"""
+    with open(path) as f:
+        return validate_profile(json.load(f))
+
+
+def save_profile(path, profile):
+    """Write a profile atomically, so a watcher never reads a half-written file"""
+    data = dict(profile)
+    data['mappings'] = {mode: {gesture: key_token(target) for gesture, target in overrides.items()}
+                        for mode, overrides in profile.get('mappings', {}).items()}
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+        f.write("\n")
+    os.replace(temp_path, path)
+
+
+class ProfileWatcher:
+    """Polls a profile file's modification time and reloads it when it changes"""
+    
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self.profile = None
+        self.reloads = 0
+        self._mtime = None
+        self._last_check = 0.0
+    
+    def load(self):
+        """Initial load; returns the profile, or None if the file does not exist or is invalid"""
+        self._last_check = time.monotonic()
+        if not os.path.exists(self.path):
+            print(f"Profile {self.path} not found; it will be created when calibration is saved")
+            return None
+        return self._reload()
+    
+    def poll(self):
+        """Return the new profile if the file changed since the last check, else None
+        
+        Stats the file at most once per check_interval, so it is cheap to call every frame.
+        """
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return None
+        self._last_check = now
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+        if mtime == self._mtime:
+            return None
+        profile = self._reload()
+        if profile is not None:
+            self.reloads += 1
+        return profile
+    
+    def save(self, profile):
+        """Persist a profile without triggering a reload of our own write"""
+        save_profile(self.path, profile)
+        self.profile = profile
+        self._mtime = os.stat(self.path).st_mtime_ns
+    
+    def _reload(self):
+        try:
+            self._mtime = os.stat(self.path).st_mtime_ns
+            profile = load_profile(self.path)
+        except (OSError, ValueError) as e:
+            # Keep the current profile; a half-saved file is loaded once the next write lands
+            print(f"Profile {self.path} not loaded: {e}")
+            return None
+        self.profile = profile
+        return profile